@@ -0,0 +1,146 @@
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from ekg_cache import matches_fingerprint, source_fingerprint
+
+STORE_DIR = "data/cache/analysis"
+
+
+def analysis_key(test):
+    """Schlüssel im Speicher: Tests mit derselben Aufnahme (gleicher SHA-256) teilen sich die Einträge."""
+    sha256 = test.get("sha256")
+    return f"sha256_{sha256[:24]}" if sha256 else test["id"]
+
+
+def entry_path(test_id, distance, height, store_dir=STORE_DIR, method="threshold"):
+    """Pfad eines Eintrags – jede Parameterkombination bekommt eine eigene Datei."""
+    suffix = "" if method == "threshold" else f"_{method}"
+    return os.path.join(store_dir, f"test_{test_id}_d{distance}_h{height}{suffix}.npz")
+
+
+def _params(distance, height, method):
+    params = {"distance": distance, "height": height}
+    if method != "threshold":
+        params["method"] = method
+        # Filter mit der Abtastrate aus der Zeitachse statt fest 500 Hz; ältere Einträge gelten nicht mehr
+        params["fs"] = "time_axis"
+    return params
+
+
+def _write_atomically(path, write, mode="wb"):
+    """Schreibt über eine eigene temporäre Datei und ersetzt `path` erst danach.
+
+    Threads und Worker-Prozesse schreiben oft denselben Schlüssel gleichzeitig,
+    darum braucht jeder Schreiber einen eigenen Namen für die temporäre Datei.
+    """
+    directory = os.path.dirname(path)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_", suffix=os.path.splitext(path)[1], dir=directory)
+    try:
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else "utf-8") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def load_analysis(test_id, source, distance=200, height=0.5, store_dir=STORE_DIR, method="threshold"):
+    """Lädt gespeicherte Analyseergebnisse eines Tests.
+
+    Gibt None zurück, wenn es keinen Eintrag gibt oder sich die
+    EKG-Datei seit der Berechnung geändert hat.
+    """
+    path = entry_path(test_id, distance, height, store_dir, method)
+    try:
+        with np.load(path, allow_pickle=False) as entry:
+            meta = json.loads(str(entry["meta"]))
+            record = {
+                "peaks": entry["peaks"],
+                "peak_times": entry["peak_times"],
+                "rr_intervals": entry["rr_intervals"],
+            }
+    except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+        # Fehlender oder abgeschnittener Eintrag: wie ein Miss behandeln und neu berechnen
+        return None
+
+    if meta["params"] != _params(distance, height, method):
+        return None
+    if not matches_fingerprint(meta["fingerprint"], source):
+        return None
+
+    record["stats"] = meta["stats"]
+    return record
+
+
+def save_analysis(test_id, source, peaks, peak_times, rr_intervals, stats,
+                  distance=200, height=0.5, store_dir=STORE_DIR, method="threshold"):
+    """Schreibt die Analyseergebnisse eines Tests (Write-Through nach einem Cache-Miss)."""
+    path = entry_path(test_id, distance, height, store_dir, method)
+    meta = {
+        "test_id": test_id,
+        "params": _params(distance, height, method),
+        "fingerprint": source_fingerprint(source),
+        "stats": stats,
+    }
+    try:
+        os.makedirs(store_dir, exist_ok=True)
+        _write_atomically(path, lambda f: np.savez(
+            f,
+            peaks=np.asarray(peaks, dtype=np.int64),
+            peak_times=np.asarray(peak_times, dtype=np.int64),
+            rr_intervals=np.asarray(rr_intervals, dtype=np.int64),
+            meta=np.array(json.dumps(meta)),
+        ))
+    except OSError:
+        # Speicher nicht beschreibbar: Ergebnis gilt nur für diesen Aufruf
+        return None
+    return path
+
+
+def _hrv_path(test_id, distance, height, store_dir, method):
+    return entry_path(test_id, distance, height, store_dir, method)[:-len(".npz")] + "_hrv.json"
+
+
+def load_hrv(test_id, source, window_s, distance=200, height=0.5, store_dir=STORE_DIR, method="threshold"):
+    """Gespeicherte HRV-Kennwerte eines Tests oder None (fehlt, andere Parameter, Datei geändert)."""
+    try:
+        with open(_hrv_path(test_id, distance, height, store_dir, method), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get("params") != _params(distance, height, method) or entry.get("window_s") != window_s:
+        return None
+    if not matches_fingerprint(entry["fingerprint"], source):
+        return None
+    return entry["hrv"]
+
+
+def save_hrv(test_id, source, hrv, window_s, distance=200, height=0.5, store_dir=STORE_DIR, method="threshold"):
+    """Legt die HRV-Kennwerte neben dem Analyse-Eintrag ab (JSON, gleiche Gültigkeitsprüfung)."""
+    path = _hrv_path(test_id, distance, height, store_dir, method)
+    entry = {
+        "test_id": test_id,
+        "params": _params(distance, height, method),
+        "window_s": window_s,
+        "fingerprint": source_fingerprint(source),
+        "hrv": hrv,
+    }
+    try:
+        os.makedirs(store_dir, exist_ok=True)
+        _write_atomically(path, lambda f: json.dump(entry, f), mode="w")
+    except OSError:
+        return None
+    return path
+
+
+if __name__ == "__main__":
+    from ekgdata import EKGdata
+
+    ekg = EKGdata.load_by_id(1)
+    ekg.find_peaks()
+    print(load_analysis(ekg.id, ekg.data)["stats"])
@@ -0,0 +1,303 @@
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from ekg_cache import fingerprint
+from ekg_signal import EKGSignal
+from ekgdata import EKGdata
+
+MAX_BYTES = int(os.environ.get("EKG_CACHE_MB", "512")) * 1024 * 1024
+# Aufnahmen, die gerade keine Session anzeigt, nur bis zu dieser Größe behalten
+MAX_IDLE_BYTES = int(os.environ.get("EKG_CACHE_IDLE_MB", "128")) * 1024 * 1024
+
+
+def estimate_size(value):
+    """Grobe Speichergröße eines Cache-Werts in Bytes."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    pd = sys.modules.get("pandas")  # ein DataFrame kann es nur geben, wenn pandas schon geladen ist
+    if pd is not None and isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=False).sum())
+    if isinstance(value, EKGSignal):
+        return value.nbytes
+    if isinstance(value, EKGdata):
+        size = estimate_size(value.signal)
+        for array in (value.peaks, value.peak_times, value._rr_intervals):
+            if array is not None:
+                size += array.nbytes
+        if value._pyramid is not None:
+            size += sum(t.nbytes + y.nbytes for t, y in value._pyramid.levels[1:])
+        return size
+    return 1024
+
+
+class ByteLRUCache:
+    """Prozessweiter LRU-Cache mit Obergrenze in Bytes und Zählern für das Monitoring.
+
+    Wird von allen Streamlit-Sessions geteilt (Modul-Instanz), daher
+    sind alle Zugriffe durch ein Lock geschützt. Sessions halten ihre
+    Einträge mit `acquire`/`release`; gehaltene Einträge werden nie
+    verdrängt, ungenutzte nur bis `max_idle_bytes` behalten.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, max_idle_bytes=MAX_IDLE_BYTES):
+        self.max_bytes = max_bytes
+        self.max_idle_bytes = max_idle_bytes
+        self._entries = OrderedDict()  # Schlüssel -> [Wert, Größe, Anzahl haltender Sessions]
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.idle_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key, acquire):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if acquire:
+                self._hold(entry)
+            return entry[0]
+
+    def get(self, key):
+        return self._lookup(key, acquire=False)
+
+    def acquire(self, key):
+        """Wie get, hält den Eintrag aber fest, bis er mit release freigegeben wird."""
+        return self._lookup(key, acquire=True)
+
+    def _hold(self, entry):
+        if entry[2] == 0:
+            self.idle_bytes -= entry[1]
+        entry[2] += 1
+
+    def put(self, key, value, size=None, acquire=False):
+        """Legt einen Wert ab und gibt den gespeicherten zurück.
+
+        Hat eine andere Session denselben Schlüssel inzwischen eingetragen,
+        bleibt deren Wert stehen, damit jede Aufnahme nur einmal im Speicher liegt.
+        """
+        size = estimate_size(value) if size is None else size
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = [value, size, 0]
+                self._entries[key] = entry
+                self.bytes += size
+                self.idle_bytes += size
+            self._entries.move_to_end(key)
+            if acquire:
+                self._hold(entry)
+            self._evict(keep=key)
+            return entry[0]
+
+    def release(self, key, value=None):
+        """Gibt einen mit acquire gehaltenen Eintrag frei.
+
+        Unbekannte Schlüssel werden ignoriert, ebenso ein inzwischen durch einen
+        neuen Wert ersetzter Eintrag, wenn `value` den gehaltenen Wert angibt.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] == 0 or (value is not None and entry[0] is not value):
+                return
+            entry[2] -= 1
+            if entry[2] == 0:
+                self.idle_bytes += entry[1]
+                self._evict()
+
+    def _evict(self, keep=None):
+        # Älteste ungenutzte Einträge verdrängen, aber nie den gerade eingefügten
+        for key in list(self._entries):
+            if self.bytes <= self.max_bytes and self.idle_bytes <= self.max_idle_bytes:
+                break
+            entry = self._entries[key]
+            if entry[2] == 0 and key != keep:
+                del self._entries[key]
+                self.bytes -= entry[1]
+                self.idle_bytes -= entry[1]
+                self.evictions += 1
+
+    def invalidate(self, predicate):
+        """Entfernt alle Einträge, deren Schlüssel `predicate` erfüllt; gibt die Anzahl zurück."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                _, size, refs = self._entries.pop(key)
+                self.bytes -= size
+                if refs == 0:
+                    self.idle_bytes -= size
+            return len(keys)
+
+    def clear(self):
+        self.invalidate(lambda key: True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "in_use": sum(1 for entry in self._entries.values() if entry[2]),
+                "bytes": self.bytes,
+                "idle_bytes": self.idle_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+recordings = ByteLRUCache()
+
+
+def ekg_key(test):
+    """Test-ID plus Fingerabdruck der Datei – eine geänderte Datei ergibt einen neuen Schlüssel."""
+    stat = fingerprint(test["result_link"])
+    return "ekg", test["id"], test["result_link"], stat["size"], stat["mtime_ns"]
+
+
+def get_ekg(test, cache=recordings, acquire=False):
+    """Gibt ein fertig ausgewertetes EKGdata-Objekt für einen Test zurück.
+
+    Das Objekt wird von allen Sessions geteilt und darf nicht verändert
+    werden (kein erneutes find_peaks mit anderen Parametern, dafür ein
+    eigenes EKGdata anlegen). acquire=True hält den Eintrag fest (siehe
+    SessionLease).
+    """
+    key = ekg_key(test)
+    ekg = cache.acquire(key) if acquire else cache.get(key)
+    if ekg is None:
+        ekg = EKGdata(test)
+        ekg.find_peaks()
+        ekg.summary()
+        ekg.pyramid  # Plot-Pyramide gleich mit aufbauen
+        ekg = cache.put(key, ekg, acquire=acquire)
+    return ekg
+
+
+def _release_all(cache, held):
+    for key, ekg in held.values():
+        cache.release(key, ekg)
+    held.clear()
+
+
+class SessionLease:
+    """Die Aufnahmen, die eine Session gerade anzeigt (eine pro Platz, z. B. Seite).
+
+    Liegt im session_state; endet die Session, wird das Objekt aufgeräumt
+    und gibt seine Einträge frei, die dann verdrängt werden dürfen.
+    """
+
+    def __init__(self, cache=recordings):
+        self.cache = cache
+        self._held = {}  # Platz -> (Cache-Schlüssel, gehaltenes EKGdata)
+        weakref.finalize(self, _release_all, cache, self._held)
+
+    def get_ekg(self, test, slot="ekg"):
+        key = ekg_key(test)
+        previous = self._held.get(slot)
+        if previous is not None and previous[0] == key and self.cache.get(key) is previous[1]:
+            return previous[1]
+        ekg = get_ekg(test, self.cache, acquire=True)
+        self._held[slot] = (key, ekg)
+        if previous is not None:
+            self.cache.release(*previous)
+        return ekg
+
+    def release(self):
+        """Alle Einträge sofort freigeben (z. B. beim Logout)."""
+        _release_all(self.cache, self._held)
+
+
+def invalidate_test(test_id, cache=recordings):
+    """Hook für neue oder geänderte EKG-Tests."""
+    return cache.invalidate(lambda key: key[0] == "ekg" and key[1] == test_id)
+
+
+def invalidate_person(person, cache=recordings):
+    """Hook für bearbeitete Personen: verwirft alle Einträge ihrer EKG-Tests."""
+    test_ids = {test["id"] for test in person.get("ekg_tests", [])}
+    return cache.invalidate(lambda key: key[0] == "ekg" and key[1] in test_ids)
+
+
+def _anonymous_rss():
+    """Privater Speicher des Prozesses (Linux: RssAnon), sonst None."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+if __name__ == "__main__":
+    import argparse
+    import gc
+    import time
+    import tracemalloc
+
+    from ekg_cache import parse_recording
+    from person_repository import get_repository
+    from recording_store import store
+
+    parser = argparse.ArgumentParser(description="Speicherbedarf von N Sessions mit und ohne gemeinsamen Speicher")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--tests", type=int, nargs="*", default=[1, 2, 3, 4], help="Test-IDs, die jede Session öffnet")
+    args = parser.parse_args()
+
+    tests = [get_repository().get_test(test_id) for test_id in args.tests]
+    for test in tests:
+        parse_recording(test["result_link"])  # Cache/Importe vorwärmen, zählt nicht mit
+
+    def private_session(test):
+        # bisheriges Verhalten: jede Session hält ihr eigenes EKGdata mit eigener Kopie des Signals
+        ekg = EKGdata(test)
+        ekg._signal = EKGSignal(*parse_recording(test["result_link"]))
+        ekg.find_peaks()
+        ekg.summary()
+        ekg.pyramid
+        return ekg
+
+    def measure(label, open_sessions):
+        gc.collect()
+        rss_before = _anonymous_rss()
+        tracemalloc.start()
+        start = time.perf_counter()
+        sessions = open_sessions()
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss = _anonymous_rss()
+        rss_text = f", RssAnon +{(rss - rss_before) / 1e6:.1f} MB" if rss is not None else ""
+        print(f"{label:<18} {args.sessions} Sessions x {len(tests)} Tests: {current / 1e6:7.1f} MB belegt "
+              f"(Spitze {peak / 1e6:.1f} MB{rss_text}), {elapsed:.2f} s")
+        return sessions
+
+    cache = ByteLRUCache(max_idle_bytes=0)  # freigegebene Aufnahmen sofort verdrängen
+
+    def leased_sessions():
+        leases = [SessionLease(cache) for _ in range(args.sessions)]
+        for lease in leases:
+            for test in tests:
+                lease.get_ekg(test, slot=test["id"])
+        return leases
+
+    # zuerst messen: freigegebener Speicher der anderen Variante würde RssAnon sonst verdecken
+    leases = measure("mit Speicher", leased_sessions)
+    print("  Cache:", cache.stats())
+    print("  Signale:", store.stats())
+    del leases
+    gc.collect()
+    print("  nach Ende aller Sessions:", cache.stats()["entries"], "Einträge,",
+          store.stats()["recordings"], "Signale")
+
+    measure("ohne Speicher", lambda: [[private_session(t) for t in tests] for _ in range(args.sessions)])
@@ -0,0 +1,176 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from analysis_store import analysis_key, load_analysis
+from ekg_archive import EXTENSION as ARCHIVE_EXTENSION
+from ekgdata import EKGdata, anomalies_from_stats
+from peak_detection import SAMPLE_RATE, detect_peaks_batch, sample_rate, stack_signals
+from person_repository import get_repository
+
+
+def tests_from_database():
+    """Alle EKG-Tests aus der Personendatenbank (mit Person als Zusatzinfo)."""
+    tests = []
+    for person in get_repository().all():
+        for test in person.get("ekg_tests", []):
+            tests.append(dict(test, person=f"{person['lastname']}, {person['firstname']}"))
+    return tests
+
+
+def tests_from_directory(directory):
+    """Alle .txt- und .ekgz-Aufnahmen eines Verzeichnisses; der Dateiname dient als Test-ID.
+
+    Gibt es zu einer Textdatei schon ein Archiv, wird nur das Archiv ausgewertet.
+    """
+    names = sorted(os.listdir(directory))
+    tests = []
+    for name in names:
+        path = os.path.join(directory, name)
+        stem, ext = os.path.splitext(name)
+        if ext == ".txt" and (name.lower() == "readme.txt" or stem + ARCHIVE_EXTENSION in names):
+            continue
+        if ext in (".txt", ARCHIVE_EXTENSION) and os.path.isfile(path):
+            tests.append({"id": stem, "date": "", "result_link": path, "person": ""})
+    return tests
+
+
+def _result_row(test, summary, samples, cached, timings):
+    row = {
+        "test_id": test["id"],
+        "person": test.get("person", ""),
+        "result_link": test["result_link"],
+        "samples": samples,
+        "avg_hr": summary["avg_hr"],
+        "min_hr": summary["min_hr"],
+        "max_hr": summary["max_hr"],
+        "std_rr": round(summary["std_rr"], 1),
+        "duration_min": summary["duration_min"],
+        "anomalies": " | ".join(summary["anomalies"]),
+        "cached": cached,
+    }
+    row.update(timings)
+    return row
+
+
+def analyze_test(test, distance=200, height=0.5):
+    """Komplette Pipeline für einen Test (läuft im Worker-Prozess)."""
+    start = time.perf_counter()
+    ekg = EKGdata(test)
+    samples = len(ekg.signal)
+    t_load = time.perf_counter()
+    ekg.find_peaks(distance, height, refresh=True)
+    t_peaks = time.perf_counter()
+    summary = ekg.summary()
+    t_stats = time.perf_counter()
+
+    timings = {
+        "t_load_s": round(t_load - start, 4),
+        "t_peaks_s": round(t_peaks - t_load, 4),
+        "t_stats_s": round(t_stats - t_peaks, 4),
+        "t_total_s": round(t_stats - start, 4),
+    }
+    return _result_row(test, summary, samples, False, timings)
+
+
+def analyze_stacked(tests, distance=200, height=0.5, method="threshold"):
+    """Alle Tests im Hauptprozess: Signale stapeln, Peaks in einem Durchgang suchen."""
+    start = time.perf_counter()
+    ekgs = [EKGdata(test) for test in tests]
+    rows, lengths = stack_signals([ekg.signal.mv for ekg in ekgs])
+    t_load = time.perf_counter()
+    rates = SAMPLE_RATE if method == "threshold" else [sample_rate(ekg.signal.ms) for ekg in ekgs]
+    all_peaks = detect_peaks_batch(rows, lengths, distance, height, method, rates)
+    t_peaks = time.perf_counter()
+
+    results = []
+    for test, ekg, peaks, samples in zip(tests, ekgs, all_peaks, lengths):
+        ekg.use_peaks(peaks, distance, height, method)
+        results.append(_result_row(test, ekg.summary(), int(samples), False, {}))
+    t_stats = time.perf_counter()
+
+    # Laufzeiten gelten für den ganzen Stapel
+    timings = {
+        "t_load_s": round(t_load - start, 4),
+        "t_peaks_s": round(t_peaks - t_load, 4),
+        "t_stats_s": round(t_stats - t_peaks, 4),
+        "t_total_s": round(t_stats - start, 4),
+    }
+    for row in results:
+        row.update(timings)
+    return results
+
+
+def cached_result(test, distance=200, height=0.5):
+    """Ergebnis aus dem Analyse-Speicher, falls es zur aktuellen Datei passt, sonst None."""
+    record = load_analysis(analysis_key(test), test["result_link"], distance, height)
+    if record is None:
+        return None
+    summary = dict(record["stats"], anomalies=anomalies_from_stats(record["stats"]))
+    return _result_row(test, summary, None, True, {})
+
+
+def run_batch(tests, workers=None, force=False, distance=200, height=0.5, stacked=False):
+    """Analysiert alle Tests parallel und gibt (Ergebnistabelle, Laufzeit in s) zurück.
+
+    stacked=True: statt eines Prozesses pro Test alle Signale als 2-D-Array
+    in einem Durchgang auswerten (lohnt sich bei vielen kurzen Aufnahmen).
+    """
+    start = time.perf_counter()
+    rows = []
+    todo = []
+    for test in tests:
+        result = None if force else cached_result(test, distance, height)
+        if result is None:
+            todo.append(test)
+        else:
+            rows.append(result)
+
+    if todo and stacked:
+        rows.extend(analyze_stacked(todo, distance, height))
+    elif todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(analyze_test, test, distance, height): test for test in todo}
+            for future in as_completed(futures):
+                try:
+                    rows.append(future.result())
+                except Exception as e:
+                    print(f"Test {futures[future]['id']}: Fehler ({e})")
+
+    elapsed = time.perf_counter() - start
+    return pd.DataFrame(rows), elapsed
+
+
+def write_results(results, output):
+    if output.endswith(".parquet"):
+        results.to_parquet(output, index=False)  # benötigt pyarrow
+    else:
+        results.to_csv(output, index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Alle EKG-Tests parallel auswerten")
+    parser.add_argument("--dir", help="Verzeichnis mit EKG-Dateien statt person_db.json")
+    parser.add_argument("--output", default="batch_results.csv", help=".csv oder .parquet")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Prozesse (Standard: alle Kerne)")
+    parser.add_argument("--force", action="store_true", help="auch aktuelle Ergebnisse neu berechnen")
+    parser.add_argument("--stacked", action="store_true",
+                        help="alle Signale gestapelt in einem Durchgang auswerten statt Prozess-Pool")
+    args = parser.parse_args()
+
+    tests = tests_from_directory(args.dir) if args.dir else tests_from_database()
+    results, elapsed = run_batch(tests, args.workers, args.force, stacked=args.stacked)
+    if results.empty:
+        print("Keine Tests ausgewertet.")
+        raise SystemExit(1)
+
+    write_results(results, args.output)
+
+    analyzed = results[~results["cached"]]
+    samples = analyzed["samples"].sum() if not analyzed.empty else 0
+    print(f"{len(results)} Tests ({len(analyzed)} berechnet, {len(results) - len(analyzed)} aus dem Cache) "
+          f"in {elapsed:.2f} s -> {args.output}")
+    print(f"Durchsatz: {len(results) / elapsed:.1f} Aufnahmen/s, {samples / elapsed:,.0f} Messwerte/s")
@@ -0,0 +1,336 @@
+"""Benchmarks für die Hot Paths der EKG-Auswertung (Wall-Time, Spitzen-Speicher, Messwerte/s).
+
+    python benchmark.py                       # mitgelieferte + synthetische Aufnahmen (1/10/60 min)
+    python benchmark.py --minutes 1 10 1440   # eigene Längen, 1440 = 24 h bei 500 Hz
+    python benchmark.py --save-baseline       # Ergebnis als Baseline für spätere Vergleiche ablegen
+    python benchmark.py --imports-only        # nur das Import-Budget prüfen
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from ekg_archive import convert, read_archive
+from ekg_cache import load_recording, parse_recording
+from ekg_realtime import RealtimeEKG
+from ekg_signal import EKGSignal
+from ekgdata import EKGdata
+from herzrate import calculate_instant_hr
+from hrv import beat_chunks, hrv_analysis
+from pdf_export import export_pdf
+from peak_detection import detect_peaks
+from person import Person
+
+SAMPLE_RATE = 500
+RESULTS_PATH = "benchmark_results.json"
+BASELINE_PATH = "benchmark_baseline.json"
+DEFAULT_MINUTES = [1, 10, 60]
+WINDOW_QUERIES = 200  # Slider-Bewegungen pro Messung im Fall window_query
+
+# Import-Zeit (ms, kalt gemessen mit `python -X importtime`) und Pakete, die beim
+# Import nicht geladen werden dürfen. login/person sind die Kopfzeilen von main.py
+# (Streamlit selbst lädt das Paket plotly, aber nicht plotly.express), app_cache
+# lädt main.py für Ärzt:innen auf jeder Seite (Cache-Statistik).
+IMPORT_BUDGETS = {
+    "person": (100, ("pandas", "scipy", "plotly.express", "reportlab")),
+    "login": (1500, ("pandas", "scipy", "plotly.express", "reportlab")),
+    "app_cache": (600, ("streamlit", "pandas", "plotly.express", "scipy")),
+    "ekgdata": (600, ("streamlit", "pandas", "plotly.express", "scipy")),
+    "herzrate": (600, ("streamlit", "pandas", "plotly.express", "scipy")),
+    "ingest_server": (600, ("streamlit", "pandas", "scipy")),
+    "peak_detection": (400, ("scipy",)),
+}
+
+
+def write_synthetic_recording(path, minutes, seed=0, chunk_seconds=600):
+    """Schreibt eine synthetische Aufnahme (500 Hz, mV <Tab> ms) blockweise auf die Platte."""
+    rng = np.random.default_rng(seed)
+    n_total = int(minutes * 60 * SAMPLE_RATE)
+    chunk = chunk_seconds * SAMPLE_RATE
+    next_beat = 0.3
+    with open(path, "w") as f:
+        for start in range(0, n_total, chunk):
+            n = min(chunk, n_total - start)
+            t = (start + np.arange(n)) / SAMPLE_RATE
+            signal = 0.05 * np.sin(2 * np.pi * 0.3 * t) + rng.normal(0, 0.02, n)
+
+            # R-Zacken als schmale Gauß-Pulse, RR um 850 ms mit etwas Variabilität
+            beats = []
+            while next_beat < t[-1] + 1:
+                beats.append(next_beat)
+                next_beat += rng.normal(0.85, 0.05)
+            for beat in beats:
+                lo = max(0, int((beat - 0.05 - t[0]) * SAMPLE_RATE))
+                hi = min(n, int((beat + 0.05 - t[0]) * SAMPLE_RATE) + 1)
+                if lo < hi:
+                    signal[lo:hi] += 1.2 * np.exp(-((t[lo:hi] - beat) / 0.012) ** 2)
+
+            ms = np.round(t * 1000).astype(np.int64)
+            pd.DataFrame({"mv": np.round(signal, 3), "ms": ms}).to_csv(f, sep="\t", header=False, index=False)
+    return n_total
+
+
+def measure(func, setup=None, repeat=5):
+    """Führt `func(setup())` mehrfach aus: Zeiten ohne, Speicher mit tracemalloc."""
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+
+    arg = setup() if setup else None
+    tracemalloc.start()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "wall_s_min": min(times),
+        "wall_s_median": statistics.median(times),
+        "peak_mb": peak / 1e6,
+    }
+
+
+def analysed(df):
+    ekg = EKGdata.from_dataframe(df)
+    ekg.find_peaks()
+    return ekg
+
+
+def pushed(df, block=50):
+    """Spielt das Signal in 100-ms-Blöcken (50 Messwerte) in einen RealtimeEKG ein."""
+    live = RealtimeEKG()
+    mv = df["Messwerte in mV"].to_numpy()
+    ms = df["Zeit in ms"].to_numpy()
+    for start in range(0, len(mv), block):
+        live.push(mv[start:start + block], ms[start:start + block])
+    live.flush()
+    return live
+
+
+def import_profile(module):
+    """Import-Zeit (ms) und alle geladenen Module eines frischen Interpreters."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    cumulative_us = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        cumulative_us[name.strip()] = int(cumulative)
+    return cumulative_us.get(module, 0) / 1000, set(cumulative_us)
+
+
+def heavy_imports(forbidden, loaded):
+    """Verbotene Pakete, die (samt Untermodulen) unter den geladenen Modulen sind."""
+    return sorted(p for p in forbidden if any(m == p or m.startswith(p + ".") for m in loaded))
+
+
+def check_imports(budgets=IMPORT_BUDGETS):
+    """Gibt alle Module zurück, die ihr Import-Budget reißen oder verbotene Pakete laden."""
+    violations = []
+    for module, (budget_ms, forbidden) in budgets.items():
+        elapsed_ms, loaded = import_profile(module)
+        heavy = heavy_imports(forbidden, loaded)
+        ok = elapsed_ms <= budget_ms and not heavy
+        print(f"  import {module:<20} {elapsed_ms:8.1f} ms (Budget {budget_ms} ms){'' if ok else '  FEHLER'}")
+        if not ok:
+            violations.append((module, elapsed_ms, budget_ms, heavy))
+    return violations
+
+
+def indexed(df):
+    """Ausgewertetes EKG mit aufgebauten Zeitindizes (wie im App-Cache nach dem ersten Aufruf)."""
+    ekg = analysed(df)
+    ekg.signal.span(0, 0)
+    ekg.beat_index
+    ekg.hr_trend
+    return ekg
+
+
+def window_queries(ekg, seconds=10, n=WINDOW_QUERIES):
+    """`n` Slider-Abfragen: Signal, R-Peaks und HR-Verlauf in einem `seconds` langen Fenster."""
+    start, end = ekg.signal.first_time, ekg.signal.last_time
+    for t0 in np.linspace(start, max(start, end - seconds * 1000), n):
+        ekg.signal.window(t0, t0 + seconds * 1000)
+        ekg.beat_index.between(t0, t0 + seconds * 1000)
+        ekg.hr_trend.between(t0 / 1000, t0 / 1000 + seconds)
+
+
+def read_csv_recording(path):
+    """Der frühere Parse-Weg über pandas.read_csv – Vergleichswert für parse_text."""
+    df = pd.read_csv(path, sep="\t", header=None, names=["Messwerte in mV", "Zeit in ms"])
+    return df["Messwerte in mV"].to_numpy(dtype=np.float32), df["Zeit in ms"].to_numpy(dtype=np.int64)
+
+
+def dataframe_bytes(path):
+    """Speicher der früheren Darstellung: DataFrame, wie pandas die Textdatei einliest (float64/int64)."""
+    df = pd.read_csv(path, sep="\t", header=None, names=["Messwerte in mV", "Zeit in ms"])
+    return int(df.memory_usage(index=False).sum())
+
+
+def cases_for(path, df, cache_dir):
+    """Die gemessenen Operationen; jede als (Name, setup, func)."""
+    person = Person({"id": 0, "firstname": "Bench", "lastname": "Mark", "date_of_birth": 1980,
+                     "picture_path": ""})
+    test = {"id": "bench", "date": "heute", "result_link": path}
+    pdf_path = os.path.join(tempfile.gettempdir(), "benchmark_bericht.pdf")
+    text_path = os.path.join(tempfile.gettempdir(), "benchmark_bericht_text.pdf")
+    archive = os.path.join(tempfile.gettempdir(), "benchmark_aufnahme.ekgz")
+
+    return [
+        ("parse_text", None, lambda _: parse_recording(path)),
+        ("parse_read_csv", None, lambda _: read_csv_recording(path)),
+        ("load_cached", None, lambda _: load_recording(path, cache_dir)),
+        ("read_archive", lambda: convert(path, archive), read_archive),
+        ("build_signal", None, lambda _: EKGSignal.from_dataframe(df)),
+        ("find_peaks", lambda: EKGdata.from_dataframe(df), lambda ekg: ekg.find_peaks()),
+        ("realtime_push", None, lambda _: pushed(df)),
+        ("pan_tompkins", None, lambda _: detect_peaks(df["Messwerte in mV"].to_numpy(), method="pan_tompkins")),
+        ("hr_statistics", lambda: analysed(df),
+         lambda ekg: (ekg.estimate_hr(), ekg.get_min_hr(), ekg.get_max_hr())),
+        ("check_for_anomalies", lambda: analysed(df), lambda ekg: ekg.check_for_anomalies()),
+        ("hrv", lambda: analysed(df), lambda ekg: hrv_analysis(beat_chunks(ekg.beat_times))),
+        ("calculate_instant_hr", None, lambda _: calculate_instant_hr(df)),
+        ("window_query", lambda: indexed(df), window_queries),
+        ("plot_full", lambda: analysed(df), lambda ekg: ekg.plot_time_series()),
+        ("plot_10s", lambda: analysed(df), lambda ekg: ekg.plot_time_series(time_range=(0, 10))),
+        ("export_pdf", lambda: analysed(df), lambda ekg: export_pdf(person, test, ekg, pdf_path)),
+        ("export_pdf_text", lambda: analysed(df), lambda ekg: export_pdf(person, test, ekg, text_path, plots=False)),
+    ]
+
+
+PDF_OUTPUTS = {"export_pdf": "benchmark_bericht.pdf", "export_pdf_text": "benchmark_bericht_text.pdf"}
+
+
+def run_dataset(name, path, repeat, cache_dir):
+    load_recording(path, cache_dir)  # Binär-Cache anlegen, damit load_cached den warmen Pfad misst
+    mv, ms = load_recording(path, cache_dir)
+    df = pd.DataFrame({"Messwerte in mV": np.array(mv), "Zeit in ms": np.array(ms)})
+    samples = len(df)
+
+    results = {}
+    for case, setup, func in cases_for(path, df, cache_dir):
+        result = measure(func, setup, repeat)
+        result["samples"] = samples
+        result["samples_per_s"] = samples / result["wall_s_min"] if result["wall_s_min"] > 0 else None
+        note = ""
+        if case in PDF_OUTPUTS:
+            result["pdf_kb"] = os.path.getsize(os.path.join(tempfile.gettempdir(), PDF_OUTPUTS[case])) / 1024
+            note = f"  PDF {result['pdf_kb']:.0f} KiB"
+        if case == "parse_read_csv" and results["parse_text"]["wall_s_min"] > 0:
+            result["speedup_parser"] = result["wall_s_min"] / results["parse_text"]["wall_s_min"]
+            note = f"  ekg_parser {result['speedup_parser']:.1f}x schneller"
+        if case == "read_archive":
+            result["archive_ratio"] = os.path.getsize(path) / os.path.getsize(
+                os.path.join(tempfile.gettempdir(), "benchmark_aufnahme.ekgz"))
+            note = f"  {result['archive_ratio']:.0f}x kleiner als die Textdatei"
+        if case == "build_signal":
+            result["signal_mb"] = EKGSignal.from_dataframe(df).nbytes / 1e6
+            result["dataframe_mb"] = dataframe_bytes(path) / 1e6
+            note = f"  Signal {result['signal_mb']:.1f} MB (DataFrame {result['dataframe_mb']:.1f} MB)"
+        if case == "window_query":
+            result["query_us"] = result["wall_s_min"] / WINDOW_QUERIES * 1e6
+            note = f"  {result['query_us']:.1f} µs pro Abfrage"
+        results[case] = result
+        print(f"  {name:<24} {case:<22} {result['wall_s_min'] * 1000:9.2f} ms "
+              f"{result['peak_mb']:9.1f} MB {result['samples_per_s'] or 0:14,.0f} Messwerte/s{note}")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Gibt alle Messungen zurück, die mehr als `tolerance` langsamer als die Baseline sind."""
+    regressions = []
+    for dataset, cases in results["datasets"].items():
+        for case, result in cases.items():
+            old = baseline.get("datasets", {}).get(dataset, {}).get(case)
+            if old is None or old["wall_s_min"] <= 0:
+                continue
+            ratio = result["wall_s_min"] / old["wall_s_min"]
+            if ratio > 1 + tolerance:
+                regressions.append((dataset, case, old["wall_s_min"], result["wall_s_min"], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks der EKG-Auswertung")
+    parser.add_argument("--minutes", type=float, nargs="*", default=DEFAULT_MINUTES,
+                        help="Längen der synthetischen Aufnahmen in Minuten")
+    parser.add_argument("--no-bundled", action="store_true", help="mitgelieferte Aufnahmen auslassen")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="erlaubte Verlangsamung (0.2 = 20 %%)")
+    parser.add_argument("--imports-only", action="store_true", help="nur Import-Zeiten prüfen")
+    args = parser.parse_args()
+
+    import_violations = check_imports()
+    for module, elapsed_ms, budget_ms, heavy in import_violations:
+        print(f"IMPORT {module}: {elapsed_ms:.1f} ms (Budget {budget_ms} ms)"
+              + (f", lädt {', '.join(heavy)}" if heavy else ""))
+    if args.imports_only:
+        return 1 if import_violations else 0
+
+    datasets = []
+    if not args.no_bundled:
+        for path in sorted(glob.glob("data/ekg_data/*.txt")):
+            if os.path.basename(path).lower() != "readme.txt":
+                datasets.append((os.path.basename(path), path))
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "datasets": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for minutes in args.minutes:
+            path = os.path.join(tmp, f"synthetic_{minutes:g}min.txt")
+            write_synthetic_recording(path, minutes)
+            datasets.append((f"synthetic_{minutes:g}min", path))
+
+        for name, path in datasets:
+            results["datasets"][name] = run_dataset(name, path, args.repeat, os.path.join(tmp, "cache"))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4)
+    print(f"Ergebnisse gespeichert: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"Baseline gespeichert: {args.baseline}")
+        return 1 if import_violations else 0
+
+    if not os.path.exists(args.baseline):
+        print("Keine Baseline vorhanden (mit --save-baseline anlegen).")
+        return 1 if import_violations else 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for dataset, case, old, new, ratio in regressions:
+        print(f"REGRESSION {dataset} / {case}: {old * 1000:.2f} ms -> {new * 1000:.2f} ms ({ratio:.2f}x)")
+    if not regressions:
+        print(f"Keine Regression gegenüber {args.baseline} (Toleranz {args.tolerance:.0%}).")
+    return 1 if regressions or import_violations else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,62 @@
+import numpy as np
+
+from ekg_signal import time_bound
+
+MAX_POINTS = 4000   # Obergrenze an Punkten, die an den Browser geschickt werden
+LEVEL_FACTOR = 4    # jede Stufe fasst 4 Buckets der vorherigen zusammen
+
+
+def minmax_decimate(t, y, bucket):
+    """Behält pro Bucket von `bucket` Punkten nur Minimum und Maximum (in zeitlicher Reihenfolge)."""
+    n_full = len(y) // bucket * bucket
+    blocks = y[:n_full].reshape(-1, bucket)
+    base = np.arange(len(blocks)) * bucket
+    i_min = blocks.argmin(axis=1) + base
+    i_max = blocks.argmax(axis=1) + base
+
+    idx = np.empty(2 * len(blocks), dtype=np.int64)
+    idx[0::2] = np.minimum(i_min, i_max)
+    idx[1::2] = np.maximum(i_min, i_max)
+
+    if n_full < len(y):
+        rest = y[n_full:]
+        tail = sorted({n_full + int(rest.argmin()), n_full + int(rest.argmax())})
+        idx = np.concatenate((idx, tail))
+    return t[idx], y[idx]
+
+
+class DecimationPyramid:
+    """Min/Max-Pyramide einer Zeitreihe für schnelles Zoomen.
+
+    Stufe 0 sind die Originaldaten (ohne Kopie), jede weitere Stufe ist um
+    `factor` gröber. Da pro Bucket Minimum und Maximum erhalten bleiben,
+    gehen R-Peaks auch in groben Stufen nicht verloren.
+    """
+
+    def __init__(self, t, y, factor=LEVEL_FACTOR, max_points=MAX_POINTS):
+        t = np.asarray(t)
+        y = np.asarray(y)
+        if len(t) > 1 and np.any(np.diff(t) < 0):
+            # Nicht monotone Zeitstempel (z. B. zusammengesetzte Aufnahmen) einmalig sortieren
+            order = np.argsort(t, kind="stable")
+            t, y = t[order], y[order]
+
+        self.max_points = max_points
+        self.levels = [(t, y)]
+        while len(self.levels[-1][0]) > max_points:
+            # Stufen ab 1 enthalten zwei Punkte pro Bucket
+            bucket = factor if len(self.levels) == 1 else 2 * factor
+            self.levels.append(minmax_decimate(*self.levels[-1], bucket))
+
+    def query(self, start=None, end=None, max_points=None):
+        """Gibt höchstens `max_points` Punkte im Bereich [start, end] zurück (Views, keine Kopie)."""
+        max_points = max_points or self.max_points
+        for t, y in self.levels:
+            lo = 0 if start is None else np.searchsorted(t, time_bound(t, start, np.ceil), side="left")
+            hi = len(t) if end is None else np.searchsorted(t, time_bound(t, end, np.floor), side="right")
+            if hi - lo <= max_points:
+                return t[lo:hi], y[lo:hi]
+
+        # Selbst die gröbste Stufe ist zu fein: Ausschnitt direkt reduzieren
+        bucket = int(np.ceil(2 * (hi - lo) / max(max_points - 2, 2)))
+        return minmax_decimate(t[lo:hi], y[lo:hi], bucket)
@@ -0,0 +1,343 @@
+"""Komprimiertes Archivformat (.ekgz) für EKG-Aufnahmen.
+
+Aufbau einer Datei (Little Endian):
+
+    b"EKGZ", Formatversion (u8), Header-Länge (u32), Header als JSON
+    Blöcke: komprimierte Deltas von mV (ganzzahlig quantisiert) und ms
+    Block-Index: Offset, Größe, Anzahl Messwerte, Datentypen, erster Wert je Block
+    Offset des Index (u64), Anzahl Blöcke (u32), b"EKGI"
+
+mV wird als ganze Zahl in Einheiten von 10^-decimals mV gespeichert; ohne
+Angabe wird die kleinste Stellenzahl gewählt, mit der die Werte exakt
+erhalten bleiben. Gleichmäßig abgetastete Zeitachsen stehen nur im Header
+(Startzeit, Schrittweite), sonst liegen die Zeitdifferenzen im Block. Jeder
+Block lässt sich über den Index einzeln lesen.
+
+    python ekg_archive.py convert data/ekg_data/*.txt --verify
+    python ekg_archive.py verify data/ekg_data/01_Ruhe.txt data/ekg_data/01_Ruhe.ekgz
+"""
+import json
+import os
+import struct
+import uuid
+import zlib
+
+import numpy as np
+
+from ekg_parser import read_recording
+from ekg_signal import uniform_step
+
+EXTENSION = ".ekgz"
+FORMAT_VERSION = 1
+MAGIC = b"EKGZ"
+INDEX_MAGIC = b"EKGI"
+BLOCK_SAMPLES = 65536   # bei 500 Hz gut 2 Minuten pro Block
+MAX_DECIMALS = 6        # feiner misst kein EKG
+CODECS = ("zlib", "lzma")
+
+_PREFIX = struct.Struct("<4sBI")
+_TRAILER = struct.Struct("<QI4s")
+_INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"), ("size", "<u4"), ("samples", "<u4"),
+    ("mv_bytes", "u1"), ("ms_bytes", "u1"),   # Breite der Deltas, 0 = keine Zeitdaten im Block
+    ("first_mv", "<i8"), ("first_ms", "<i8"),
+])
+_INT_TYPES = {1: np.int8, 2: np.int16, 4: np.int32, 8: np.int64}
+
+
+def is_archive(path):
+    return isinstance(path, (str, os.PathLike)) and os.fspath(path).lower().endswith(EXTENSION)
+
+
+def _compress(data, codec):
+    if codec == "lzma":
+        import lzma
+
+        return lzma.compress(data, preset=6)
+    return zlib.compress(data, 9)
+
+
+def _decompress(data, codec):
+    try:
+        if codec == "lzma":
+            import lzma
+
+            return lzma.decompress(data)
+        return zlib.decompress(data)
+    except Exception as e:  # zlib.error / lzma.LZMAError
+        raise ValueError(f"Archivblock beschädigt ({e})") from e
+
+
+def lossless_decimals(mv):
+    """Kleinste Stellenzahl, mit der die float32-Werte nach dem Runden exakt wieder herauskommen (sonst None)."""
+    mv = np.asarray(mv, dtype=np.float32)
+    values = mv.astype(np.float64)
+    for decimals in range(MAX_DECIMALS + 1):
+        if np.array_equal(dequantize(quantize(values, decimals), decimals), mv):
+            return decimals
+    return None
+
+
+def quantize(mv, decimals):
+    return np.round(np.asarray(mv, dtype=np.float64) * 10.0 ** decimals).astype(np.int64)
+
+
+def dequantize(q, decimals):
+    # Division wie im Parser (Mantisse / 10^Stellen), damit verlustfreie Archive bitgleich zurückkommen
+    return (q / 10.0 ** decimals).astype(np.float32) if decimals else q.astype(np.float32)
+
+
+def _deltas(values):
+    """Differenzen (erste = 0) im schmalsten passenden Ganzzahltyp."""
+    deltas = np.diff(values, prepend=values[:1])
+    lo, hi = (int(deltas.min()), int(deltas.max())) if len(deltas) else (0, 0)
+    for size, dtype in _INT_TYPES.items():
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return deltas.astype(dtype), size
+    raise AssertionError("int64-Differenzen passen immer")
+
+
+def write_archive(path, mv, ms, codec="zlib", decimals=None, block_samples=BLOCK_SAMPLES, source=None):
+    """Schreibt eine Aufnahme als .ekgz; gibt den Header zurück.
+
+    decimals=None wählt die verlustfreie Stellenzahl (höchstens MAX_DECIMALS,
+    darüber wird gerundet). source: Angaben zur Herkunft für den Header.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unbekannter Codec {codec!r} (erlaubt: {', '.join(CODECS)})")
+    mv = np.asarray(mv)
+    ms = np.asarray(ms, dtype=np.int64)
+    if len(mv) != len(ms):
+        raise ValueError(f"mV und ms haben unterschiedliche Länge ({len(mv)} / {len(ms)})")
+    if decimals is None:
+        decimals = lossless_decimals(mv)
+        if decimals is None:
+            decimals = MAX_DECIMALS
+    q = quantize(mv, decimals)
+    step = uniform_step(ms)
+    positive = np.diff(ms)
+    positive = positive[positive > 0]
+
+    header = {
+        "format": FORMAT_VERSION,
+        "samples": int(len(mv)),
+        "sample_rate_hz": round(1000 / float(positive.mean()), 3) if len(positive) else None,
+        "start_ms": int(ms[0]) if len(ms) else 0,
+        "step_ms": step,
+        "monotonic": bool(np.all(ms[1:] >= ms[:-1])),
+        "decimals": int(decimals),
+        "scale_mv": 10.0 ** -decimals,
+        "codec": codec,
+        "block_samples": int(block_samples),
+        "source": source or {},
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    n_blocks = -(-len(mv) // block_samples)
+    index = np.zeros(n_blocks, dtype=_INDEX_DTYPE)
+
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for i, start in enumerate(range(0, len(mv), block_samples)):
+            q_block = q[start:start + block_samples]
+            mv_deltas, mv_bytes = _deltas(q_block)
+            parts = [mv_deltas.tobytes()]
+            ms_bytes = 0
+            if step is None:
+                ms_deltas, ms_bytes = _deltas(ms[start:start + block_samples])
+                parts.append(ms_deltas.tobytes())
+            payload = _compress(b"".join(parts), codec)
+            index[i] = (f.tell(), len(payload), len(q_block), mv_bytes, ms_bytes,
+                        q_block[0], ms[start])
+            f.write(payload)
+        index_offset = f.tell()
+        f.write(index.tobytes())
+        f.write(_TRAILER.pack(index_offset, n_blocks, INDEX_MAGIC))
+    os.replace(tmp, path)
+    return header
+
+
+class ArchiveReader:
+    """Liest Header, Block-Index und einzelne Blöcke einer .ekgz-Datei."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            magic, version, header_size = _PREFIX.unpack(self._file.read(_PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path}: keine EKG-Archivdatei")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"{path}: Archivformat {version} wird nicht unterstützt")
+            self.header = json.loads(self._file.read(header_size).decode("utf-8"))
+            self._file.seek(-_TRAILER.size, os.SEEK_END)
+            index_offset, n_blocks, index_magic = _TRAILER.unpack(self._file.read(_TRAILER.size))
+            if index_magic != INDEX_MAGIC:
+                raise ValueError(f"{path}: Archiv unvollständig (Block-Index fehlt)")
+            self._file.seek(index_offset)
+            self.index = np.frombuffer(self._file.read(n_blocks * _INDEX_DTYPE.itemsize), dtype=_INDEX_DTYPE)
+        except struct.error as e:
+            self._file.close()
+            raise ValueError(f"{path}: Archiv unvollständig") from e
+        except Exception:
+            self._file.close()
+            raise
+        self.block_starts = np.concatenate(([0], np.cumsum(self.index["samples"], dtype=np.int64)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def __len__(self):
+        return int(self.block_starts[-1])
+
+    def block(self, i):
+        """(mV float32, ms int64) des Blocks i."""
+        entry = self.index[i]
+        self._file.seek(int(entry["offset"]))
+        data = _decompress(self._file.read(int(entry["size"])), self.header["codec"])
+        n = int(entry["samples"])
+        mv_end = n * int(entry["mv_bytes"])
+        q = np.frombuffer(data, dtype=_INT_TYPES[int(entry["mv_bytes"])], count=n)
+        q = np.cumsum(q, dtype=np.int64) + int(entry["first_mv"])
+        if entry["ms_bytes"]:
+            ms = np.frombuffer(data, dtype=_INT_TYPES[int(entry["ms_bytes"])], count=n, offset=mv_end)
+            ms = np.cumsum(ms, dtype=np.int64) + int(entry["first_ms"])
+        else:
+            start = int(self.block_starts[i])
+            ms = self.header["start_ms"] + np.arange(start, start + n, dtype=np.int64) * self.header["step_ms"]
+        return dequantize(q, self.header["decimals"]), ms
+
+    def read(self, start=0, stop=None):
+        """Messwerte [start, stop) – es werden nur die betroffenen Blöcke entpackt."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        start = max(0, min(start, stop))
+        mv = np.empty(stop - start, dtype=np.float32)
+        ms = np.empty(stop - start, dtype=np.int64)
+        first = int(np.searchsorted(self.block_starts, start, side="right")) - 1
+        for i in range(max(first, 0), len(self.index)):
+            block_start = int(self.block_starts[i])
+            if block_start >= stop:
+                break
+            block_mv, block_ms = self.block(i)
+            lo, hi = max(start, block_start), min(stop, int(self.block_starts[i + 1]))
+            mv[lo - start:hi - start] = block_mv[lo - block_start:hi - block_start]
+            ms[lo - start:hi - start] = block_ms[lo - block_start:hi - block_start]
+        return mv, ms
+
+    def window(self, start_ms, end_ms):
+        """(mV, ms) mit start_ms <= t <= end_ms; bei steigender Zeit über den Block-Index."""
+        if self.header["monotonic"]:
+            first = max(int(np.searchsorted(self.index["first_ms"], start_ms, side="right")) - 1, 0)
+            last = int(np.searchsorted(self.index["first_ms"], end_ms, side="right"))
+            mv, ms = self.read(int(self.block_starts[first]), int(self.block_starts[last]))
+        else:
+            mv, ms = self.read()
+        keep = (ms >= start_ms) & (ms <= end_ms)
+        return mv[keep], ms[keep]
+
+    def blocks(self):
+        for i in range(len(self.index)):
+            yield self.block(i)
+
+
+def read_archive(path):
+    """Ganze Aufnahme als (mV float32, ms int64)."""
+    with ArchiveReader(path) as reader:
+        return reader.read()
+
+
+def iter_archive(path):
+    """Aufnahme blockweise als (mV, ms), immer nur ein Block im Speicher."""
+    with ArchiveReader(path) as reader:
+        yield from reader.blocks()
+
+
+def archive_path(text_path):
+    return os.path.splitext(text_path)[0] + EXTENSION
+
+
+def convert(text_path, output=None, codec="zlib", decimals=None, block_samples=BLOCK_SAMPLES):
+    """Wandelt eine EKG-Textdatei in ein Archiv um (Standard: gleicher Name mit .ekgz)."""
+    from ekg_cache import file_sha256
+
+    output = output or archive_path(text_path)
+    mv, ms = read_recording(text_path)
+    source = {"name": os.path.basename(text_path), "bytes": os.path.getsize(text_path),
+              "sha256": file_sha256(text_path)}
+    write_archive(output, mv, ms, codec, decimals, block_samples, source)
+    return output
+
+
+def verify(text_path, archive):
+    """Vergleicht ein Archiv mit der Textdatei; gibt Kennzahlen zum Round-Trip zurück."""
+    mv, ms = read_recording(text_path)
+    with ArchiveReader(archive) as reader:
+        decimals = reader.header["decimals"]
+        restored_mv, restored_ms = reader.read()
+    same_length = len(mv) == len(restored_mv)
+    error = float(np.abs(restored_mv.astype(np.float64) - mv).max()) if same_length and len(mv) else 0.0
+    return {
+        "samples": len(mv),
+        "time_exact": same_length and np.array_equal(ms, restored_ms),
+        "mv_exact": same_length and np.array_equal(mv, restored_mv),
+        "max_error_mv": error if same_length else None,
+        # Rundung auf `decimals` Stellen plus float32-Auflösung
+        "error_bound_mv": 0.5 * 10.0 ** -decimals + float(np.abs(mv).max(initial=0)) * 2.0 ** -23,
+        "text_bytes": os.path.getsize(text_path),
+        "archive_bytes": os.path.getsize(archive),
+    }
+
+
+def _report(text_path, archive, result):
+    ok = result["time_exact"] and result["max_error_mv"] is not None \
+        and result["max_error_mv"] <= result["error_bound_mv"]
+    accuracy = "verlustfrei" if result["mv_exact"] else f"max. Abweichung {result['max_error_mv']:.2g} mV"
+    print(f"{text_path} -> {archive}: {result['text_bytes'] / 1e6:.2f} MB -> {result['archive_bytes'] / 1e6:.2f} MB "
+          f"({result['text_bytes'] / max(result['archive_bytes'], 1):.1f}x), {accuracy}, "
+          f"{'OK' if ok else 'FEHLER'}")
+    return ok
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description="EKG-Textdateien ins komprimierte Archivformat umwandeln und prüfen")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert_cmd = commands.add_parser("convert", help="Textdateien umwandeln (.txt -> .ekgz daneben)")
+    convert_cmd.add_argument("paths", nargs="*", help="Standard: data/ekg_data/*.txt")
+    convert_cmd.add_argument("--codec", choices=CODECS, default="zlib")
+    convert_cmd.add_argument("--decimals", type=int, default=None,
+                             help="Nachkommastellen für mV (Standard: verlustfrei)")
+    convert_cmd.add_argument("--block-samples", type=int, default=BLOCK_SAMPLES)
+    convert_cmd.add_argument("--verify", action="store_true", help="danach mit der Textdatei vergleichen")
+    verify_cmd = commands.add_parser("verify", help="Archiv mit der Textdatei vergleichen")
+    verify_cmd.add_argument("text")
+    verify_cmd.add_argument("archive")
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        sys.exit(0 if _report(args.text, args.archive, verify(args.text, args.archive)) else 1)
+
+    paths = args.paths or sorted(p for p in glob.glob("data/ekg_data/*.txt")
+                                 if os.path.basename(p).lower() != "readme.txt")
+    all_ok = True
+    for path in paths:
+        start = time.perf_counter()
+        output = convert(path, codec=args.codec, decimals=args.decimals, block_samples=args.block_samples)
+        elapsed = time.perf_counter() - start
+        if args.verify:
+            all_ok &= _report(path, output, verify(path, output))
+        else:
+            print(f"{path} -> {output}: {os.path.getsize(output) / 1e6:.2f} MB ({elapsed * 1000:.0f} ms)")
+    sys.exit(0 if all_ok else 1)
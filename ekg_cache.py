@@ -0,0 +1,188 @@
+import argparse
+import hashlib
+import json
+import os
+import uuid
+
+import numpy as np
+
+from ekg_archive import EXTENSION as ARCHIVE_EXTENSION, is_archive, read_archive
+from ekg_parser import read_recording
+from ekg_signal import compact_times
+
+CACHE_DIR = "data/cache/ekg"
+EKG_DIR = "data/ekg_data"
+CACHE_VERSION = 2  # 2: Zeitstempel als int32
+
+
+def _is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Berechnet den SHA-256 einer Datei blockweise."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path):
+    """Größe und Änderungszeit einer Datei – reicht für die schnelle Gültigkeitsprüfung."""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _cache_paths(path, cache_dir):
+    abs_path = os.path.abspath(path)
+    key = hashlib.sha1(abs_path.encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    base = os.path.join(cache_dir, f"{stem}_{key}")
+    return base + ".json", base + ".mv.npy", base + ".ms.npy"
+
+
+def parse_recording(source):
+    """Liest eine EKG-Textdatei (mV <Tab> ms) oder ein .ekgz-Archiv und gibt die beiden Spalten als Arrays zurück.
+
+    Ungültige Textdateien führen zu einem `ekg_parser.ParseError` mit Zeilennummern.
+    """
+    mv, ms = read_archive(source) if is_archive(source) else read_recording(source)
+    return mv, compact_times(ms)
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def source_fingerprint(path):
+    """Fingerabdruck inkl. Inhalts-Hash, wie er in Cache-Einträgen gespeichert wird."""
+    fp = fingerprint(path)
+    fp["sha256"] = file_sha256(path)
+    return fp
+
+
+def matches_fingerprint(stored, path):
+    """Prüft, ob ein gespeicherter Fingerabdruck noch zur Datei passt (Größe/mtime, sonst Hash)."""
+    try:
+        current = fingerprint(path)
+    except OSError:
+        return False
+    if current["size"] != stored.get("size"):
+        return False
+    if current["mtime_ns"] == stored.get("mtime_ns"):
+        return True
+    # Datei wurde nur angefasst/kopiert: Inhalt vergleichen
+    return file_sha256(path) == stored.get("sha256")
+
+
+def _is_valid(meta, path):
+    if meta is None or meta.get("version") != CACHE_VERSION:
+        return False
+    return matches_fingerprint(meta, path)
+
+
+def _replace_with(target, write, mode="wb"):
+    """Schreibt über eine temporäre Datei mit eigenem Namen und ersetzt `target` erst danach.
+
+    Report-, Annahme- und Batch-Worker bauen den Cache derselben Aufnahme
+    gleichzeitig auf; ein gemeinsamer .tmp-Name würde dabei zerschrieben.
+    """
+    tmp = f"{target}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp, mode, encoding=None if "b" in mode else "utf-8") as f:
+            write(f)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _save_array(target, array):
+    _replace_with(target, lambda f: np.save(f, array))
+
+
+def build_cache(path, cache_dir=CACHE_DIR):
+    """Parst die Datei einmal, legt mV/ms als .npy-Dateien im Cache ab und gibt sie als Memory-Map zurück."""
+    meta_path, mv_path, ms_path = _cache_paths(path, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    mv, ms = parse_recording(path)
+    _save_array(mv_path, mv)
+    _save_array(ms_path, ms)
+
+    meta = source_fingerprint(path)
+    meta.update({
+        "version": CACHE_VERSION,
+        "source": os.path.abspath(path),
+        "samples": int(len(mv)),
+    })
+    _replace_with(meta_path, lambda f: json.dump(meta, f, indent=4), mode="w")
+    # Schon beim ersten Laden die Memory-Map liefern, damit alle Prozesse dieselben Seiten nutzen
+    return np.load(mv_path, mmap_mode="r"), np.load(ms_path, mmap_mode="r")
+
+
+def cached_recording(path, cache_dir=CACHE_DIR):
+    """Gibt (mV, ms) als Memory-Map zurück, falls ein gültiger Cache existiert, sonst None."""
+    meta_path, mv_path, ms_path = _cache_paths(path, cache_dir)
+    if not _is_valid(_read_meta(meta_path), path):
+        return None
+    try:
+        return np.load(mv_path, mmap_mode="r"), np.load(ms_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+
+def load_recording(source, cache_dir=CACHE_DIR):
+    """Gibt (mV, ms) einer Aufnahme zurück.
+
+    Für Dateipfade wird der Binär-Cache benutzt (Memory-Map, kein Parsen);
+    fehlt er oder ist er veraltet, wird er neu aufgebaut. Datei-Objekte
+    (z. B. Streamlit-Uploads) werden direkt geparst.
+    """
+    if not _is_path(source):
+        return parse_recording(source)
+
+    cached = cached_recording(source, cache_dir)
+    if cached is not None:
+        return cached
+
+    try:
+        return build_cache(source, cache_dir)
+    except OSError:
+        # Cache-Verzeichnis nicht beschreibbar: ohne Cache weiterarbeiten
+        return parse_recording(source)
+
+
+def prebuild(directory=EKG_DIR, cache_dir=CACHE_DIR, force=False):
+    """Baut den Cache für alle EKG-Dateien eines Verzeichnisses auf."""
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.endswith((".txt", ARCHIVE_EXTENSION)) or not os.path.isfile(path):
+            continue
+
+        meta_path, _, _ = _cache_paths(path, cache_dir)
+        if not force and _is_valid(_read_meta(meta_path), path):
+            print(f"{name}: aktuell")
+            continue
+
+        try:
+            mv, _ = build_cache(path, cache_dir)
+        except ValueError as e:
+            print(f"{name}: übersprungen ({e})")
+            continue
+        print(f"{name}: {len(mv)} Messwerte gecacht")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Binär-Cache für EKG-Aufnahmen vorab erzeugen")
+    parser.add_argument("directory", nargs="?", default=EKG_DIR)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--force", action="store_true", help="Cache auch bei gültigem Eintrag neu bauen")
+    args = parser.parse_args()
+    prebuild(args.directory, args.cache_dir, args.force)
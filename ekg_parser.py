@@ -0,0 +1,371 @@
+"""Schneller Leser für EKG-Textdateien (mV <Tab> ms, ohne Header).
+
+Die Datei wird in Byte-Bereiche zerlegt, die jeweils an einem Zeilenende
+enden. Jeder Bereich wird mit NumPy-Operationen auf den Rohbytes zerlegt
+(Trennzeichen, Ziffern, Vorzeichen, Dezimalpunkt) und direkt in die vorab
+angelegten Ergebnis-Arrays geschrieben; große Dateien werden dabei auf
+mehrere Threads verteilt. Eine Zahl wird als ganzzahlige Mantisse und
+Anzahl Nachkommastellen gelesen und einmal geteilt – das ergibt denselben
+Wert wie `float("...")`.
+
+Geprüft wird streng, Fehler kommen mit Zeilennummer als `ParseError`:
+genau zwei Spalten pro Zeile (Leerzeilen werden übersprungen), nur Zahlen
+(Vorzeichen, Ziffern, ein Dezimalpunkt), ganzzahlige Zeitstempel, mindestens
+zwei Messwerte und auf Wunsch streng steigende Zeit. Letzteres ist nicht Standard, weil einige
+Aufnahmen eine zurückspringende Uhr haben (z. B. 04_Belastung).
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+RANGE_BYTES = 256 * 1024          # Größe eines Byte-Bereichs; die Zwischen-Arrays bleiben im CPU-Cache
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024  # kleinere Dateien liest ein Thread
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+MAX_DIGITS = 15                   # mehr Ziffern sind in float64 nicht mehr exakt
+MAX_PROBLEMS = 20                 # so viele Fehler werden gesammelt und gemeldet
+PREVIEW_BYTES = 64 * 1024
+MIN_SAMPLES = 2                   # weniger ergibt keine Zeitachse (leere Datei, nur Leerzeilen)
+
+_POW10 = 10.0 ** np.arange(MAX_DIGITS + 1)
+_POW10_INT = 10 ** np.arange(MAX_DIGITS + 1, dtype=np.int64)
+_BOM = b"\xef\xbb\xbf"
+
+
+class ParseError(ValueError):
+    """Ungültige EKG-Datei; `problems` ist eine Liste von (Zeilennummer, Beschreibung).
+
+    Zeilennummer 0 betrifft die ganze Datei.
+    """
+
+    def __init__(self, problems):
+        self.problems = sorted(problems)[:MAX_PROBLEMS]
+        text = "; ".join(f"Zeile {line}: {message}" if line else message for line, message in self.problems[:5])
+        if len(self.problems) > 5:
+            text += f" (und {len(self.problems) - 5} weitere)"
+        super().__init__(text)
+
+    def __reduce__(self):
+        # Damit der Fehler aus einem Worker-Prozess zurückkommt (Annahme-Dienst)
+        return ParseError, (self.problems,)
+
+
+def _field_values(digits, ends, length):
+    """Ganzzahliger Wert jedes Felds; Punkt und Vorzeichen zählen als Ziffer 0.
+
+    Die Felder werden rechtsbündig Spalte für Spalte aufsummiert; Stellen
+    links vom Feldanfang werden ausmaskiert.
+    """
+    position = ends - 1
+    values = digits[position].astype(np.int64)
+    for place in range(1, int(length.max()) if len(length) else 0):
+        position -= 1
+        column = digits[position]
+        column *= length > place
+        values += column * _POW10_INT[place]
+    return values
+
+
+def _parse_range(data, first_line, mv_out, ms_out, offset=None):
+    """Zerlegt einen Byte-Bereich und schreibt die Werte ab `offset` (Standard: `first_line`) in die Ausgabe.
+
+    `first_line` ist die Nummer der ersten Zeile in der Datei (0-basiert,
+    für Fehlermeldungen). Gibt die Ausgabe-Positionen der Leerzeilen zurück;
+    diese Plätze bleiben ungenutzt.
+    """
+    offset = first_line if offset is None else offset
+    b = np.frombuffer(data, dtype=np.uint8)
+    if len(b) == 0:
+        return []
+
+    def lines(positions):
+        # 1-basierte Zeilennummern in der Datei (nur für Fehlermeldungen)
+        if len(positions) == 0:
+            return []
+        newlines = np.flatnonzero(b == 10)
+        return (np.searchsorted(newlines, np.asarray(positions)[:MAX_PROBLEMS]) + first_line + 1).tolist()
+
+    def token(i):
+        return bytes(b[starts[i]:ends[i]]).decode("latin-1")
+
+    # Erlaubt: Ziffern, + - . und als Trennzeichen Tab, Leerzeichen, CR, LF
+    n_newlines = int(np.count_nonzero(b == 10))
+    punctuation = np.flatnonzero((b > 32) & (b < ord("0")))
+    marks = b[punctuation]
+    is_dot = marks == ord(".")
+    odd = punctuation[~is_dot & (marks != ord("+")) & (marks != ord("-"))]
+    control = np.count_nonzero(b < 32) - n_newlines - np.count_nonzero(b == 9) - np.count_nonzero(b == 13)
+    if b.max() > ord("9") or len(odd) or control:
+        positions = np.union1d(np.flatnonzero((b > ord("9")) | ((b < 32) & (b != 9) & (b != 10) & (b != 13))), odd)
+        raise ParseError([(line, f"ungültiges Zeichen {bytes([b[pos]])!r}")
+                          for line, pos in zip(lines(positions), positions[:MAX_PROBLEMS].tolist())])
+    n_lines = n_newlines + (1 if b[-1] != 10 else 0)
+
+    # Felder: zusammenhängende Läufe ohne Trennzeichen
+    field = np.zeros(len(b) + 2, dtype=bool)
+    np.greater(b, 32, out=field[1:-1])
+    change = np.flatnonzero(field[1:] != field[:-1])
+    starts, ends = change[0::2], change[1::2]
+    pairs = len(starts) // 2
+
+    # Aufbau: pro Zeile genau zwei Felder. Schneller Weg für "a<Tab>b<LF>" ohne Leerzeilen.
+    if (len(starts) % 2 == 0 and pairs == n_lines and starts[0] == 0
+            and np.all(starts[1:] == ends[:-1] + 1)
+            and not np.any(b[ends[0::2][:pairs - (ends[-1] == len(b))]] == 10)
+            and np.all(b[ends[1:-1:2]] == 10)):
+        pair_line = None
+    else:
+        line_at = np.cumsum(b == 10, dtype=np.int32)
+        field_line = line_at[starts]
+        if (len(starts) % 2 or np.any(field_line[0::2] != field_line[1::2])
+                or np.any(field_line[2::2] <= field_line[1:-1:2])):
+            per_line = np.bincount(field_line, minlength=n_lines)
+            wrong = np.flatnonzero((per_line != 2) & (per_line != 0))
+            raise ParseError([(first_line + int(line) + 1, f"{per_line[line]} Spalten statt 2")
+                              for line in wrong[:MAX_PROBLEMS]])
+        pair_line = field_line[0::2]
+
+    # Vorzeichen nur am Feldanfang, danach eine Ziffer (ggf. nach dem Punkt);
+    # höchstens ein Punkt je Feld, keiner in der Zeitspalte; nicht zu viele Stellen
+    length = ends - starts
+    signs = punctuation[~is_dot]
+    dots = punctuation[is_dot]
+    problems = []
+    if len(signs):
+        after = np.concatenate((b, np.zeros(2, dtype=np.uint8)))
+        is_digit = lambda chars: (chars >= ord("0")) & (chars <= ord("9"))
+        ok = field[signs] == 0   # field ist um eins verschoben: Byte davor ist ein Trennzeichen
+        ok &= is_digit(after[signs + 1]) | ((after[signs + 1] == ord(".")) & is_digit(after[signs + 2]))
+        for line, i in zip(lines(signs[~ok]), np.searchsorted(starts, signs[~ok], side="right") - 1):
+            problems.append((line, f"keine gültige Zahl: {token(i)!r}"))
+    dot_field = np.searchsorted(starts, dots, side="right") - 1
+    if len(dots):
+        wrong = np.flatnonzero((np.diff(dot_field, prepend=-1) == 0) | (length[dot_field] == 1))
+        problems += [(line, f"keine gültige Zahl: {token(dot_field[i])!r}")
+                     for line, i in zip(lines(dots[wrong]), wrong.tolist())]
+        in_time = np.flatnonzero(dot_field % 2 == 1)
+        problems += [(line, "Zeit in ms ist keine ganze Zahl") for line in lines(dots[in_time])]
+    long = np.flatnonzero(length > MAX_DIGITS)
+    long = [i for i in long.tolist() if sum(c.isdigit() for c in token(i)) > MAX_DIGITS]
+    problems += [(line, f"zu viele Stellen: {token(i)!r}") for line, i in zip(lines(starts[long]), long)]
+    if problems:
+        raise ParseError(problems)
+
+    digits = b - np.uint8(ord("0"))
+    digits *= digits < 10
+    mantissa = _field_values(digits, ends, length)
+    # Punkt mit k Nachkommastellen: V = L * 10^(k+1) + R  ->  Mantisse L * 10^k + R
+    decimals = ends[dot_field] - dots - 1
+    scale = _POW10_INT[decimals]
+    rest = mantissa[dot_field] % scale
+    mantissa[dot_field] = (mantissa[dot_field] - rest) // 10 + rest
+    if len(signs):
+        np.negative(mantissa, out=mantissa, where=b[starts] == ord("-"))
+
+    mv = mantissa[0::2].astype(np.float64)
+    mv[dot_field // 2] /= _POW10[decimals]  # eine Division: korrekt gerundet wie float()
+    ms = mantissa[1::2]
+
+    if pair_line is None:
+        mv_out[offset:offset + n_lines] = mv
+        ms_out[offset:offset + n_lines] = ms
+        return []
+    mv_out[offset + pair_line] = mv
+    ms_out[offset + pair_line] = ms
+    empty = np.ones(n_lines, dtype=bool)
+    empty[pair_line] = False
+    return (offset + np.flatnonzero(empty)).tolist()
+
+
+class _Source:
+    """Einheitlicher Zugriff auf Byte-Bereiche einer Datei oder eines Puffers."""
+
+    def __init__(self, source):
+        self._fd = None
+        self._data = None
+        if isinstance(source, (str, os.PathLike)):
+            if hasattr(os, "pread"):
+                # pread ist threadsicher und gibt beim Lesen den GIL frei
+                self._fd = os.open(source, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+                self.size = os.fstat(self._fd).st_size
+            else:
+                with open(source, "rb") as f:
+                    self._data = memoryview(f.read())
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            self._data = memoryview(source)
+        elif hasattr(source, "getvalue"):   # BytesIO, Streamlit-Upload
+            self._data = memoryview(source.getvalue())
+        else:
+            self._data = memoryview(source.read())
+        if self._data is not None:
+            self._data = self._data.cast("B")
+            self.size = len(self._data)
+        self.start = len(_BOM) if self.read(0, len(_BOM)) == _BOM else 0
+
+    def read(self, offset, length):
+        if self._fd is not None:
+            return os.pread(self._fd, length, offset)
+        return self._data[offset:offset + length]
+
+    def boundaries(self, range_bytes):
+        """Anfänge der Byte-Bereiche (plus Dateiende); jeder Bereich endet nach einem Zeilenende."""
+        cuts = [self.start]
+        position = self.start + range_bytes
+        while position < self.size:
+            # nächstes Zeilenende suchen; lange Zeilen notfalls mit weiteren Blöcken
+            while position < self.size:
+                block = bytes(self.read(position, 4096))
+                found = block.find(b"\n")
+                if found >= 0:
+                    position += found + 1
+                    break
+                position += len(block)
+            if position < self.size:
+                cuts.append(position)
+            position += range_bytes
+        cuts.append(self.size)
+        return cuts
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _count_lines(data):
+    b = np.frombuffer(data, dtype=np.uint8)
+    newlines = int(np.count_nonzero(b == 10))
+    return newlines + (1 if len(b) and b[-1] != 10 else 0)
+
+
+def _sample_lines(indices, blank):
+    """Zeilennummern (1-basiert) zu Messwert-Indizes, wenn Leerzeilen übersprungen wurden."""
+    before = np.asarray(blank) - np.arange(len(blank))  # Messwerte vor der jeweiligen Leerzeile
+    return (np.asarray(indices) + 1 + np.searchsorted(before, np.asarray(indices), side="right")).tolist()
+
+
+def check_monotonic(ms, blank=()):
+    """Wirft ParseError, wenn die Zeitstempel nicht streng steigen (mit Zeilennummern)."""
+    ms = np.asarray(ms)
+    jumps = np.flatnonzero(ms[1:] <= ms[:-1])[:MAX_PROBLEMS] + 1
+    if len(jumps):
+        raise ParseError([(line, f"Zeit {int(ms[i])} ms nicht größer als {int(ms[i - 1])} ms davor")
+                          for line, i in zip(_sample_lines(jumps, blank), jumps)])
+
+
+def read_recording(source, monotonic=False, workers=None, range_bytes=RANGE_BYTES):
+    """Liest eine Aufnahme als (mV float32, ms int64).
+
+    source: Pfad, Bytes oder Datei-Objekt. monotonic=True verlangt streng
+    steigende Zeitstempel. workers: Anzahl Threads (Standard: bis zu 8 bei
+    Dateien ab PARALLEL_MIN_BYTES, sonst einer).
+    """
+    with _Source(source) as src:
+        cuts = src.boundaries(range_bytes)
+        ranges = list(zip(cuts[:-1], cuts[1:]))
+        if workers is None:
+            workers = MAX_WORKERS if src.size >= PARALLEL_MIN_BYTES else 1
+        workers = max(1, min(workers, len(ranges)))
+
+        def count(bounds):
+            return _count_lines(src.read(bounds[0], bounds[1] - bounds[0]))
+
+        def parse(job):
+            (start, end), first_line = job
+            return _parse_range(src.read(start, end - start), first_line, mv, ms)
+
+        with ThreadPoolExecutor(workers) as pool:
+            # 1. Zeilen je Bereich zählen -> Zielposition jedes Bereichs in den Ergebnis-Arrays
+            counts = list(pool.map(count, ranges)) if workers > 1 else [count(r) for r in ranges]
+            first_lines = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(int).tolist()
+            total = int(sum(counts))
+            mv = np.empty(total, dtype=np.float32)
+            ms = np.empty(total, dtype=np.int64)
+            # 2. Bereiche parsen und direkt an ihren Platz schreiben
+            jobs = list(zip(ranges, first_lines))
+            results = pool.map(parse, jobs) if workers > 1 else map(parse, jobs)
+            blank = [line for lines in results for line in lines]
+
+    if blank:
+        mv = np.delete(mv, blank)
+        ms = np.delete(ms, blank)
+    if len(mv) < MIN_SAMPLES:
+        raise ParseError([(0, f"Die Datei enthält {len(mv)} Messwert{'' if len(mv) == 1 else 'e'}, "
+                              f"mindestens {MIN_SAMPLES} sind nötig")])
+    if monotonic:
+        check_monotonic(ms, blank)
+    return mv, ms
+
+
+def iter_recording(source, range_bytes=RANGE_BYTES):
+    """Liest eine Aufnahme bereichsweise als (mV, ms)-Blöcke, ohne die ganze Datei zu laden."""
+    with _Source(source) as src:
+        cuts = src.boundaries(range_bytes)
+        first_line = 0
+        for start, end in zip(cuts[:-1], cuts[1:]):
+            data = src.read(start, end - start)
+            n = _count_lines(data)
+            mv = np.empty(n, dtype=np.float32)
+            ms = np.empty(n, dtype=np.int64)
+            blank = _parse_range(data, first_line, mv, ms, offset=0)
+            if blank:
+                mv, ms = np.delete(mv, blank), np.delete(ms, blank)
+            first_line += n
+            yield mv, ms
+
+
+def read_head(source, lines=5):
+    """Die ersten `lines` Zeilen einer Aufnahme (für Vorschauen), streng geprüft."""
+    with _Source(source) as src:
+        data = bytes(src.read(src.start, PREVIEW_BYTES))
+    cut = 0
+    for _ in range(lines):
+        position = data.find(b"\n", cut)
+        if position < 0:
+            cut = len(data) if len(data) < PREVIEW_BYTES else cut
+            break
+        cut = position + 1
+    return read_recording(data[:cut])
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+    import time
+
+    parser = argparse.ArgumentParser(description="EKG-Textdateien prüfen und Lesezeit mit pandas.read_csv vergleichen")
+    parser.add_argument("paths", nargs="*", help="Standard: data/ekg_data/*.txt")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--monotonic", action="store_true", help="streng steigende Zeit verlangen")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    paths = args.paths or sorted(p for p in glob.glob("data/ekg_data/*.txt")
+                                 if os.path.basename(p).lower() != "readme.txt")
+    for path in paths:
+        try:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                mv, ms = read_recording(path, args.monotonic, args.workers)
+                timings.append(time.perf_counter() - start)
+        except ParseError as e:
+            print(f"{path}: ungültig – {e}")
+            continue
+        start = time.perf_counter()
+        df = pd.read_csv(path, sep="\t", header=None, names=["Messwerte in mV", "Zeit in ms"])
+        pandas_s = time.perf_counter() - start
+        same = (np.array_equal(mv, df["Messwerte in mV"].to_numpy(dtype=np.float32))
+                and np.array_equal(ms, df["Zeit in ms"].to_numpy(dtype=np.int64)))
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"{path}: {len(mv)} Zeilen, {size_mb:.1f} MB  ekg_parser {min(timings) * 1000:.1f} ms  "
+              f"read_csv {pandas_s * 1000:.1f} ms  ({pandas_s / min(timings):.1f}x)  "
+              f"{'identisch' if same else 'ABWEICHUNG'}")
@@ -0,0 +1,190 @@
+import numpy as np
+
+INT32_MAX = np.iinfo(np.int32).max
+
+
+def compact_times(ms):
+    """Zeitstempel als int32, solange sie hineinpassen (bis gut 24 Tage in ms), sonst int64."""
+    ms = np.asarray(ms)
+    if ms.dtype == np.int32:
+        return ms
+    if len(ms) == 0 or (ms.min() >= -INT32_MAX and ms.max() <= INT32_MAX):
+        return ms.astype(np.int32)
+    return ms.astype(np.int64)
+
+
+def uniform_step(ms):
+    """Abstand der Zeitstempel in ms, wenn er überall gleich (und positiv) ist, sonst None."""
+    if len(ms) < 2:
+        return None
+    step = int(ms[1]) - int(ms[0])
+    if step <= 0 or int(ms[-1]) - int(ms[0]) != step * (len(ms) - 1):
+        return None
+    return step if np.all(np.diff(ms) == step) else None
+
+
+def time_bound(times, value, round_):
+    """Grenze einer Bereichsabfrage im Typ der Zeitachse.
+
+    Sonst wandelt `np.searchsorted` bei Float-Grenzen und ganzzahliger Achse
+    die ganze Achse in float64 um (O(n) statt O(log n)).
+    """
+    if np.issubdtype(times.dtype, np.integer):
+        info = np.iinfo(times.dtype)
+        return times.dtype.type(np.clip(round_(value), info.min, info.max))
+    return value
+
+
+class TimeIndex:
+    """Zeitachse mit zugehörigen Spalten für Bereichsabfragen per Binärsuche.
+
+    Steigen die Zeitstempel monoton, bleiben Zeitachse und Spalten die
+    übergebenen Arrays und jede Abfrage liefert Views. Sonst wird einmalig
+    stabil sortiert (z. B. Aufnahmen mit zurückspringender Uhr).
+    """
+
+    __slots__ = ("times", "columns")
+
+    def __init__(self, times, *columns):
+        times = np.asarray(times)
+        columns = [np.asarray(c) for c in columns]
+        if len(times) > 1 and np.any(times[1:] < times[:-1]):
+            order = np.argsort(times, kind="stable")
+            times = times[order]
+            columns = [c[order] for c in columns]
+        self.times = times
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.times)
+
+    def _bound(self, value, round_):
+        return time_bound(self.times, value, round_)
+
+    def span(self, start=None, end=None):
+        """Positionen [lo, hi) mit start <= t <= end – O(log n)."""
+        lo = 0 if start is None else int(np.searchsorted(self.times, self._bound(start, np.ceil), side="left"))
+        hi = len(self.times) if end is None else int(np.searchsorted(self.times, self._bound(end, np.floor),
+                                                                     side="right"))
+        return lo, max(lo, hi)
+
+    def between(self, start=None, end=None):
+        """(Zeiten, *Spalten) im Bereich [start, end] als Views."""
+        lo, hi = self.span(start, end)
+        return (self.times[lo:hi], *(c[lo:hi] for c in self.columns))
+
+
+class EKGSignal:
+    """Messwerte einer Aufnahme als schlanke Arrays statt als DataFrame.
+
+    mV liegt als float32 vor (Memory-Maps aus dem Binär-Cache ohne Kopie).
+    Gleichmäßig abgetastete Aufnahmen speichern keine Zeitstempel, nur
+    Startzeit und Schrittweite; sonst als int32. Zeitausschnitte werden per
+    Binärsuche gefunden und sind Views (bei nicht monotoner Zeit auf eine
+    einmal sortierte Kopie).
+    """
+
+    __slots__ = ("mv", "_ms", "start_ms", "step_ms", "_monotonic", "_index", "__weakref__")
+
+    def __init__(self, mv, ms):
+        self.mv = np.asarray(mv, dtype=np.float32)
+        ms = np.asarray(ms)
+        if len(ms) != len(self.mv):
+            raise ValueError(f"mV und ms haben unterschiedliche Länge ({len(self.mv)} / {len(ms)})")
+        self.start_ms = int(ms[0]) if len(ms) else 0
+        self._index = None
+        self.step_ms = uniform_step(ms)
+        if self.step_ms is not None:
+            self._ms = None
+            self._monotonic = True
+        else:
+            self._ms = compact_times(ms)
+            self._monotonic = bool(np.all(self._ms[1:] >= self._ms[:-1]))
+
+    @classmethod
+    def from_dataframe(cls, df):
+        return cls(df["Messwerte in mV"].to_numpy(), df["Zeit in ms"].to_numpy())
+
+    def __len__(self):
+        return len(self.mv)
+
+    @property
+    def uniform(self):
+        return self._ms is None
+
+    @property
+    def monotonic(self):
+        return self._monotonic
+
+    @property
+    def ms(self):
+        """Alle Zeitstempel; bei gleichmäßiger Abtastung hier erst erzeugt."""
+        if self._ms is not None:
+            return self._ms
+        return self.time_at(np.arange(len(self), dtype=np.int64))
+
+    def time_at(self, index):
+        """Zeitstempel (ms) zu einem Index oder Index-Array."""
+        if self._ms is not None:
+            return self._ms[index]
+        index = np.asarray(index)
+        times = self.start_ms + (np.where(index < 0, index + len(self), index)) * self.step_ms
+        return compact_times(times) if times.ndim else int(times)
+
+    @property
+    def first_time(self):
+        return int(self.time_at(0))
+
+    @property
+    def last_time(self):
+        return int(self.time_at(len(self) - 1))
+
+    @property
+    def max_time(self):
+        if self._monotonic:
+            return self.last_time
+        return int(self._ms.max())
+
+    @property
+    def duration_ms(self):
+        return self.last_time - self.first_time if len(self) else 0
+
+    def span(self, start_ms=None, end_ms=None):
+        """Positionen [lo, hi) der Messwerte mit start_ms <= t <= end_ms in zeitlicher Reihenfolge.
+
+        Bei gleichmäßiger Abtastung O(1), sonst Binärsuche; bei monotoner Zeit
+        sind das zugleich die Indizes in `mv`.
+        """
+        if self._ms is not None:
+            return self.time_index.span(start_ms, end_ms)
+        n = len(self)
+        lo = 0 if start_ms is None else int(np.clip(np.ceil((start_ms - self.start_ms) / self.step_ms), 0, n))
+        hi = n if end_ms is None else int(np.clip(np.floor((end_ms - self.start_ms) / self.step_ms) + 1, 0, n))
+        return lo, max(lo, hi)
+
+    @property
+    def time_index(self):
+        """Binärsuch-Index über die gespeicherten Zeitstempel (bei nicht monotoner Zeit sortiert)."""
+        if self._index is None:
+            self._index = TimeIndex(self._ms, self.mv)
+        return self._index
+
+    def window(self, start_ms=None, end_ms=None):
+        """(ms, mV) im Zeitbereich per Binärsuche; Views, zeitlich sortiert."""
+        if self._ms is not None:
+            return self.time_index.between(start_ms, end_ms)
+        lo, hi = self.span(start_ms, end_ms)
+        return self.time_at(np.arange(lo, hi)), self.mv[lo:hi]
+
+    @property
+    def nbytes(self):
+        size = self.mv.nbytes + (self._ms.nbytes if self._ms is not None else 0)
+        if self._index is not None and self._index.times is not self._ms:
+            size += self._index.times.nbytes + self._index.columns[0].nbytes  # sortierte Kopie
+        return size
+
+    def to_dataframe(self):
+        """DataFrame mit den gewohnten Spalten – nur für Aufrufer, die pandas brauchen."""
+        import pandas as pd
+
+        return pd.DataFrame({"Messwerte in mV": self.mv, "Zeit in ms": self.ms}, copy=False)
@@ -0,0 +1,146 @@
+import numpy as np
+
+from ekg_archive import is_archive, iter_archive
+from ekg_cache import cached_recording
+from ekg_parser import iter_recording
+
+CHUNK_SIZE = 500_000  # Messwerte pro Block (bei 500 Hz knapp 17 Minuten)
+
+
+def iter_chunks(source, chunk_size=CHUNK_SIZE):
+    """Liest eine EKG-Aufnahme blockweise als (mV, ms)-Arrays.
+
+    Liegt ein gültiger Binär-Cache vor, werden Ausschnitte der Memory-Map
+    geliefert, sonst wird die Textdatei stückweise geparst bzw. das Archiv
+    blockweise entpackt. Es ist nie mehr als ein Block im Speicher.
+    """
+    cached = cached_recording(source) if isinstance(source, str) else None
+    if cached is not None:
+        mv, ms = cached
+        for start in range(0, len(mv), chunk_size):
+            yield mv[start:start + chunk_size], ms[start:start + chunk_size]
+        return
+
+    # Byte-Bereiche des Parsers bzw. Archiv-Blöcke zu Blöcken von genau chunk_size Messwerten zusammenfassen
+    pending_mv, pending_ms, pending = [], [], 0
+    for mv, ms in (iter_archive(source) if is_archive(source) else iter_recording(source)):
+        pending_mv.append(mv)
+        pending_ms.append(ms)
+        pending += len(mv)
+        if pending >= chunk_size:
+            mv, ms = np.concatenate(pending_mv), np.concatenate(pending_ms)
+            full = len(mv) - len(mv) % chunk_size
+            for start in range(0, full, chunk_size):
+                yield mv[start:start + chunk_size], ms[start:start + chunk_size]
+            pending_mv, pending_ms, pending = [mv[full:]], [ms[full:]], len(mv) - full
+    if pending:
+        yield np.concatenate(pending_mv), np.concatenate(pending_ms)
+
+
+class BeatStream:
+    """R-Peak-Erkennung über eine Aufnahme, ohne das ganze Signal zu laden.
+
+    Die Blöcke überlappen sich, damit die Refraktärzeit (`distance`) auch an
+    Blockgrenzen gilt. Ausgegeben wird jeweils bis zu einem "Anker": einem Peak,
+    der im Umkreis von `distance` eindeutig am höchsten ist. Ein solcher Peak
+    bleibt bei `scipy.signal.find_peaks` immer erhalten und verdrängt alle
+    Nachbarn, die Entscheidungen links und rechts davon sind also unabhängig.
+    Das Ergebnis entspricht damit dem auf dem Gesamtsignal, bis auf Fälle mit
+    gleich hohen Peaks im Abstand < `distance` – deren Reihenfolge legt auch
+    scipy nicht fest, bei ganzzahligen Messwerten kann das wenige Schläge
+    Unterschied ausmachen. Mit der Standard-Blockgröße passen die
+    mitgelieferten Aufnahmen in einen Block und es bleibt bei gleich hohen
+    Messwerten desselben Schlags; mit kleinen Blöcken weicht die Anzahl um bis
+    zu 0,5 % ab (04_Belastung, 401 Messwerte pro Block: 1289 statt 1285).
+    tests/test_ekg_stream.py hält beide Grenzen fest.
+    """
+
+    def __init__(self, source, distance=200, height=0.5, chunk_size=CHUNK_SIZE):
+        self.source = source
+        self.distance = distance
+        self.height = height
+        self.chunk_size = max(chunk_size, 2 * distance + 1)
+        self.samples = 0
+        self.first_time = None
+        self.last_time = None
+
+    def _find_anchor(self, signal, peaks):
+        """Index (in `peaks`) des letzten Ankers mit vollständiger rechter Umgebung, sonst None."""
+        for i in range(len(peaks) - 1, -1, -1):
+            peak = peaks[i]
+            if peak + self.distance >= len(signal):
+                continue
+            if peak < self.distance:
+                return None
+            window = signal[peak - self.distance:peak + self.distance + 1]
+            if np.count_nonzero(window >= signal[peak]) == 1:
+                return i
+        return None
+
+    def __iter__(self):
+        """Liefert (Index, Zeit in ms) jedes erkannten R-Peaks."""
+        from scipy.signal import find_peaks
+
+        buffer_mv = np.empty(0, dtype=np.float32)
+        buffer_ms = np.empty(0, dtype=np.int64)
+        buffer_start = 0     # globaler Index von buffer_mv[0]
+        accepted_until = 0   # Peaks vor diesem globalen Index sind schon ausgegeben
+        self.samples = 0
+        self.first_time = None
+        self.last_time = None
+
+        for mv, ms in iter_chunks(self.source, self.chunk_size):
+            if len(mv) == 0:
+                continue
+            if self.first_time is None:
+                self.first_time = int(ms[0])
+            self.last_time = int(ms[-1])
+            self.samples += len(mv)
+
+            buffer_mv = np.concatenate((buffer_mv, mv))
+            buffer_ms = np.concatenate((buffer_ms, ms))
+
+            peaks, _ = find_peaks(buffer_mv, distance=self.distance, height=self.height)
+            anchor = self._find_anchor(buffer_mv, peaks)
+            if anchor is not None:
+                cut = peaks[anchor]
+                final = peaks[:anchor + 1]
+            elif len(buffer_mv) > 4 * self.chunk_size:
+                # Kein Anker (z. B. flaches Signal): Speicher begrenzen und
+                # nur Peaks mit vollständiger Umgebung ausgeben
+                cut = len(buffer_mv) - self.distance
+                final = peaks[peaks < cut]
+            else:
+                continue
+
+            for peak in final[final + buffer_start >= accepted_until]:
+                yield buffer_start + int(peak), int(buffer_ms[peak])
+
+            # Überlappung behalten: ab einer Refraktärzeit vor dem Anker
+            accepted_until = buffer_start + cut + 1
+            keep_from = max(0, cut - self.distance)
+            buffer_mv = buffer_mv[keep_from:]
+            buffer_ms = buffer_ms[keep_from:]
+            buffer_start += keep_from
+
+        if len(buffer_mv) > 0:
+            peaks, _ = find_peaks(buffer_mv, distance=self.distance, height=self.height)
+            for peak in peaks[peaks + buffer_start >= accepted_until]:
+                yield buffer_start + int(peak), int(buffer_ms[peak])
+
+    def rr_intervals(self):
+        """Liefert die RR-Intervalle in ms nacheinander."""
+        previous = None
+        for _, time_ms in self:
+            if previous is not None:
+                yield time_ms - previous
+            previous = time_ms
+
+
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "data/ekg_data/01_Ruhe.txt"
+    stream = BeatStream(path)
+    beats = sum(1 for _ in stream)
+    print(f"{path}: {beats} Herzschläge in {stream.samples} Messwerten")
@@ -1,110 +1,300 @@
-import json
-import pandas as pd
-import plotly.express as px
+import os
 import numpy as np
-from scipy.signal import find_peaks
+from ekg_cache import load_recording
+from ekg_signal import EKGSignal, TimeIndex
+from recording_store import shared_signal
+from herzrate import HRTrend
+from hrv import WINDOW_S, beat_chunks, hrv_analysis
+from analysis_store import analysis_key, load_analysis, load_hrv, save_analysis, save_hrv
+from ekg_stream import BeatStream
+from peak_detection import SAMPLE_RATE, detect_peaks, sample_rate
+from decimation import DecimationPyramid, MAX_POINTS
+from person_repository import get_repository
+
+
+def hr_statistics(rr_intervals):
+    """Berechnet alle Herzfrequenz-Kennwerte aus den RR-Intervallen (ms) in einem Durchgang."""
+    rr_intervals = np.asarray(rr_intervals)
+    if len(rr_intervals) == 0:
+        return {"avg_hr": 0, "min_hr": 0, "max_hr": 0, "std_rr": 0.0}
+
+    mean_rr = rr_intervals.mean()
+    min_rr = rr_intervals.min()  # kleinstes RR Intervall = maximale HR
+    max_rr = rr_intervals.max()  # größtes RR Intervall = minimale HR
+    return {
+        "avg_hr": round(float(60000 / mean_rr), 1) if mean_rr > 0 else 0,
+        "min_hr": round(float(60000 / max_rr), 1) if max_rr > 0 else 0,
+        "max_hr": round(float(60000 / min_rr), 1) if min_rr > 0 else 0,
+        "std_rr": float(rr_intervals.std()) if len(rr_intervals) > 1 else 0.0,
+    }
+
+
+def anomalies_from_stats(stats):
+    """Gibt Warnungen zurück, falls die Kennwerte auffällig sind."""
+    anomalies = []
+
+    # 1. Durchschnitt zu hoch oder zu niedrig
+    if stats["avg_hr"] > 100:
+        anomalies.append("⚠️ Verdacht auf Tachykardie (durchschnittliche HR > 100 bpm)")
+    elif stats["avg_hr"] < 50:
+        anomalies.append("⚠️ Verdacht auf Bradykardie (durchschnittliche HR < 50 bpm)")
+
+    # 2. Extremwerte außerhalb normaler Bandbreite
+    if stats["max_hr"] > 160:
+        anomalies.append("⚠️ Sehr hohe Spitzen-Herzfrequenz (> 160 bpm)")
+    if stats["min_hr"] < 40:
+        anomalies.append("⚠️ Sehr niedrige minimale Herzfrequenz (< 40 bpm)")
+
+    # 3. Unregelmäßige RR-Intervalle
+    if stats["std_rr"] > 100:
+        anomalies.append("⚠️ Unregelmäßiger Herzrhythmus (hohe Schwankung in RR-Intervallen)")
+
+    return anomalies
+
 
 class EKGdata:
 
-    def __init__(self, ekg_dict):
+    def __init__(self, ekg_dict, streaming=False):
         self.id = ekg_dict["id"]
         self.date = ekg_dict["date"]
         self.data = ekg_dict["result_link"]
-        self.df = pd.read_csv(self.data, sep='\t', header=None, names=['Messwerte in mV', 'Zeit in ms'])
+        self.sha256 = ekg_dict.get("sha256")
+        self._store_key = analysis_key(ekg_dict)
+        # streaming=True: Peaks blockweise suchen, ohne das ganze Signal zu laden
+        self.streaming = streaming
+        self._time_span = None
+        self._signal = None
+        self._signal_replaced = False
+        self._pyramid = None
         self.peaks = None
+        self.peak_times = None
         self.hr = None
+        self._rr_intervals = None
+        self._stats = None
+        self._beat_index = None
+        self._hr_trend = None
+        self._hrv = None
+        self._params = (200, 0.5, "threshold")  # Parameter der aktuellen Peaks
+
+    @property
+    def signal(self):
+        # Rohdaten erst laden, wenn sie wirklich gebraucht werden –
+        # gespeicherte Analyseergebnisse kommen ohne das Signal aus
+        if self._signal is None:
+            if isinstance(self.data, (str, os.PathLike)):
+                # eine gemeinsame, schreibgeschützte Kopie pro Datei und Prozess
+                self._signal = shared_signal(self.data)
+            else:
+                self._signal = EKGSignal(*load_recording(self.data))
+        return self._signal
+
+    @signal.setter
+    def signal(self, signal):
+        self._signal = signal
+        self._signal_replaced = True
+        self._pyramid = None
+        self._reset_analysis()
+
+    @property
+    def df(self):
+        """Das Signal als DataFrame (wird bei jedem Zugriff neu aufgebaut, intern nicht benutzt)."""
+        return self.signal.to_dataframe()
+
+    @df.setter
+    def df(self, df):
+        self.signal = EKGSignal.from_dataframe(df)
 
     @staticmethod
     def load_by_id(test_id):
-        with open("data/person_db.json", "r") as file:
-            data = json.load(file)
-
-        for person in data:
-            for test in person.get("ekg_tests", []):
-                if test["id"] == test_id:
-                    return EKGdata(test)
+        test = get_repository().get_test(test_id)
+        if test is not None:
+            return EKGdata(test)
 
         return None
 
-    def find_peaks(self, distance=200, height=0.5):
-        signal = self.df['Messwerte in mV']
-        peaks, _ = find_peaks(signal, distance=distance, height=height)
+    @staticmethod
+    def from_dataframe(df, test_id="custom", date="heute"):
+        """Erzeugt ein EKGdata-Objekt aus bereits eingelesenen Daten (z. B. Upload)."""
+        return EKGdata.from_arrays(df["Messwerte in mV"].to_numpy(), df["Zeit in ms"].to_numpy(), test_id, date)
+
+    @staticmethod
+    def from_arrays(mv, ms, test_id="custom", date="heute"):
+        """Wie from_dataframe, aber direkt aus den beiden Arrays (ohne pandas)."""
+        ekg = EKGdata({"id": test_id, "date": date, "result_link": None})
+        ekg.signal = EKGSignal(mv, ms)
+        return ekg
+
+    def _reset_analysis(self):
+        self.peaks = None
+        self.peak_times = None
+        self.hr = None
+        self._rr_intervals = None
+        self._stats = None
+        self._beat_index = None
+        self._hr_trend = None
+        self._hrv = None
+
+    def _is_storable(self):
+        return not self._signal_replaced and isinstance(self.data, (str, os.PathLike))
+
+    def find_peaks(self, distance=200, height=0.5, refresh=False, method="threshold"):
+        # refresh=True: gespeicherte Ergebnisse ignorieren und neu berechnen
+        # method="pan_tompkins": Band-Pass + adaptive Schwelle (siehe peak_detection)
+        self._reset_analysis()
+        self._params = (distance, height, method)
+        storable = self._is_storable()
+        if storable and not refresh:
+            record = load_analysis(self._store_key, self.data, distance, height, method=method)
+            if record is not None:
+                self.peaks = record["peaks"]
+                self.peak_times = record["peak_times"]
+                self._rr_intervals = record["rr_intervals"]
+                self._stats = record["stats"]
+                return self.peaks
+
+        if self.streaming and self._signal is None and method == "threshold":
+            stream = BeatStream(self.data, distance, height)
+            beats = np.array(list(stream), dtype=np.int64).reshape(-1, 2)
+            self._time_span = (stream.first_time, stream.last_time)
+            return self.use_peaks(beats[:, 0], distance, height, method, peak_times=beats[:, 1])
+
+        # Pan-Tompkins filtert in Hz: Abtastrate aus der Zeitachse (z. B. 250 Hz bei 4-ms-Schritten)
+        fs = SAMPLE_RATE if method == "threshold" else sample_rate(self.signal.ms)
+        peaks = detect_peaks(self.signal.mv, distance, height, method, fs)
+        return self.use_peaks(peaks, distance, height, method)
+
+    def use_peaks(self, peaks, distance=200, height=0.5, method="threshold", peak_times=None):
+        """Übernimmt anderswo erkannte Peaks (z. B. aus detect_peaks_batch) und speichert sie."""
+        self._reset_analysis()
+        self._params = (distance, height, method)
         self.peaks = peaks
+        if peak_times is None:
+            peak_times = self.signal.time_at(peaks)
+        self.peak_times = peak_times
+
+        if self._is_storable():
+            save_analysis(self._store_key, self.data, peaks, self.peak_times, self.rr_intervals,
+                          self._compute_stats(), distance, height, method=method)
         return peaks
 
-    def estimate_hr(self):
+    @property
+    def beat_times(self):
+        """Zeitpunkte der erkannten R-Peaks in ms (NumPy-Array)."""
         if self.peaks is None:
             self.find_peaks()
+        return self.peak_times
 
-        times_ms = self.df["Zeit in ms"].iloc[self.peaks].values
-        rr_intervals_ms = np.diff(times_ms)
-        mean_rr = np.mean(rr_intervals_ms)
-        self.hr = 60000 / mean_rr if mean_rr > 0 else 0
-        return round(self.hr, 1)
+    @property
+    def beat_index(self):
+        """Zeitindex über die R-Peaks: `beat_index.between(t0, t1)` gibt (Zeiten, Indizes) als Views."""
+        if self._beat_index is None:
+            self._beat_index = TimeIndex(self.beat_times, self.peaks)
+        return self._beat_index
 
-    def get_min_hr(self):
-        # Beispiel: minimale Herzfrequenz anhand minimalen RR Intervalls berechnen
+    @property
+    def hr_trend(self):
+        """Gleitende Herzfrequenz mit Zeitindex (für Slider und PDF), einmal pro Auswertung."""
+        if self._hr_trend is None:
+            self._hr_trend = HRTrend.from_peak_times(self.beat_times)
+        return self._hr_trend
+
+    def hrv(self, window_s=WINDOW_S):
+        """HRV-Kennwerte (gesamt und pro Fenster), gespeichert wie die übrigen Analyseergebnisse."""
+        if self._hrv is not None and self._hrv["window_s"] == window_s:
+            return self._hrv
+        times = self.beat_times
+        distance, height, method = self._params
+        result = None
+        if self._is_storable():
+            result = load_hrv(self._store_key, self.data, window_s, distance, height, method=method)
+        if result is None:
+            result = hrv_analysis(beat_chunks(times), window_s)
+            if self._is_storable():
+                save_hrv(self._store_key, self.data, result, window_s, distance, height, method=method)
+        self._hrv = result
+        return result
+
+    @property
+    def rr_intervals(self):
+        """RR-Intervalle in ms – einmal berechnet, bis find_peaks erneut läuft."""
+        if self._rr_intervals is None:
+            self._rr_intervals = np.diff(self.beat_times)
+        return self._rr_intervals
+
+    def _compute_stats(self):
         if self.peaks is None:
             self.find_peaks()
-        times_ms = self.df["Zeit in ms"].iloc[self.peaks].values
-        rr_intervals_ms = np.diff(times_ms)
-        if len(rr_intervals_ms) == 0:
-            return 0
-        min_rr = np.max(rr_intervals_ms)  # größtes RR Intervall = minimale HR
-        min_hr = 60000 / min_rr if min_rr > 0 else 0
-        return round(min_hr, 1)
+        if self._stats is None:
+            self._stats = hr_statistics(self.rr_intervals)
+            self._stats["duration_min"] = self._duration_from_signal()
+        return self._stats
+
+    def summary(self):
+        """Alle Herzfrequenz-Kennwerte und Auffälligkeiten in einem Aufruf."""
+        summary = dict(self._compute_stats())
+        summary["anomalies"] = anomalies_from_stats(summary)
+        self.hr = summary["avg_hr"]
+        return summary
+
+    def estimate_hr(self):
+        return self.summary()["avg_hr"]
+
+    def get_min_hr(self):
+        return self.summary()["min_hr"]
 
     def get_max_hr(self):
-        # Beispiel: maximale Herzfrequenz anhand maximalen RR Intervalls berechnen
-        if self.peaks is None:
-            self.find_peaks()
-        times_ms = self.df["Zeit in ms"].iloc[self.peaks].values
-        rr_intervals_ms = np.diff(times_ms)
-        if len(rr_intervals_ms) == 0:
-            return 0
-        max_rr = np.min(rr_intervals_ms)  # kleinstes RR Intervall = maximale HR
-        max_hr = 60000 / max_rr if max_rr > 0 else 0
-        return round(max_hr, 1)
+        return self.summary()["max_hr"]
 
-    def get_signal_duration_min(self):
-        start_time = self.df["Zeit in ms"].iloc[0]
-        end_time = self.df["Zeit in ms"].iloc[-1]
+    def _duration_from_signal(self):
+        if self._time_span is not None and self._signal is None:
+            start_time, end_time = self._time_span
+        else:
+            start_time, end_time = self.signal.first_time, self.signal.last_time
         duration_min = (end_time - start_time) / 60000  # ms zu Minuten
-        return round(duration_min, 2)
+        return round(float(duration_min), 2)
+
+    def get_signal_duration_min(self):
+        if self._stats is not None:
+            return self._stats["duration_min"]
+        return self._duration_from_signal()
 
-    def plot_time_series(self, time_range=None):
-        df = self.df.copy()
+    @property
+    def pyramid(self):
+        """Min/Max-Pyramide des Signals für die Darstellung, einmal pro Aufnahme aufgebaut."""
+        if self._pyramid is None:
+            self._pyramid = DecimationPyramid(*self.signal.window())
+        return self._pyramid
 
-        start_time = df["Zeit in ms"].iloc[0]
-        df["Zeit in ms"] = df["Zeit in ms"] - start_time
-        df["Zeit in s"] = df["Zeit in ms"] / 1000
+    def plot_time_series(self, time_range=None, max_points=MAX_POINTS, title="EKG Zeitreihe"):
+        start_time = self.signal.first_time
 
-    # Zeitbereich filtern, wenn angegeben
+    # Zeitbereich filtern, wenn angegeben (in ms, relativ zum Start)
         if time_range is not None:
-            start_sec, end_sec = time_range
-            df = df[(df["Zeit in s"] >= start_sec) & (df["Zeit in s"] <= end_sec)]
+            start_ms = start_time + time_range[0] * 1000
+            end_ms = start_time + time_range[1] * 1000
+            lo, hi = self.signal.span(start_ms, end_ms)
+            if hi - lo <= max_points:
+                # Kurzer Ausschnitt (z. B. 10 s): direkt aus dem Signal, ohne die Pyramide aufzubauen
+                times_ms, values = self.signal.window(start_ms, end_ms)
+            else:
+                times_ms, values = self.pyramid.query(start_ms, end_ms, max_points)
+        else:
+            start_ms = end_ms = None
+            times_ms, values = self.pyramid.query(max_points=max_points)
 
-        fig = px.line(df, x="Zeit in s", y="Messwerte in mV", title="EKG Zeitreihe")
+        import plotly.express as px  # erst hier: die Analyse selbst braucht kein Plotly
+
+        fig = px.line(x=(times_ms - start_time) / 1000, y=values, title=title)
 
     # Peaks berechnen für den gesamten Datensatz (relativ zur Zeit in Sekunden)
         if self.peaks is not None:
-        # Ursprüngliche Zeitreihe berechnen (absolut)
-            peak_times_ms = self.df["Zeit in ms"].iloc[self.peaks].values
-            peak_times_sec = (peak_times_ms - start_time) / 1000
-            peak_values = self.df["Messwerte in mV"].iloc[self.peaks].values
-
-            peaks_df = pd.DataFrame({
-                "Zeit in s": peak_times_sec,
-                "Messwerte in mV": peak_values
-            })
-
-        # Optional: auf Zeitbereich beschränken
-            if time_range is not None:
-                peaks_df = peaks_df[(peaks_df["Zeit in s"] >= start_sec) & (peaks_df["Zeit in s"] <= end_sec)]
+            peak_times, peaks = self.beat_index.between(start_ms, end_ms)
+            peak_times_sec = (peak_times - start_time) / 1000
+            peak_values = self.signal.mv[peaks]
 
             fig.add_scatter(
-                x=peaks_df["Zeit in s"],
-                y=peaks_df["Messwerte in mV"],
+                x=peak_times_sec,
+                y=peak_values,
                 mode='markers',
                 marker=dict(color='red', size=6),
                 name="Peaks"
@@ -115,36 +305,7 @@ class EKGdata:
 
     def check_for_anomalies(self):
         """Gibt Warnungen zurück, falls auffällige Werte erkannt werden."""
-        if self.peaks is None:
-            self.find_peaks()
-
-        anomalies = []
-
-        avg_hr = self.estimate_hr()
-        min_hr = self.get_min_hr()
-        max_hr = self.get_max_hr()
-
-        # 1. Durchschnitt zu hoch oder zu niedrig
-        if avg_hr > 100:
-            anomalies.append("⚠️ Verdacht auf Tachykardie (durchschnittliche HR > 100 bpm)")
-        elif avg_hr < 50:
-            anomalies.append("⚠️ Verdacht auf Bradykardie (durchschnittliche HR < 50 bpm)")
-
-        # 2. Extremwerte außerhalb normaler Bandbreite
-        if max_hr > 160:
-            anomalies.append("⚠️ Sehr hohe Spitzen-Herzfrequenz (> 160 bpm)")
-        if min_hr < 40:
-            anomalies.append("⚠️ Sehr niedrige minimale Herzfrequenz (< 40 bpm)")
-
-        # 3. Unregelmäßige RR-Intervalle
-        times_ms = self.df["Zeit in ms"].iloc[self.peaks].values
-        rr_intervals = np.diff(times_ms)
-        if len(rr_intervals) > 1:
-            std_rr = np.std(rr_intervals)
-            if std_rr > 100:
-                anomalies.append("⚠️ Unregelmäßiger Herzrhythmus (hohe Schwankung in RR-Intervallen)")
-
-        return anomalies
+        return self.summary()["anomalies"]
 
 
 
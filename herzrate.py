@@ -1,16 +1,18 @@
-import pandas as pd
 import numpy as np
-import plotly.express as px
-import streamlit as st
-from scipy.signal import find_peaks
+from ekg_signal import TimeIndex
+from peak_detection import detect_peaks
 
 
-def calculate_instant_hr(df, peak_distance=200):
-    peaks, _ = find_peaks(df["Messwerte in mV"], distance=peak_distance, height=0.5)
-    peak_times = df["Zeit in ms"].iloc[peaks].values
+def calculate_instant_hr(df=None, peak_distance=200, peak_times=None):
+    import pandas as pd  # erst hier, damit `import ekgdata` ohne pandas auskommt
+
+    # Bereits bekannte Peak-Zeitpunkte (z. B. aus EKGdata.find_peaks) wiederverwenden
+    if peak_times is None:
+        peaks = detect_peaks(df["Messwerte in mV"].to_numpy(), distance=peak_distance, height=0.5)
+        peak_times = df["Zeit in ms"].to_numpy()[peaks]
 
     if len(peak_times) < 2:
-        return pd.DataFrame(columns=["Zeit in s", "Herzfrequenz"])
+        return pd.DataFrame(columns=["Zeit in s", "Herzfrequenz", "HR_gemittelt"], dtype=float)
 
     rr_intervals = np.diff(peak_times)
     hr_values = 60000 / rr_intervals
@@ -21,15 +23,49 @@ def calculate_instant_hr(df, peak_distance=200):
     return hr_df
 
 
-def interactive_hr_plot(df):
-    hr_df = calculate_instant_hr(df)
+class HRTrend:
+    """HR-Verlauf mit Zeitindex: einmal berechnet, danach jeder Zeitausschnitt per Binärsuche."""
+
+    __slots__ = ("df", "index")
+
+    def __init__(self, hr_df):
+        self.index = TimeIndex(hr_df["Zeit in s"].to_numpy(), np.arange(len(hr_df)))
+        order = self.index.columns[0]
+        # Zeilen zeitlich sortiert ablegen (nur bei zurückspringenden Zeitstempeln eine Kopie)
+        if len(order) and np.any(order[1:] < order[:-1]):
+            hr_df = hr_df.iloc[order].reset_index(drop=True)
+        self.df = hr_df
+
+    @classmethod
+    def from_peak_times(cls, peak_times):
+        return cls(calculate_instant_hr(peak_times=peak_times))
+
+    @property
+    def empty(self):
+        return self.df.empty
+
+    def between(self, start_s=None, end_s=None):
+        """Zeilen mit start_s <= Zeit <= end_s (Slice, keine Maske über den ganzen Verlauf)."""
+        lo, hi = self.index.span(start_s, end_s)
+        return self.df.iloc[lo:hi]
+
+
+def interactive_hr_plot(df=None, peak_times=None, trend=None):
+    # trend: bereits berechneter HRTrend (z. B. EKGdata.hr_trend), sonst aus df/peak_times
+    # UI-Bibliotheken nur hier, damit calculate_instant_hr auch ohne Streamlit nutzbar ist
+    import plotly.express as px
+    import streamlit as st
+
+    if trend is None:
+        trend = HRTrend(calculate_instant_hr(df, peak_times=peak_times))
+    hr_df = trend.df
 
     if hr_df.empty:
         st.warning("Nicht genügend Peaks für Herzfrequenzberechnung gefunden.")
         return
 
-    min_time = float(hr_df["Zeit in s"].min())
-    max_time = float(hr_df["Zeit in s"].max())
+    min_time = float(trend.index.times[0])
+    max_time = float(trend.index.times[-1])
 
     # Zeit-Slider anzeigen
     time_range = st.slider(
@@ -41,7 +77,7 @@ def interactive_hr_plot(df):
     )
 
     # Daten filtern
-    hr_filtered = hr_df[(hr_df["Zeit in s"] >= time_range[0]) & (hr_df["Zeit in s"] <= time_range[1])]
+    hr_filtered = trend.between(*time_range)
 
     # Plot anzeigen
     fig = px.line(
@@ -0,0 +1,216 @@
+"""Herzratenvariabilität (HRV) aus den R-Peaks von EKGdata.
+
+Zeitbereich: SDNN, RMSSD, pNN50, Poincaré SD1/SD2.
+Frequenzbereich: LF (0,04–0,15 Hz) und HF (0,15–0,4 Hz) per Lomb-Scargle
+direkt auf den unregelmäßig liegenden RR-Intervallen (kein Resampling).
+
+Lange Aufnahmen werden in Fenstern (Standard 5 Minuten) ausgewertet. Die
+Schlagzeiten dürfen blockweise ankommen (z. B. aus `ekg_stream.BeatStream`);
+im Speicher liegt immer nur das aktuelle Fenster. Die Kennwerte der ganzen
+Aufnahme entstehen aus laufenden Summen, LF/HF als Mittel der Fenster.
+"""
+import numpy as np
+
+WINDOW_S = 300               # Fensterlänge in Sekunden (Kurzzeit-HRV nach Task Force 1996)
+RR_MIN_MS, RR_MAX_MS = 250, 2000   # plausible RR-Intervalle (30–240 bpm), Rest gilt als Artefakt
+LF_BAND = (0.04, 0.15)
+HF_BAND = (0.15, 0.4)
+MIN_SPECTRUM_S = 120         # kürzere Fenster bekommen kein LF/HF
+N_FREQUENCIES = 256
+
+# Laufende Summen: Anzahl RR, Summe, Quadratsumme, Anzahl Differenzen, Quadratsumme der Differenzen, NN50
+_N_SUMS = 6
+
+
+def clean_rr(beat_times):
+    """RR-Intervalle (ms) aus Schlagzeiten; gibt (Zeit des Intervallendes, RR, gültig-Maske) zurück.
+
+    Negative Intervalle (zurückspringende Uhr) und unplausible Werte sind
+    ungültig; Differenzen werden nur zwischen zwei gültigen Nachbarn gebildet.
+    """
+    beat_times = np.asarray(beat_times, dtype=np.int64)
+    rr = np.diff(beat_times)
+    valid = (rr >= RR_MIN_MS) & (rr <= RR_MAX_MS)
+    return beat_times[1:], rr, valid
+
+
+def _sums(rr, valid, previous=None):
+    # previous: (RR, gültig) des letzten Intervalls davor, damit keine Differenz an Blockgrenzen fehlt
+    nn = rr[valid].astype(np.float64)
+    if previous is not None:
+        rr = np.concatenate(([previous[0]], rr))
+        valid = np.concatenate(([previous[1]], valid))
+    both = valid[1:] & valid[:-1]
+    diffs = np.diff(rr).astype(np.float64)[both]
+    return np.array([len(nn), nn.sum(), (nn ** 2).sum(),
+                     len(diffs), (diffs ** 2).sum(), np.count_nonzero(np.abs(diffs) > 50)])
+
+
+def _from_sums(sums):
+    n, total, squares, n_diff, diff_squares, nn50 = sums
+    if n < 2 or n_diff < 1:
+        return {"n_rr": int(n), "mean_rr": None, "sdnn": None, "rmssd": None, "pnn50": None,
+                "sd1": None, "sd2": None}
+    mean = total / n
+    sdnn = np.sqrt(max(squares - n * mean ** 2, 0.0) / (n - 1))
+    rmssd = np.sqrt(diff_squares / n_diff)
+    sd1 = rmssd / np.sqrt(2)
+    sd2 = np.sqrt(max(2 * sdnn ** 2 - sd1 ** 2, 0.0))
+    return {
+        "n_rr": int(n),
+        "mean_rr": round(float(mean), 1),
+        "sdnn": round(float(sdnn), 1),
+        "rmssd": round(float(rmssd), 1),
+        "pnn50": round(float(100 * nn50 / n_diff), 1),
+        "sd1": round(float(sd1), 1),
+        "sd2": round(float(sd2), 1),
+    }
+
+
+def time_domain(beat_times):
+    """SDNN, RMSSD, pNN50 (%) und SD1/SD2 (ms) aus Schlagzeiten in ms."""
+    _, rr, valid = clean_rr(beat_times)
+    return _from_sums(_sums(rr, valid))
+
+
+def frequency_domain(beat_times):
+    """LF/HF-Verhältnis und normierte Leistungen (n.u.) per Lomb-Scargle; None bei zu kurzen Daten."""
+    times, rr, valid = clean_rr(beat_times)
+    times, rr = times[valid], rr[valid].astype(np.float64)
+    if len(rr) < 3 or (times[-1] - times[0]) / 1000 < MIN_SPECTRUM_S:
+        return {"lf_hf": None, "lf_nu": None, "hf_nu": None}
+
+    from scipy.signal import lombscargle
+
+    freqs = np.linspace(LF_BAND[0], HF_BAND[1], N_FREQUENCIES)
+    power = lombscargle(times / 1000, rr - rr.mean(), 2 * np.pi * freqs)
+    step = freqs[1] - freqs[0]
+    lf_mask = freqs < LF_BAND[1]
+    lf = power[lf_mask].sum() * step   # gleichmäßiges Raster: Rechtecksumme genügt
+    hf = power[~lf_mask].sum() * step
+    if lf + hf <= 0:
+        return {"lf_hf": None, "lf_nu": None, "hf_nu": None}
+    return {
+        "lf_hf": round(float(lf / hf), 2) if hf > 0 else None,
+        "lf_nu": round(float(100 * lf / (lf + hf)), 1),
+        "hf_nu": round(float(100 * hf / (lf + hf)), 1),
+    }
+
+
+class HRVAccumulator:
+    """Nimmt Schlagzeiten blockweise an und schließt Fenster ab, sobald sie voll sind.
+
+    Ein Fenster endet nach `window_s` Sekunden oder wenn die Zeit
+    zurückspringt. Das Intervall über eine Fenstergrenze zählt zum späteren
+    Fenster; dafür bleibt der letzte Schlag des vorigen Fensters stehen.
+    """
+
+    def __init__(self, window_s=WINDOW_S):
+        self.window_ms = window_s * 1000
+        self.windows = []
+        self._pending = np.empty(0, dtype=np.int64)
+        self._start = None
+        self._carry = None        # letzter Schlag des vorigen Fensters
+        self._last_rr = None      # (RR, gültig) des letzten Intervalls für die Differenzen
+        self._sums = np.zeros(_N_SUMS)
+
+    def add(self, beat_times):
+        """Nimmt weitere Schlagzeiten (ms) an; gibt die dabei abgeschlossenen Fenster zurück."""
+        beat_times = np.asarray(beat_times, dtype=np.int64)
+        if len(beat_times) == 0:
+            return []
+        if self._start is None:
+            self._start = int(beat_times[0])
+        self._pending = np.concatenate((self._pending, beat_times))
+
+        closed = []
+        while len(self._pending):
+            end = self._start + self.window_ms
+            outside = np.flatnonzero((self._pending >= end) | (self._pending < self._start))
+            if len(outside) == 0:
+                break
+            cut = int(outside[0])
+            if cut > 0 or self._carry is not None:
+                closed.append(self._close(self._pending[:cut], end))
+            # Normalfall: nächstes Fenster schließt lückenlos an; nach einem Zeitsprung beginnt es beim Schlag.
+            # Das Intervall über den Sprung ist negativ bzw. zu lang und fällt in clean_rr heraus.
+            next_beat = int(self._pending[cut])
+            self._start = end if end <= next_beat < end + self.window_ms else next_beat
+            self._pending = self._pending[cut:]
+        return closed
+
+    def _close(self, beats, end):
+        if self._carry is not None:
+            beats = np.concatenate(([self._carry], beats))
+        _, rr, valid = clean_rr(beats)
+        sums = _sums(rr, valid, self._last_rr)
+        if len(rr):
+            self._last_rr = (int(rr[-1]), bool(valid[-1]))
+        self._sums += sums
+        window = {"start_s": round(self._start / 1000, 1), "end_s": round(end / 1000, 1)}
+        window.update(_from_sums(sums))
+        window.update(frequency_domain(beats))
+        self._carry = int(beats[-1]) if len(beats) else None
+        if window["n_rr"]:
+            self.windows.append(window)
+        return window
+
+    def finish(self):
+        """Schließt das letzte (evtl. kürzere) Fenster ab und gibt das Gesamtergebnis zurück."""
+        if len(self._pending):
+            last = int(self._pending[-1])
+            self._close(self._pending, last)
+            self._pending = self._pending[:0]
+        return self.result()
+
+    def result(self):
+        overall = _from_sums(self._sums)
+        for key in ("lf_hf", "lf_nu", "hf_nu"):
+            values = [w[key] for w in self.windows if w[key] is not None]
+            overall[key] = round(float(np.mean(values)), 2) if values else None
+        return {"window_s": self.window_ms / 1000, "overall": overall, "windows": list(self.windows)}
+
+
+def hrv_analysis(chunks, window_s=WINDOW_S):
+    """HRV einer Aufnahme aus einem Iterable von Schlagzeit-Blöcken (ms)."""
+    accumulator = HRVAccumulator(window_s)
+    for chunk in chunks:
+        accumulator.add(chunk)
+    return accumulator.finish()
+
+
+def beat_chunks(beat_times, size=4096):
+    """Teilt ein Array von Schlagzeiten in Blöcke (für hrv_analysis)."""
+    for start in range(0, len(beat_times), size):
+        yield beat_times[start:start + size]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from ekg_stream import BeatStream
+
+    parser = argparse.ArgumentParser(description="HRV einer Aufnahme blockweise berechnen")
+    parser.add_argument("path", nargs="?", default="data/ekg_data/01_Ruhe.txt")
+    parser.add_argument("--window", type=float, default=WINDOW_S, help="Fensterlänge in Sekunden")
+    args = parser.parse_args()
+
+    def streamed_beats(path, block=256):
+        # Schlagzeiten direkt aus dem blockweisen Peak-Finder, ohne das Signal ganz zu laden
+        batch = []
+        for _, time_ms in BeatStream(path):
+            batch.append(time_ms)
+            if len(batch) == block:
+                yield batch
+                batch = []
+        yield batch
+
+    start = time.perf_counter()
+    result = hrv_analysis(streamed_beats(args.path), args.window)
+    elapsed = time.perf_counter() - start
+    for window in result["windows"]:
+        print(f"{window['start_s']:>8.0f}–{window['end_s']:<8.0f} s  SDNN {window['sdnn']}  RMSSD {window['rmssd']}  "
+              f"pNN50 {window['pnn50']} %  LF/HF {window['lf_hf']}")
+    print("Gesamt:", result["overall"])
+    print(f"{elapsed * 1000:.1f} ms")
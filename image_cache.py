@@ -0,0 +1,201 @@
+"""Verkleinerte Personenbilder für die App.
+
+Aus jedem Bild werden einmal ein Vorschaubild und eine Anzeigegröße erzeugt
+und fertig kodiert (JPEG, bei Transparenz PNG) unter data/cache/images
+abgelegt. Schlüssel ist der SHA-256 der Originaldatei, ein ersetztes Bild
+bekommt also automatisch neue Einträge. Die App reicht die Bytes direkt an
+`st.image` weiter; Streamlit liest davon nur den Header und dekodiert nichts.
+
+Fehlt das Bild, ist der Pfad leer oder lässt sich die Datei nicht lesen,
+wird `data/pictures/none.jpg` verwendet.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+CACHE_DIR = "data/cache/images"
+PICTURE_DIR = "data/pictures"
+FALLBACK = "data/pictures/none.jpg"
+SIZES = {"thumb": 96, "display": 300}   # längste Kante in Pixeln
+MAX_STORED_PX = 1024                    # hochgeladene Originale werden auf diese Größe begrenzt
+JPEG_QUALITY = 85
+MEMORY_ENTRIES = 256                    # so viele kodierte Bilder bleiben im Prozess
+
+_lock = threading.Lock()
+_hashes = {}             # (Pfad, Größe, mtime) -> SHA-256 der Datei
+_encoded = OrderedDict()  # (SHA-256, Größe) -> (Bytes, Format, Breite)
+
+
+def _source_hash(path):
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        digest = _hashes.get(key)
+    if digest is None:
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        with _lock:
+            _hashes[key] = digest
+    return digest
+
+
+def _has_alpha(image):
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        alpha = image.convert("RGBA").getchannel("A")
+        return alpha.getextrema()[0] < 255  # vollständig deckender Alphakanal zählt nicht
+    return False
+
+
+def encode(image, max_px):
+    """Verkleinert (nie vergrößert) und kodiert ein PIL-Bild; gibt (Bytes, Format, Breite) zurück."""
+    from PIL import ImageOps
+
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_px, max_px))
+    buffer = io.BytesIO()
+    if _has_alpha(image):
+        image_format = "PNG"
+        image.convert("RGBA").save(buffer, "PNG", optimize=True)
+    else:
+        image_format = "JPEG"
+        image.convert("RGB").save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    return buffer.getvalue(), image_format, image.width
+
+
+def _cache_file(digest, size, image_format):
+    extension = "png" if image_format == "PNG" else "jpg"
+    return os.path.join(CACHE_DIR, f"{digest[:24]}_{size}.{extension}")
+
+
+def _remember(key, value):
+    with _lock:
+        _encoded[key] = value
+        _encoded.move_to_end(key)
+        while len(_encoded) > MEMORY_ENTRIES:
+            _encoded.popitem(last=False)
+
+
+def _from_disk(digest, size):
+    for image_format in ("JPEG", "PNG"):
+        path = _cache_file(digest, size, image_format)
+        if os.path.exists(path):
+            from PIL import Image
+
+            with open(path, "rb") as f:
+                data = f.read()
+            with Image.open(io.BytesIO(data)) as image:  # liest nur den Header
+                width = image.width
+            return data, image_format, width
+    return None
+
+
+def build(path):
+    """Erzeugt alle Größen eines Bildes im Cache; gibt den Quell-Hash zurück."""
+    from PIL import Image
+
+    digest = _source_hash(path)
+    with Image.open(path) as original:
+        original.load()
+        for size, max_px in SIZES.items():
+            value = encode(original.copy(), max_px)
+            target = _cache_file(digest, size, value[1])
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp = f"{target}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(value[0])
+            os.replace(tmp, target)
+            _remember((digest, size), value)
+    return digest
+
+
+def _encoded_picture(path, size):
+    digest = _source_hash(path)
+    with _lock:
+        value = _encoded.get((digest, size))
+    if value is not None:
+        return value
+    value = _from_disk(digest, size)
+    if value is None:
+        build(path)
+        value = _from_disk(digest, size)
+    _remember((digest, size), value)
+    return value
+
+
+def picture(path, size="display"):
+    """(Bytes, Format, Breite) des Bildes in der gewünschten Größe, notfalls des Platzhalters.
+
+    Gibt None zurück, wenn auch der Platzhalter fehlt.
+    """
+    if size not in SIZES:
+        raise ValueError(f"Unbekannte Bildgröße {size!r} (erlaubt: {', '.join(SIZES)})")
+    for candidate in (path, FALLBACK):
+        if not candidate or not os.path.isfile(candidate):
+            continue
+        try:
+            return _encoded_picture(candidate, size)
+        except (OSError, ValueError):  # PIL.UnidentifiedImageError ist ein OSError
+            continue
+    return None
+
+
+def save_picture(uploaded_file, person_id, directory=PICTURE_DIR):
+    """Speichert ein hochgeladenes Bild auf MAX_STORED_PX begrenzt und legt gleich die Cache-Größen an.
+
+    Gibt den neuen Bildpfad zurück; Dateien, die kein Bild sind, führen zu
+    einem `PIL.UnidentifiedImageError` (OSError).
+    """
+    from PIL import Image
+
+    with Image.open(uploaded_file) as image:
+        image.load()
+        data, image_format, _ = encode(image, MAX_STORED_PX)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{person_id}.{'png' if image_format == 'PNG' else 'jpg'}")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    build(path)
+    return path
+
+
+def prebuild(paths):
+    for path in paths:
+        if path and os.path.isfile(path):
+            build(path)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from person_repository import get_repository
+
+    parser = argparse.ArgumentParser(description="Bild-Cache für alle Personenbilder aufbauen und Größen vergleichen")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    paths = sorted({p["picture_path"] for p in get_repository().all() if p.get("picture_path")} | {FALLBACK})
+    start = time.perf_counter()
+    prebuild(paths)
+    print(f"Cache aufgebaut in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    from PIL import Image
+
+    for path in paths:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            with Image.open(path) as image:  # bisher: Original bei jedem Rerun öffnen und dekodieren
+                image.load()
+        original_ms = (time.perf_counter() - start) / args.repeat * 1000
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            data, image_format, width = picture(path)
+        cached_ms = (time.perf_counter() - start) / args.repeat * 1000
+        thumb = picture(path, "thumb")[0]
+        print(f"{path}: {os.path.getsize(path) / 1024:7.0f} KiB -> Anzeige {len(data) / 1024:5.0f} KiB "
+              f"({image_format}, {width} px), Vorschau {len(thumb) / 1024:4.0f} KiB; "
+              f"{original_ms:6.2f} ms -> {cached_ms:.3f} ms pro Rerun")
@@ -0,0 +1,239 @@
+"""Kleiner HTTP-Dienst, der EKG-Dateien annimmt und im Hintergrund auswertet.
+
+    python ingest_server.py                 # http://127.0.0.1:8765
+    EKG_INGEST_URL=http://host:port streamlit run main.py
+
+POST /tests?person_id=1&date=2025-06-26&name=ekg.txt   Datei speichern, Test anlegen, Auswertung starten
+POST /uploads?name=ekg.txt                              nur auswerten (eigene Datei, ohne Test)
+
+Beide antworten, sobald die Datei empfangen ist. Parsen, Ablegen, Anlegen des
+Tests und Auswertung laufen im Auftrag; bis dahin ist "test" im Auftrag None,
+eine ungültige Datei lässt den Auftrag mit status "failed" enden.
+GET  /jobs/<id>                                         Status und Ergebnis eines Auftrags
+GET  /health
+
+Die Auswertung läuft in einem Prozess-Pool und schreibt wie gewohnt in den
+Binär-Cache und den Analyse-Speicher; die App liest die Ergebnisse von dort.
+Dateien werden beim Empfang gehasht und inhaltsadressiert abgelegt
+(`upload_store`); eine schon bekannte Aufnahme wird nicht erneut ausgewertet.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from person_repository import get_repository
+from upload_store import UploadWriter, archive_upload
+
+EKG_DIR = "data/ekg_data"
+UPLOAD_DIR = "data/uploads"
+INGEST_URL = os.environ.get("EKG_INGEST_URL", "http://127.0.0.1:8765")
+READ_CHUNK = 64 * 1024
+MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+JOB_TTL_S = 3600  # abgeschlossene Aufträge so lange abfragbar
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+def analyze_job(test):
+    """Parsen und Auswerten eines Tests (läuft im Worker-Prozess)."""
+    from ekgdata import EKGdata  # die App importiert dieses Modul nur für die Client-Funktionen
+
+    ekg = EKGdata(test)
+    ekg.find_peaks()  # bei bekannter Aufnahme (gleicher SHA-256) liegt die Analyse schon vor
+    return ekg.summary()
+
+
+class IngestServer:
+
+    def __init__(self, ekg_dir=EKG_DIR, upload_dir=UPLOAD_DIR, workers=None):
+        self.ekg_dir = ekg_dir
+        self.upload_dir = upload_dir
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.jobs = {}
+        self._tasks = set()
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            if not request_line:
+                writer.close()
+                return
+            method, target, _ = request_line.split(" ", 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                key, _, value = line.partition(":")
+                headers[key.strip().lower()] = value.strip()
+
+            url = urlsplit(target)
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            status, payload = await self.route(method, url.path, query, headers, reader)
+        except (ValueError, KeyError) as e:
+            status, payload = 400, {"error": str(e)}
+        except Exception as e:
+            status, payload = 500, {"error": str(e)}
+
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+        writer.close()
+
+    async def route(self, method, path, query, headers, reader):
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", "jobs": len(self.jobs)}
+        if method == "GET" and path.startswith("/jobs/"):
+            job = self.jobs.get(path[len("/jobs/"):])
+            return (200, job) if job else (404, {"error": "Unbekannter Auftrag"})
+        if method == "POST" and path in ("/tests", "/uploads"):
+            return await self.ingest(path == "/tests", query, headers, reader)
+        return 404, {"error": f"{method} {path} nicht gefunden"}
+
+    async def ingest(self, register, query, headers, reader):
+        length = int(headers["content-length"])
+        if length > MAX_UPLOAD_BYTES:
+            return 413, {"error": "Datei zu groß"}
+        name = os.path.basename(query.get("name", "ekg.txt")) or "ekg.txt"
+
+        loop = asyncio.get_running_loop()
+        repo = get_repository()
+        if register:
+            person_id = int(query["person_id"])
+            if await loop.run_in_executor(None, repo.get_by_id, person_id) is None:
+                return 404, {"error": f"Keine Person mit ID {person_id}"}
+
+        self._forget_old_jobs()
+        job_id = uuid.uuid4().hex
+        upload = UploadWriter(name, os.path.join(self.ekg_dir, "store") if register else self.upload_dir)
+        await self._receive(reader, length, upload)
+
+        job = {"id": job_id, "status": "queued", "name": name, "register": register,
+               "person_id": person_id if register else None, "date": query.get("date", ""),
+               "test": None, "duplicate": None, "result": None, "error": None,
+               "created": time.time(), "finished": None}
+        self.jobs[job_id] = job
+        task = asyncio.create_task(self._run(job, upload.close()))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return 202, job
+
+    def _forget_old_jobs(self):
+        limit = time.time() - JOB_TTL_S
+        for job_id in [j["id"] for j in self.jobs.values() if j["finished"] and j["finished"] < limit]:
+            del self.jobs[job_id]
+
+    @staticmethod
+    async def _receive(reader, length, upload):
+        """Schreibt den Request-Body blockweise in den UploadWriter."""
+        remaining = length
+        try:
+            while remaining > 0:
+                chunk = await reader.read(min(READ_CHUNK, remaining))
+                if not chunk:
+                    raise ValueError("Verbindung vor Ende der Datei abgebrochen")
+                upload.write(chunk)
+                remaining -= len(chunk)
+        except BaseException:
+            upload.abort()
+            raise
+
+    async def _run(self, job, received):
+        """Ablegen, Test anlegen und Auswerten; `received` kommt von `UploadWriter.close`."""
+        loop = asyncio.get_running_loop()
+        job["status"] = "running"
+        try:
+            # Parsen und Archivieren im Pool; eine ParseError beendet den Auftrag als "failed"
+            path, sha256, job["duplicate"] = await loop.run_in_executor(self.pool, archive_upload, *received)
+            if job["register"]:
+                job["test"] = await loop.run_in_executor(
+                    None, get_repository().add_ekg_test, job["person_id"], job["date"], path, sha256)
+            else:
+                job["test"] = {"id": f"upload_{job['id'][:8]}", "date": "", "result_link": path, "sha256": sha256}
+            job["result"] = await loop.run_in_executor(self.pool, analyze_job, job["test"])
+            job["status"] = "done"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            if os.path.exists(received[0]):  # z. B. wenn der Pool abgebrochen ist
+                os.remove(received[0])
+        job["finished"] = time.time()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"EKG-Annahme läuft auf http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+# --- Client-Seite für die App ---
+
+def server_available(url=INGEST_URL):
+    try:
+        return requests.get(f"{url}/health", timeout=0.5).ok
+    except requests.RequestException:
+        return False
+
+
+def submit_test(data, name, person_id, date, url=INGEST_URL):
+    """Übergibt eine EKG-Datei als neuen Test; gibt den Auftrag zurück.
+
+    Der Test wird erst im Auftrag angelegt und steht danach unter job["test"].
+    """
+    response = requests.post(f"{url}/tests", params={"person_id": person_id, "date": date, "name": name},
+                             data=data, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+def submit_upload(data, name, url=INGEST_URL):
+    """Übergibt eine Datei nur zur Auswertung (kein Test in der Datenbank)."""
+    response = requests.post(f"{url}/uploads", params={"name": name}, data=data, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+def error_message(error):
+    """Fehlertext des Dienstes zu einer `requests`-Ausnahme, sonst die Ausnahme selbst."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return response.json()["error"]
+        except (ValueError, KeyError, TypeError):
+            pass
+    return str(error)
+
+
+def job_status(job_id, url=INGEST_URL):
+    """Aktueller Stand eines Auftrags oder None, wenn der Dienst ihn nicht (mehr) kennt."""
+    try:
+        response = requests.get(f"{url}/jobs/{job_id}", timeout=2)
+    except requests.RequestException:
+        return None
+    return response.json() if response.ok else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EKG-Dateien annehmen und im Hintergrund auswerten")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Prozesse (Standard: alle Kerne)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(IngestServer(workers=args.workers).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -1,16 +1,93 @@
 import json
 import os
+import tempfile
+import threading
+from contextlib import contextmanager
 
-def add_login(username, firstname, role="Patient:in", login_path="data/logindaten.json"):
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(path):
+    """Exklusive, prozessübergreifende Sperre über eine Lock-Datei neben `path`."""
+    key = os.path.abspath(path)
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(key, threading.Lock())
+
+    with thread_lock, open(key + ".lock", "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def write_json_atomic(data, path):
+    """Schreibt zuerst in eine temporäre Datei und ersetzt dann das Original in einem Schritt."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def json_transaction(path, default):
+    """Sperrt eine JSON-Datei, liefert ihren Inhalt zum Ändern und speichert ihn atomar.
+
+    Mehrere Änderungen innerhalb eines `with`-Blocks werden mit einem
+    einzigen Schreibvorgang gespeichert. Bei einer Exception bleibt die
+    Datei unverändert.
+    """
+    with file_lock(path):
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            data = default
+        yield data
+        write_json_atomic(data, path)
+
+
+def unique_username(firstname, lastname, taken):
+    """vorname.nachname, bei gleichem Namen mit laufender Nummer (max.muster2, max.muster3, …)."""
+    base = f"{firstname.lower()}.{lastname.lower()}"
+    username, number = base, 1
+    while username in taken:
+        number += 1
+        username = f"{base}{number}"
+    return username
+
+
+def add_login(username, firstname, role="Patient:in", login_path="data/logindaten.json", users=None):
     """Fügt einen neuen Login in logindaten.json ein (oder aktualisiert ihn)."""
-    password = firstname.lower() + "123"
+    if users is None:
+        with json_transaction(login_path, {}) as users:
+            return add_login(username, firstname, role, login_path, users)
 
-    # Datei laden oder leere Login-Daten vorbereiten
-    if os.path.exists(login_path):
-        with open(login_path, "r", encoding="utf-8") as f:
-            users = json.load(f)
-    else:
-        users = {}
+    password = firstname.lower() + "123"
 
     # Neuen Login hinzufügen
     users[username] = {
@@ -18,24 +95,24 @@ def add_login(username, firstname, role="Patient:in", login_path="data/logindate
         "role": role
     }
 
-    # Datei speichern
-    with open(login_path, "w", encoding="utf-8") as f:
-        json.dump(users, f, indent=4, ensure_ascii=False)
-
     return password  # Damit du es dem Arzt/der Ärztin anzeigen kannst
 
 
-def add_person_to_json(firstname, lastname, birth_year, file_path="data/person_db.json"):
+def add_person_to_json(firstname, lastname, birth_year, file_path="data/person_db.json",
+                       login_path="data/logindaten.json", data=None):
     """Fügt eine neue Patient:in zur person_db.json hinzu und erzeugt Zugangsdaten."""
-    if os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    else:
-        data = []
+    if data is None:
+        with json_transaction(file_path, []) as data:
+            return add_person_to_json(firstname, lastname, birth_year, file_path, login_path, data)
 
     new_id = max([person["id"] for person in data], default=0) + 1
 
-    username = f"{firstname.lower()}.{lastname.lower()}"
+    # Logins gesperrt lesen und schreiben, damit niemand denselben Benutzernamen vergibt
+    with json_transaction(login_path, {}) as users:
+        username = unique_username(firstname, lastname, set(users) | {p.get("username") for p in data})
+        # Zugangsdaten erzeugen
+        password = add_login(username, firstname, login_path=login_path, users=users)
+
     new_person = {
         "id": new_id,
         "firstname": firstname,
@@ -48,10 +125,58 @@ def add_person_to_json(firstname, lastname, birth_year, file_path="data/person_d
 
     data.append(new_person)
 
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    return new_person, password
 
-    # Zugangsdaten erzeugen
-    password = add_login(username, firstname)
 
-    return new_person, password
+def update_person(person_id, changes, file_path="data/person_db.json", data=None):
+    """Übernimmt die geänderten Felder (z. B. Name, Geburtsjahr, Bild) für eine Person."""
+    if data is None:
+        with json_transaction(file_path, []) as data:
+            return update_person(person_id, changes, file_path, data)
+
+    for p in data:
+        if p["id"] == person_id:
+            p.update(changes)
+            break
+
+
+def add_ekg_test(person_id, date, result_link, file_path="data/person_db.json", data=None, sha256=None):
+    """Hängt einen neuen EKG-Test an eine Person an und gibt ihn zurück.
+
+    sha256: Inhalts-Hash der Aufnahme (Tests mit derselben Datei teilen sich die Analyse).
+    """
+    if data is None:
+        with json_transaction(file_path, []) as data:
+            return add_ekg_test(person_id, date, result_link, file_path, data, sha256)
+
+    new_test_id = max(
+        (test["id"] for p in data for test in p.get("ekg_tests", [])),
+        default=0
+    ) + 1
+    new_test = {
+        "id": new_test_id,
+        "date": date,
+        "result_link": result_link,
+        "comment": ""
+    }
+    if sha256:
+        new_test["sha256"] = sha256
+
+    for p in data:
+        if p["id"] == person_id:
+            p.setdefault("ekg_tests", []).append(new_test)
+            break
+    return new_test
+
+
+def update_test_comment(test_id, comment, file_path="data/person_db.json", data=None):
+    """Speichert die ärztliche Notiz zu einem EKG-Test."""
+    if data is None:
+        with json_transaction(file_path, []) as data:
+            return update_test_comment(test_id, comment, file_path, data)
+
+    for p in data:
+        for test in p.get("ekg_tests", []):
+            if test["id"] == test_id:
+                test["comment"] = comment
+                break
@@ -1,13 +1,7 @@
 import streamlit as st
-import json
-
-def load_user_data():
-    with open("data/logindaten.json", "r", encoding="utf-8") as f:
-        return json.load(f)
+from person_repository import get_repository
 
 def login():
-    USERS = load_user_data()
-
     st.title("Login für Ärzt:in / Patient:in")
 
     role_choice = st.selectbox("Rolle wählen", ["Ärzt:in", "Patient:in"])
@@ -15,7 +9,7 @@ def login():
     password = st.text_input("Passwort", type="password")
 
     if st.button("Einloggen"):
-        user = USERS.get(username)
+        user = get_repository().get_login(username)
         if user and user["password"] == password and user["role"] == role_choice:
             st.session_state["logged_in"] = True
             st.session_state["role"] = user["role"]
@@ -1,14 +1,11 @@
 import streamlit as st
-import pandas as pd
-from PIL import Image
 from login import login
 from person import Person
-from ekgdata import EKGdata
-from upload import handle_upload
-from herzrate import interactive_hr_plot
-from pdf_export import export_pdf
-from json_handler import add_person_to_json
-import json
+from person_repository import get_repository
+
+# Schwere Module (pandas, scipy, plotly, reportlab, requests) importiert erst
+# die Seite, die sie braucht – Login, Logout und Personendaten starten so
+# ohne sie. Einmal importiert, bleiben sie für alle Sessions geladen.
 
 
 # Seitenlayout konfigurieren
@@ -27,6 +24,61 @@ if "current_person" not in st.session_state:
     st.session_state.current_person = None
 
 
+def analysis_ready(test_id):
+    """False, solange der Annahme-Dienst diesen Test noch auswertet (mit Hinweis auf der Seite)."""
+    jobs = st.session_state.setdefault("ingest_jobs", {})
+    if test_id not in jobs:
+        return True
+    from ingest_server import job_status
+    job = job_status(jobs[test_id])
+    if job is None or job["status"] == "done":
+        del jobs[test_id]
+        return True
+    if job["status"] == "failed":
+        st.error(f"Die Auswertung dieses Tests ist fehlgeschlagen: {job['error']}")
+        return False
+    st.info("Die Auswertung dieses Tests läuft noch im Hintergrund.")
+    st.button("Aktualisieren", key=f"refresh_{test_id}")
+    return False
+
+
+def resolve_ingest_jobs():
+    """Ordnet Aufträge des Annahme-Dienstes ihrem Test zu, sobald er angelegt ist.
+
+    Der Dienst legt den Test erst nach dem Parsen an; bis dahin steht der
+    Auftrag in "ingest_pending". Scheitert er vorher (ungültige Datei), wird
+    der Fehler hier angezeigt.
+    """
+    pending = st.session_state.setdefault("ingest_pending", [])
+    if not pending:
+        return
+    from ingest_server import job_status
+    for job_id in list(pending):
+        job = job_status(job_id)
+        if job is None:
+            pending.remove(job_id)
+        elif job["test"] is not None:
+            pending.remove(job_id)
+            from app_cache import invalidate_test
+            invalidate_test(job["test"]["id"])
+            st.session_state.setdefault("ingest_jobs", {})[job["test"]["id"]] = job_id
+            current = st.session_state.current_person
+            if current is not None and current.id == job["person_id"]:
+                # Person neu laden, damit der neue Test angezeigt wird
+                st.session_state.current_person = Person(get_repository().get_by_id(current.id))
+        elif job["status"] == "failed":
+            pending.remove(job_id)
+            st.error(f"Die EKG-Datei „{job['name']}“ wurde nicht gespeichert: {job['error']}")
+
+
+def session_ekg(test, slot):
+    """Ausgewertetes EKG aus dem gemeinsamen Cache; die Session hält es, solange sie es anzeigt."""
+    from app_cache import SessionLease
+    if "ekg_lease" not in st.session_state:
+        st.session_state.ekg_lease = SessionLease()
+    return st.session_state.ekg_lease.get_ekg(test, slot)
+
+
 # Titel
 st.title("EKG APP")
 
@@ -45,6 +97,17 @@ seiten = [
 ]
 seite = st.sidebar.radio("Navigation", seiten)
 
+# Cache-Zähler für das Monitoring (nur Ärzt:innen)
+if st.session_state["role"] == "Ärzt:in":
+    from app_cache import recordings
+    with st.sidebar.expander("Cache-Statistik"):
+        cache_stats = recordings.stats()
+        st.write(f"Einträge: {cache_stats['entries']} ({cache_stats['bytes'] / 1e6:.1f} / {cache_stats['max_bytes'] / 1e6:.0f} MB), "
+                 f"davon {cache_stats['in_use']} gerade angezeigt")
+        st.write(f"Treffer: {cache_stats['hits']} · Fehlgriffe: {cache_stats['misses']} · Verdrängt: {cache_stats['evictions']}")
+
+resolve_ingest_jobs()
+
 # --- Unternavigation für "Neue:r Patient:in"
 if seite == "Personendaten":
     st.header("Versuchsperson auswählen")
@@ -69,10 +132,7 @@ if seite == "Personendaten":
 
     elif st.session_state["role"] == "Patient:in":
         # Patient:in sieht nur sich selbst
-        person_dict = next(
-            (p for p in person_data_list if p.get("username") == st.session_state["username"]),
-            None
-        )
+        person_dict = get_repository().get_by_username(st.session_state["username"])
         if person_dict:
             st.session_state.current_person = Person(person_dict)
             st.session_state.current_user_name = f"{person_dict['lastname']}, {person_dict['firstname']}"
@@ -85,8 +145,11 @@ if seite == "Personendaten":
         person = st.session_state.current_person
         st.write(f"ID: {person.id}")
 
-        image = Image.open(person.picture_path)
-        st.image(image, caption=st.session_state.current_user_name)
+        from image_cache import picture
+        shown = picture(person.picture_path)  # fertig verkleinert und kodiert, notfalls none.jpg
+        if shown is not None:
+            data, image_format, width = shown
+            st.image(data, caption=st.session_state.current_user_name, width=width, output_format=image_format)
 
         st.write(f"Name: {st.session_state.current_user_name}")
         st.write(f"Geburtsjahr: {person.date_of_birth}")
@@ -102,23 +165,22 @@ if seite == "Personendaten":
             new_picture = st.file_uploader("Neues Bild hochladen (optional)", type=["jpg", "png", "jpeg"], key="bild_neu")
 
             if st.button("Änderungen speichern"):
-                with open("data/person_db.json", "r", encoding="utf-8") as f:
-                    all_persons = json.load(f)
-
-                for p in all_persons:
-                    if p["id"] == person.id:
-                        p["firstname"] = new_firstname
-                        p["lastname"] = new_lastname
-                        p["date_of_birth"] = int(new_dob)
-                        if new_picture is not None:
-                            image_path = f"data/pictures/{person.id}.png"
-                            with open(image_path, "wb") as img_file:
-                                img_file.write(new_picture.getbuffer())
-                            p["picture_path"] = image_path
-                        break
-
-                with open("data/person_db.json", "w", encoding="utf-8") as f:
-                    json.dump(all_persons, f, indent=4, ensure_ascii=False)
+                from app_cache import invalidate_person
+                changes = {
+                    "firstname": new_firstname,
+                    "lastname": new_lastname,
+                    "date_of_birth": int(new_dob)
+                }
+                if new_picture is not None:
+                    from image_cache import save_picture
+                    try:
+                        changes["picture_path"] = save_picture(new_picture, person.id)
+                    except OSError:
+                        st.error("Das Bild konnte nicht gelesen werden und wurde nicht übernommen.")
+
+                repo = get_repository()
+                repo.update_person(person.id, **changes)
+                invalidate_person(repo.get_by_id(person.id))
 
                 st.success("Daten wurden aktualisiert. Bitte Seite neu laden.")
 
@@ -130,34 +192,35 @@ if seite == "Personendaten":
 
             if st.button("EKG-Test hinzufügen"):
                 if new_ekg_file and new_ekg_date:
-                    with open("data/person_db.json", "r", encoding="utf-8") as f:
-                        all_persons = json.load(f)
-
-                    new_test_id = max(
-                        (test["id"] for p in all_persons for test in p.get("ekg_tests", [])),
-                        default=0
-                    ) + 1
-
-                    import uuid
-                    filename = f"{uuid.uuid4().hex[:8]}_{new_ekg_file.name}"
-                    ekg_path = f"data/ekg_data/{filename}"
-                    with open(ekg_path, "wb") as f:
-                        f.write(new_ekg_file.getbuffer())
-
-                    for p in all_persons:
-                        if p["id"] == person.id:
-                            p.setdefault("ekg_tests", []).append({
-                                "id": new_test_id,
-                                "date": new_ekg_date,
-                                "result_link": ekg_path,
-                                "comment": ""
-                            })
-                            break
-
-                    with open("data/person_db.json", "w", encoding="utf-8") as f:
-                        json.dump(all_persons, f, indent=4, ensure_ascii=False)
-
-                    st.success("Neuer EKG-Test erfolgreich hinzugefügt.")
+                    from app_cache import invalidate_test
+                    from ingest_server import error_message, server_available, submit_test
+                    if server_available():
+                        import requests
+                        # Speichern und Auswerten übernimmt der Annahme-Dienst
+                        try:
+                            job = submit_test(new_ekg_file.getvalue(), new_ekg_file.name, person.id, new_ekg_date)
+                        except requests.RequestException as e:
+                            st.error(f"Die Datei wurde nicht übernommen: {error_message(e)}")
+                            st.stop()
+                        st.session_state.setdefault("ingest_pending", []).append(job["id"])
+                        st.success("Datei übergeben – der Test erscheint, sobald sie eingelesen ist; "
+                                   "die Auswertung läuft im Hintergrund.")
+                    else:
+                        from ekg_parser import ParseError
+                        from upload_store import store_upload
+                        try:
+                            # blockweise gehasht und unter dem SHA-256 als .ekgz abgelegt
+                            ekg_path, sha256, duplicate = store_upload(new_ekg_file)
+                        except ParseError as e:
+                            st.error(f"Die Datei hat nicht das erwartete Format: {e}")
+                            st.stop()
+
+                        new_test = get_repository().add_ekg_test(person.id, new_ekg_date, ekg_path, sha256)
+                        invalidate_test(new_test["id"])
+
+                        if duplicate:
+                            st.info("Diese Aufnahme ist bereits gespeichert – der Test verweist auf die vorhandene Datei.")
+                        st.success("Neuer EKG-Test erfolgreich hinzugefügt.")
 
                     # Person neu laden, damit neue Tests auch angezeigt werden
                     updated_dict = Person.find_person_data_by_name(
@@ -188,12 +251,11 @@ elif seite == "EKG-Auswertung":
 
             selected_test = next((t for t in ekg_tests if t["id"] == selected_ekg_id), None)
 
-            if selected_test:
-                ekg = EKGdata(selected_test)
-                ekg.find_peaks()
-                hr = ekg.estimate_hr()
+            if selected_test and analysis_ready(selected_test["id"]):
+                ekg = session_ekg(selected_test, "auswertung")
+                summary = ekg.summary()
 
-                anomalies = ekg.check_for_anomalies()
+                anomalies = summary["anomalies"]
                 if anomalies:
                     st.subheader("Auffälligkeiten im EKG") 
                     for a in anomalies:
@@ -202,10 +264,35 @@ elif seite == "EKG-Auswertung":
                     st.success("Keine Auffälligkeiten erkannt.")
 
                 st.write(f"Datum des Tests: {ekg.date}")
-                st.write(f"Berechnete Herzfrequenz: {hr} bpm")
-                st.write(f"Minimale Herzfrequenz: {ekg.get_min_hr()} bpm")
-                st.write(f"Maximale Herzfrequenz: {ekg.get_max_hr()} bpm")
-                st.write(f"Dauer der Aufnahme: {ekg.get_signal_duration_min()} Minuten")
+                st.write(f"Berechnete Herzfrequenz: {summary['avg_hr']} bpm")
+                st.write(f"Minimale Herzfrequenz: {summary['min_hr']} bpm")
+                st.write(f"Maximale Herzfrequenz: {summary['max_hr']} bpm")
+                st.write(f"Dauer der Aufnahme: {summary['duration_min']} Minuten")
+
+                # Herzratenvariabilität (gespeichert wie die übrigen Kennwerte)
+                hrv = ekg.hrv()
+                overall = hrv["overall"]
+                st.subheader("Herzratenvariabilität (HRV)")
+                if overall["sdnn"] is None:
+                    st.info("Zu wenige gültige RR-Intervalle für HRV-Kennwerte.")
+                else:
+                    def fmt(value, unit=""):
+                        return "–" if value is None else f"{value}{unit}"
+
+                    cols = st.columns(6)
+                    cols[0].metric("SDNN", fmt(overall["sdnn"], " ms"))
+                    cols[1].metric("RMSSD", fmt(overall["rmssd"], " ms"))
+                    cols[2].metric("pNN50", fmt(overall["pnn50"], " %"))
+                    cols[3].metric("SD1", fmt(overall["sd1"], " ms"))
+                    cols[4].metric("SD2", fmt(overall["sd2"], " ms"))
+                    cols[5].metric("LF/HF", fmt(overall["lf_hf"]))
+                    with st.expander(f"HRV pro {hrv['window_s'] / 60:g}-Minuten-Fenster"):
+                        st.dataframe([
+                            {"Beginn (s)": w["start_s"], "Ende (s)": w["end_s"], "RR": w["n_rr"],
+                             "SDNN": w["sdnn"], "RMSSD": w["rmssd"], "pNN50": w["pnn50"],
+                             "SD1": w["sd1"], "SD2": w["sd2"], "LF/HF": w["lf_hf"]}
+                            for w in hrv["windows"]
+                        ])
 
                 # Kommentar anzeigen (wenn vorhanden)
                 current_comment = selected_test.get("comment", "")
@@ -214,20 +301,7 @@ elif seite == "EKG-Auswertung":
                 if st.session_state["role"] == "Ärzt:in":
                     updated_comment = st.text_area("Notiz eingeben / bearbeiten", value=current_comment)
                     if st.button("Notiz speichern"):
-                        import json
-
-                        with open("data/person_db.json", "r", encoding="utf-8") as f:
-                            all_persons = json.load(f)
-
-                        # Finde passende Person und Test
-                        for person in all_persons:   
-                            for test in person.get("ekg_tests", []):
-                                if test["id"] == selected_test["id"]:
-                                    test["comment"] = updated_comment
-                                    break
-
-                        with open("data/person_db.json", "w", encoding="utf-8") as f:
-                            json.dump(all_persons, f, indent=4, ensure_ascii=False)
+                        get_repository().update_test_comment(selected_test["id"], updated_comment)
                         st.success("Notiz wurde erfolgreich gespeichert.")
 
                 else:
@@ -238,7 +312,7 @@ elif seite == "EKG-Auswertung":
     
 
                 # Zeit-Slider zur Auswahl des Darstellungsbereichs
-                max_seconds = ekg.df["Zeit in ms"].max() / 1000
+                max_seconds = ekg.signal.max_time / 1000
                 time_range = st.slider(
                     "Zeitausschnitt für EKG-Anzeige (in Sekunden)",
                     min_value=0.0,
@@ -249,7 +323,7 @@ elif seite == "EKG-Auswertung":
 
                 fig = ekg.plot_time_series(time_range=time_range)
                 st.plotly_chart(fig, use_container_width=True)
-            else:
+            elif selected_test is None:
                 st.warning("Der ausgewählte EKG-Test konnte nicht geladen werden.")
         else:
             st.info("Für diese Person sind keine EKG-Tests vorhanden.")
@@ -270,12 +344,12 @@ elif seite == "Herzfrequenz-Verlauf":
 
             selected_test = next((t for t in ekg_tests if t["id"] == selected_ekg_id), None)
 
-            if selected_test:
-                ekg = EKGdata(selected_test)
-                ekg.find_peaks()
+            if selected_test and analysis_ready(selected_test["id"]):
+                from herzrate import interactive_hr_plot
+                ekg = session_ekg(selected_test, "herzrate")
 
-                interactive_hr_plot(ekg.df)
-            else:
+                interactive_hr_plot(trend=ekg.hr_trend)
+            elif selected_test is None:
                 st.warning("Der EKG-Test konnte nicht geladen werden.")
         else:
             st.warning("Für diese Person sind keine EKG-Daten vorhanden.")
@@ -284,37 +358,8 @@ elif seite == "Herzfrequenz-Verlauf":
 
 # --- Seite: Eigene EKG-Daten hochladen ---
 elif seite == "Eigene EKG-Datei hochladen":
-    st.header("Eigene EKG-Daten hochladen")
-
-    uploaded_file = st.file_uploader("Lade eine EKG-Datei im TXT-Format hoch", type=["txt"])
-
-    if uploaded_file is not None:
-        try:
-            df = pd.read_csv(uploaded_file, sep="\t", header=None, names=["Messwerte in mV", "Zeit in ms"])
-            st.success("Datei erfolgreich geladen!")
-
-            st.subheader("Vorschau der EKG-Daten")
-            st.write(df.head())
-
-            dummy_test = {
-                "id": "custom",
-                "date": "heute",
-                "result_link": uploaded_file
-            }
-            ekg = EKGdata(dummy_test)
-            ekg.df = df
-            ekg.find_peaks()
-
-            st.write(f"Berechnete Herzfrequenz: {ekg.estimate_hr()} bpm")
-            st.write(f"Minimale Herzfrequenz: {ekg.get_min_hr()} bpm")
-            st.write(f"Maximale Herzfrequenz: {ekg.get_max_hr()} bpm")
-            st.write(f"Dauer der Aufnahme: {ekg.get_signal_duration_min()} Minuten")
-
-            fig = ekg.plot_time_series()
-            st.plotly_chart(fig, use_container_width=True)
-
-        except Exception as e:
-            st.error(f"Fehler beim Verarbeiten der Datei: {e}")
+    from upload import handle_upload
+    handle_upload()
 
 # --- Seite: Neue Person anlegen (nur für Ärzt:innen) ---
 elif seite == "Neue Person anlegen":
@@ -323,11 +368,6 @@ elif seite == "Neue Person anlegen":
     if st.session_state["role"] != "Ärzt:in":
         st.info("Dieser Bereich ist nur für Ärzt:innen zugänglich.")
     else:
-        import json
-        import os
-        import uuid
-        from json_handler import add_login
-
         st.subheader("Basisdaten eingeben")
         firstname = st.text_input("Vorname")
         lastname = st.text_input("Nachname")
@@ -338,65 +378,52 @@ elif seite == "Neue Person anlegen":
         # ⬇ Neuer Abschnitt für optionalen EKG-Test
         with st.expander("Optional: EKG-Test hinzufügen"):
             ekg_file = st.file_uploader("EKG-Datei (TXT)", type=["txt"], key="ekg_upload")
-            test_date = st.text_input("Datum des EKG-Tests (z. B. 2025-06-23)", key="ekg_datum")
+            test_date = st.text_input("Datum des EKG-Tests (z. B. 2025-06-23)", key="ekg_datum")
 
         if st.button("Person speichern"):
             if not firstname or not lastname or not birth_year:
                 st.warning("Bitte alle Pflichtfelder ausfüllen.")
                 st.stop()
 
-            with open("data/person_db.json", "r", encoding="utf-8") as f:
-                all_persons = json.load(f)
-
-            new_id = max((p["id"] for p in all_persons), default=0) + 1
-
-            # Bild speichern
-            picture_path = ""
-            if image_file:
-                picture_path = f"data/pictures/{new_id}.png"
-                with open(picture_path, "wb") as f:
-                    f.write(image_file.getbuffer())
-
-            # EKG speichern
-            ekg_tests = []
-            if ekg_file and test_date:
-                ekg_id = max(
-                    (test["id"] for p in all_persons for test in p.get("ekg_tests", [])),
-                    default=0
-                ) + 1
-                ekg_path = f"data/ekg_data/{uuid.uuid4().hex[:8]}_{ekg_file.name}"
-                with open(ekg_path, "wb") as f:
-                    f.write(ekg_file.getbuffer())
-                ekg_tests.append({
-                    "id": ekg_id,
-                    "date": test_date,
-                    "result_link": ekg_path
-                })
-            elif ekg_file and not test_date:
+            if ekg_file and not test_date:
                 st.warning("Bitte gib ein Datum für den EKG-Test an.")
                 st.stop()
 
-            # Login-Daten erzeugen
-            username = f"{firstname.lower()}.{lastname.lower()}"
-            password = add_login(username, firstname)
+            # Person und Login anlegen – die ID vergibt der Speicher
+            repo = get_repository()
+            new_person, password = repo.add_person(firstname, lastname, int(birth_year))
+            new_id = new_person["id"]
 
-            new_person = {
-                "id": new_id,
-                "firstname": firstname,
-                "lastname": lastname,
-                "username": username,
-                "date_of_birth": int(birth_year),
-                "picture_path": picture_path,
-                "ekg_tests": ekg_tests
-            }
-
-            all_persons.append(new_person)
-
-            with open("data/person_db.json", "w", encoding="utf-8") as f:
-                json.dump(all_persons, f, indent=4, ensure_ascii=False)
+            # Bild speichern
+            if image_file:
+                from image_cache import save_picture
+                try:
+                    repo.update_person(new_id, picture_path=save_picture(image_file, new_id))
+                except OSError:
+                    st.error("Das Bild konnte nicht gelesen werden, die Person wurde ohne Bild angelegt.")
+
+            # EKG speichern – wenn möglich über den Annahme-Dienst
+            from ingest_server import error_message, server_available, submit_test
+            if ekg_file and test_date and server_available():
+                import requests
+                try:
+                    job = submit_test(ekg_file.getvalue(), ekg_file.name, new_id, test_date)
+                    st.session_state.setdefault("ingest_pending", []).append(job["id"])
+                except requests.RequestException as e:
+                    st.error(f"Die EKG-Datei wurde nicht gespeichert: {error_message(e)}")
+            elif ekg_file and test_date:
+                from ekg_parser import ParseError
+                from upload_store import store_upload
+                try:
+                    ekg_path, sha256, duplicate = store_upload(ekg_file)
+                    repo.add_ekg_test(new_id, test_date, ekg_path, sha256)
+                    if duplicate:
+                        st.info("Diese Aufnahme ist bereits gespeichert – der Test verweist auf die vorhandene Datei.")
+                except ParseError as e:
+                    st.error(f"Die EKG-Datei wurde nicht gespeichert, sie hat nicht das erwartete Format: {e}")
 
             st.success("✅ Neue Person erfolgreich angelegt!")
-            st.info(f"**Benutzername:** `{username}`\n**Passwort:** `{password}`")
+            st.info(f"**Benutzername:** `{new_person['username']}`\n**Passwort:** `{password}`")
 
 # --- Seite: PDF-Bericht erstellen (nur für Ärzt:innen) ---
 elif seite == "PDF-Bericht erstellen":
@@ -407,9 +434,12 @@ elif seite == "PDF-Bericht erstellen":
     elif st.session_state.current_person is None:
         st.info("Bitte zuerst eine Person auf der Seite 'Personendaten' auswählen.")
     else:
-        from pdf_export import export_pdf
+        from report_jobs import get_scheduler, tests_of_all_persons, tests_of_person
+
         person = st.session_state.current_person
         ekg_tests = person.ekg_tests
+        scheduler = get_scheduler()
+        person_dict = get_repository().get_by_id(person.id)
 
         if not ekg_tests:
             st.warning("Diese Person hat keine EKG-Tests.")
@@ -418,19 +448,35 @@ elif seite == "PDF-Bericht erstellen":
             selected_id = st.selectbox("Wähle EKG-Test für PDF-Bericht", test_ids)
             selected_test = next(t for t in ekg_tests if t["id"] == selected_id)
 
-            from ekgdata import EKGdata
-            ekg = EKGdata(selected_test)
-            ekg.find_peaks()
-
-            if st.button("PDF-Bericht generieren"):
-                pdf_path = export_pdf(person, selected_test, ekg)
-                with open(pdf_path, "rb") as f:
-                    st.download_button(
-                        label="📄 Bericht herunterladen",
-                        data=f,
-                        file_name="ekg_bericht.pdf",
-                        mime="application/pdf"
-                    )
+            # Berichte entstehen im Hintergrund, jeder Auftrag im eigenen Speicherpuffer
+            new_job = None
+            col1, col2, col3 = st.columns(3)
+            if analysis_ready(selected_id) and col1.button("PDF-Bericht generieren"):
+                new_job = scheduler.submit(person_dict, selected_test)
+            if col2.button("Alle Tests dieser Person (ZIP)"):
+                new_job = scheduler.submit_batch(tests_of_person(person_dict))
+            if col3.button("Alle Patient:innen (ZIP)"):
+                new_job = scheduler.submit_batch(tests_of_all_persons())
+            if new_job is not None:
+                if st.session_state.get("report_job"):
+                    scheduler.forget(st.session_state["report_job"])
+                st.session_state["report_job"] = new_job
+
+        job = scheduler.get(st.session_state.get("report_job"))
+        if job is not None:
+            finished, total = job.progress()
+            if job.error() is not None:
+                st.error(f"Fehler beim Erstellen des Berichts: {job.error()}")
+            elif not job.done():
+                st.info(f"Berichte werden erstellt … ({finished}/{total})")
+                st.button("Aktualisieren", key="report_refresh")
+            else:
+                st.download_button(
+                    label="📄 Bericht herunterladen" if total == 1 else f"📦 {total} Berichte herunterladen",
+                    data=job.result(),
+                    file_name=job.filename,
+                    mime=job.mime
+                )
 
 
 # --- Logout ---
@@ -441,6 +487,8 @@ elif seite == "Logout":
         del st.session_state["logged_in"]
         del st.session_state["role"]
         del st.session_state["username"]
+    if "ekg_lease" in st.session_state:
+        st.session_state.pop("ekg_lease").release()
     st.success("Erfolgreich ausgeloggt!")
     st.write("Bitte lade die Seite neu, um dich erneut einzuloggen.")
 else:
@@ -1,10 +1,123 @@
 import os
+import numpy as np
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import cm
+from reportlab.lib import colors
 from datetime import datetime
+from decimation import minmax_decimate
 
-def export_pdf(person, test, ekg_obj, output_path="ekg_bericht.pdf"):
+PLOT_POINTS = 1000    # Punkte pro Kurve – feiner löst eine A4-Seite ohnehin nicht auf
+STRIP_SECONDS = 10    # Länge eines EKG-Ausschnitts
+
+
+def _scale(values, lo, hi, origin, size):
+    span = hi - lo if hi > lo else 1
+    return origin + (np.clip(values, lo, hi) - lo) / span * size
+
+
+def _draw_frame(c, box, title, x_label, y_range, y_unit):
+    """Rahmen, Titel und Beschriftung der y-Achse eines Diagramms."""
+    x0, y0, w, h = box
+    c.setStrokeColor(colors.grey)
+    c.setLineWidth(0.5)
+    c.rect(x0, y0, w, h, stroke=1, fill=0)
+    c.setFillColor(colors.black)
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(x0, y0 + h + 0.2 * cm, title)
+    c.setFont("Helvetica", 8)
+    c.drawRightString(x0 - 0.1 * cm, y0 + h - 0.25 * cm, f"{y_range[1]:.0f}")
+    c.drawRightString(x0 - 0.1 * cm, y0, f"{y_range[0]:.0f}")
+    c.drawRightString(x0 - 0.1 * cm, y0 + h / 2, y_unit)
+    c.drawRightString(x0 + w, y0 - 0.35 * cm, x_label)
+
+
+def _draw_curve(c, x, y, box, x_range, y_range, color):
+    """Zeichnet eine Kurve als einen einzigen Vektorpfad."""
+    if len(x) < 2:
+        return
+    x0, y0, w, h = box
+    px = _scale(np.asarray(x, dtype=np.float64), *x_range, x0, w)
+    py = _scale(np.asarray(y, dtype=np.float64), *y_range, y0, h)
+    path = c.beginPath()
+    path.moveTo(px[0], py[0])
+    for a, b in zip(px[1:].tolist(), py[1:].tolist()):
+        path.lineTo(a, b)
+    c.setStrokeColor(color)
+    c.setLineWidth(0.6)
+    c.drawPath(path, stroke=1, fill=0)
+
+
+def strip_windows(ekg, seconds=STRIP_SECONDS):
+    """Start der EKG-Ausschnitte (ms): Beginn, kürzestes und längstes RR-Intervall."""
+    times = ekg.beat_times
+    half = seconds * 1000 / 2
+    windows = [("Beginn der Aufnahme", float(ekg.pyramid.levels[0][0][0]))]
+    rr = np.diff(times)
+    valid = np.flatnonzero(rr > 0)  # zurückspringende Zeitstempel auslassen
+    if len(valid):
+        for label, i in (("Kürzestes", valid[np.argmin(rr[valid])]), ("Längstes", valid[np.argmax(rr[valid])])):
+            center = (times[i] + times[i + 1]) / 2
+            windows.append((f"{label} RR-Intervall ({rr[i]} ms)", float(center - half)))
+    return windows
+
+
+def draw_ekg_strip(c, ekg, start_ms, box, title, seconds=STRIP_SECONDS):
+    """EKG-Ausschnitt aus der Min/Max-Pyramide mit markierten R-Peaks."""
+    end_ms = start_ms + seconds * 1000
+    t, v = ekg.pyramid.query(start_ms, end_ms, PLOT_POINTS)
+    y_range = (float(v.min()), float(v.max())) if len(v) else (0.0, 1.0)
+    pad = (y_range[1] - y_range[0]) * 0.05 or 1
+    y_range = (y_range[0] - pad, y_range[1] + pad)
+
+    _draw_frame(c, box, title, f"{seconds} s", y_range, "mV")
+    # Sekundenraster wie auf EKG-Papier
+    x0, y0, w, h = box
+    c.setStrokeColor(colors.Color(1, 0.8, 0.8))
+    c.setLineWidth(0.3)
+    for s in range(1, seconds):
+        c.line(x0 + s / seconds * w, y0, x0 + s / seconds * w, y0 + h)
+    _draw_curve(c, t, v, box, (start_ms, end_ms), y_range, colors.black)
+
+    times, peaks = ekg.beat_index.between(start_ms, end_ms)
+    if len(peaks):
+        values = ekg.signal.mv[peaks]
+        px = _scale(times.astype(np.float64), start_ms, end_ms, x0, w)
+        py = _scale(values.astype(np.float64), *y_range, y0, h)
+        c.setFillColor(colors.red)
+        for a, b in zip(px.tolist(), py.tolist()):
+            c.circle(a, b, 1.5, stroke=0, fill=1)
+        c.setFillColor(colors.black)
+
+
+def draw_hr_trend(c, ekg, box):
+    """Gleitende Herzfrequenz (wie im HR-Plot der App) über die ganze Aufnahme."""
+    hr_df = ekg.hr_trend.df  # zeitlich sortiert
+    x0, y0, w, h = box
+    t = hr_df["Zeit in s"].to_numpy()
+    hr = hr_df["HR_gemittelt"].to_numpy()
+    finite = np.isfinite(hr)  # z. B. unendlich bei zwei Peaks mit gleichem Zeitstempel
+    t, hr = t[finite], hr[finite]
+    if len(hr) == 0:
+        _draw_frame(c, box, "Herzfrequenz-Verlauf", "", (0, 0), "bpm")
+        c.drawString(x0 + 0.3 * cm, y0 + h / 2, "Keine Herzfrequenz – nicht genügend Peaks für einen Verlauf.")
+        return
+
+    if len(hr) > PLOT_POINTS:
+        t, hr = minmax_decimate(t, hr, int(np.ceil(2 * len(hr) / PLOT_POINTS)))
+
+    # Ausreißer (z. B. durch zurückspringende Zeitstempel) nicht die Skala bestimmen lassen
+    y_range = (max(0.0, float(np.percentile(hr, 1)) - 5), float(np.percentile(hr, 99)) + 5)
+    x_range = (float(t.min()), float(t.max()))
+    _draw_frame(c, box, "Herzfrequenz-Verlauf (gleitender Durchschnitt)",
+                f"{(x_range[1] - x_range[0]) / 60:.1f} min", y_range, "bpm")
+    _draw_curve(c, t, hr, box, x_range, y_range, colors.darkblue)
+
+
+def export_pdf(person, test, ekg_obj, output_path="ekg_bericht.pdf", summary=None, plots=True):
+    # output_path: Dateipfad oder Datei-Objekt (z. B. io.BytesIO)
+    # summary: bereits berechnete Kennwerte, sonst aus ekg_obj
+    # plots=False: nur Text, ohne HR-Verlauf und EKG-Ausschnitte
     # PDF erzeugen
     c = canvas.Canvas(output_path, pagesize=A4)
     width, height = A4
@@ -26,14 +139,12 @@ def export_pdf(person, test, ekg_obj, output_path="ekg_bericht.pdf"):
     y -= 1 * cm
 
     # Herzfrequenz-Daten
-    hr = ekg_obj.estimate_hr()
-    min_hr = ekg_obj.get_min_hr()
-    max_hr = ekg_obj.get_max_hr()
-    duration = ekg_obj.get_signal_duration_min()
+    if summary is None:
+        summary = ekg_obj.summary()
 
-    c.drawString(x_margin, y, f"Herzfrequenz: {hr} bpm (Min: {min_hr}, Max: {max_hr})")
+    c.drawString(x_margin, y, f"Herzfrequenz: {summary['avg_hr']} bpm (Min: {summary['min_hr']}, Max: {summary['max_hr']})")
     y -= 1 * cm
-    c.drawString(x_margin, y, f"Dauer der Aufnahme: {duration} Minuten")
+    c.drawString(x_margin, y, f"Dauer der Aufnahme: {summary['duration_min']} Minuten")
     y -= 1 * cm
 
     # Kommentar anzeigen
@@ -47,12 +158,33 @@ def export_pdf(person, test, ekg_obj, output_path="ekg_bericht.pdf"):
             c.drawString(x_margin, y, line)
             y -= 0.7 * cm
 
-    # Hinweis statt Plot
+    if not plots:
+        # Hinweis statt Plot
+        y -= 1 * cm
+        c.setFont("Helvetica-Oblique", 11)
+        c.drawString(x_margin, y, "Hinweis: Der EKG-Verlauf kann interaktiv in der App analysiert werden.")
+        y -= 0.6 * cm
+        c.drawString(x_margin, y, "Dieser Bericht enthält eine Zusammenfassung der Herzfrequenz und Auffälligkeiten.")
+        c.showPage()
+        c.save()
+        return output_path
+
+    plot_width = width - 2 * x_margin
+    plot_height = 6 * cm
+
+    # HR-Verlauf unter den Text, sonst auf eine neue Seite
     y -= 1 * cm
-    c.setFont("Helvetica-Oblique", 11)
-    c.drawString(x_margin, y, "Hinweis: Der EKG-Verlauf kann interaktiv in der App analysiert werden.")
-    y -= 0.6 * cm
-    c.drawString(x_margin, y, "Dieser Bericht enthält eine Zusammenfassung der Herzfrequenz und Auffälligkeiten.")
+    if y - plot_height < 2 * cm:
+        c.showPage()
+        y = height - 2 * cm
+    draw_hr_trend(c, ekg_obj, (x_margin, y - plot_height, plot_width, plot_height))
+    c.showPage()
+
+    # EKG-Ausschnitte um markante Schläge
+    y = height - 2 * cm
+    for title, start_ms in strip_windows(ekg_obj):
+        draw_ekg_strip(c, ekg_obj, start_ms, (x_margin, y - plot_height, plot_width, plot_height), title)
+        y -= plot_height + 2 * cm
 
     c.showPage()
     c.save()
@@ -0,0 +1,198 @@
+import numpy as np
+
+# scipy wird erst in den Funktionen importiert: allein `import scipy.signal`
+# kostet über eine Sekunde, und mit gespeicherten Analyseergebnissen wird es
+# beim Anzeigen eines Tests gar nicht gebraucht.
+
+SAMPLE_RATE = 500  # Hz, übliche Abtastrate der Aufnahmen (Bezug für `distance`)
+METHODS = ("threshold", "pan_tompkins")
+
+
+def sample_rate(ms, default=SAMPLE_RATE):
+    """Abtastrate in Hz aus der Zeitachse (Median der Abstände, robust gegen Jitter und Uhrsprünge)."""
+    steps = np.diff(np.asarray(ms))
+    steps = steps[steps > 0]
+    return 1000 / float(np.median(steps)) if len(steps) else default
+
+
+def stack_signals(signals):
+    """Legt unterschiedlich lange Signale als Zeilen eines 2-D-Arrays ab (rechts mit 0 aufgefüllt).
+
+    Gibt (Zeilen, Längen) zurück – die Längen markieren den gültigen Teil jeder Zeile.
+    """
+    signals = [np.asarray(s) for s in signals]
+    lengths = np.array([len(s) for s in signals], dtype=np.int64)
+    dtype = np.result_type(np.float32, *[s.dtype for s in signals])
+    rows = np.zeros((len(signals), lengths.max(initial=0)), dtype=dtype)
+    for row, signal in zip(rows, signals):
+        row[:len(signal)] = signal
+    return rows, lengths
+
+
+def _row_lengths(rows, lengths):
+    if lengths is None:
+        return np.full(rows.shape[0], rows.shape[1], dtype=np.int64)
+    return np.minimum(np.asarray(lengths, dtype=np.int64), rows.shape[1])
+
+
+def _batched_find_peaks(rows, lengths, distance, height):
+    """Lokale Maxima und Höhenfilter für alle Zeilen in einem einzigen `find_peaks`-Aufruf.
+
+    Die Zeilen werden hintereinandergehängt, getrennt durch einen Wert, der
+    höher liegt als jedes Signal – der erste und letzte gültige Wert einer
+    Zeile ist damit wie bei scipy nie ein Peak. Der Mindestabstand wird
+    danach pro Zeile mit derselben Routine wie in `find_peaks` geprüft, das
+    Ergebnis ist also identisch mit der Einzelauswertung.
+    """
+    from scipy.signal import find_peaks
+    try:
+        # Die Abstandsprüfung aus scipy.signal.find_peaks (intern, daher abgesichert)
+        from scipy.signal._peak_finding_utils import _select_by_peak_distance
+    except ImportError:
+        _select_by_peak_distance = None
+
+    n_rows, width = rows.shape
+    if _select_by_peak_distance is None:
+        return [find_peaks(row[:n], distance=distance, height=height)[0] for row, n in zip(rows, lengths)]
+    if not lengths.any():
+        return [np.empty(0, dtype=np.int64) for _ in range(n_rows)]
+
+    stride = width + 1
+    fill = max(row[:n].max() for row, n in zip(rows, lengths) if n > 0) + 1
+    padded = np.empty((n_rows, stride), dtype=np.float64)
+    padded[:, :width] = rows
+    for row, n in zip(padded, lengths):
+        row[n:] = fill
+
+    flat = padded.ravel()
+    candidates, _ = find_peaks(flat, height=height)
+    candidates = candidates[flat[candidates] < fill]
+    bounds = np.searchsorted(candidates, np.arange(1, n_rows) * stride)
+
+    peaks = []
+    for row, found in enumerate(np.split(candidates, bounds)):
+        if distance is not None and len(found) > 1:
+            found = found[_select_by_peak_distance(found, flat[found], np.float64(distance))]
+        peaks.append((found - row * stride).astype(np.int64))
+    return peaks
+
+
+def pan_tompkins_signal(rows, fs=SAMPLE_RATE):
+    """Band-Pass (5–15 Hz), Ableitung, Quadrierung und gleitendes Integral (150 ms) entlang jeder Zeile."""
+    from scipy.ndimage import uniform_filter1d
+    from scipy.signal import butter, sosfiltfilt
+
+    rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+    sos = butter(2, [5, 15], btype="bandpass", fs=fs, output="sos")
+    padlen = min(3 * (2 * len(sos) + 1), rows.shape[1] - 1)
+    filtered = sosfiltfilt(sos, rows, axis=-1, padlen=padlen)
+    derivative = np.gradient(filtered, axis=-1) * fs
+    return uniform_filter1d(derivative ** 2, size=max(1, int(0.15 * fs)), axis=-1)
+
+
+def adaptive_threshold(integrated, fs=SAMPLE_RATE, window_s=2.0, ratio=0.25):
+    """Schwelle NPK + ratio * (SPK - NPK) mit gleitendem Maximum (SPK) und Mittel (NPK) über `window_s`."""
+    from scipy.ndimage import maximum_filter1d, uniform_filter1d
+
+    size = max(1, int(window_s * fs))
+    signal_level = maximum_filter1d(integrated, size=size, axis=-1)
+    noise_level = uniform_filter1d(integrated, size=size, axis=-1)
+    return noise_level + ratio * (signal_level - noise_level)
+
+
+def _refine(raw, candidates, length, search):
+    """Verschiebt Kandidaten auf das Maximum des Rohsignals im Umkreis von `search` Werten."""
+    if len(candidates) == 0:
+        return candidates
+    offsets = np.arange(-search, search + 1)
+    window = np.clip(candidates[:, None] + offsets, 0, length - 1)
+    best = window[np.arange(len(window)), np.argmax(raw[window], axis=1)]
+    return np.unique(best)
+
+
+def detect_peaks_batch(signals, lengths=None, distance=200, height=0.5, method="threshold",
+                       fs=SAMPLE_RATE):
+    """R-Peaks für alle Zeilen eines 2-D-Arrays (mehrere Aufnahmen oder Ableitungen) in einem Durchgang.
+
+    signals: 2-D-Array, eine Aufnahme pro Zeile; kürzere Zeilen rechts aufgefüllt
+             und über `lengths` markiert (siehe `stack_signals`).
+    method:  "threshold" – lokale Maxima über `height` mit Mindestabstand `distance`
+             (wie `scipy.signal.find_peaks`);
+             "pan_tompkins" – Band-Pass, Ableitung, Quadrierung, Integration und
+             adaptive Schwelle, danach auf das Maximum des Rohsignals verschoben
+             (`height` gilt dann für das Rohsignal, `distance` in Messwerten bei
+             SAMPLE_RATE wird auf `fs` umgerechnet).
+    fs:      Abtastrate in Hz (siehe `sample_rate`), eine für alle Zeilen oder eine pro Zeile.
+    Gibt eine Liste mit einem Index-Array pro Zeile zurück.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unbekannte Methode: {method} (erlaubt: {', '.join(METHODS)})")
+    rows = np.atleast_2d(np.asarray(signals))
+    lengths = _row_lengths(rows, lengths)
+
+    if method == "threshold":
+        return _batched_find_peaks(rows, lengths, distance, height)
+
+    if np.ndim(fs):
+        # Filter hängen von der Abtastrate ab: Zeilen gleicher Rate gemeinsam auswerten
+        rates = np.asarray(fs, dtype=np.float64)
+        peaks = [None] * len(rows)
+        for rate in np.unique(rates):
+            group = np.flatnonzero(rates == rate)
+            found = detect_peaks_batch(rows[group], lengths[group], distance, height, method, float(rate))
+            for row, row_peaks in zip(group, found):
+                peaks[row] = row_peaks
+        return peaks
+
+    # Aufgefüllten Rest mit dem letzten gültigen Wert belegen, damit der Filter dort nicht springt
+    last = rows[np.arange(len(rows)), np.maximum(lengths - 1, 0)]
+    edge = np.where(np.arange(rows.shape[1])[None, :] < lengths[:, None], rows, last[:, None])
+    integrated = pan_tompkins_signal(edge, fs)
+    above = integrated - adaptive_threshold(integrated, fs)
+    refractory = None if distance is None else distance * fs / SAMPLE_RATE
+    candidates = _batched_find_peaks(above, lengths, refractory, 0)
+
+    search = max(1, int(0.075 * fs))
+    peaks = []
+    for raw, found, length in zip(rows, candidates, lengths):
+        refined = _refine(raw, found, length, search)
+        if height is not None:
+            refined = refined[raw[refined] >= height]
+        peaks.append(refined)
+    return peaks
+
+
+def detect_peaks(signal, distance=200, height=0.5, method="threshold", fs=SAMPLE_RATE):
+    """R-Peaks eines einzelnen Signals; Index-Array wie `scipy.signal.find_peaks`."""
+    signal = np.asarray(signal)
+    if method == "threshold":
+        from scipy.signal import find_peaks
+        peaks, _ = find_peaks(signal, distance=distance, height=height)
+        return peaks
+    return detect_peaks_batch(signal[None, :], None, distance, height, method, fs)[0]
+
+
+if __name__ == "__main__":
+    import glob
+    import time
+
+    from ekg_cache import load_recording
+
+    paths = sorted(p for p in glob.glob("data/ekg_data/*.txt") if not p.lower().endswith("readme.txt"))
+    loaded = [load_recording(p) for p in paths]
+    recordings = [mv for mv, _ in loaded]
+    rates = [sample_rate(ms) for _, ms in loaded]
+
+    start = time.perf_counter()
+    single = [detect_peaks(mv) for mv in recordings]
+    t_single = time.perf_counter() - start
+
+    rows, lengths = stack_signals(recordings)
+    start = time.perf_counter()
+    batched = detect_peaks_batch(rows, lengths)
+    t_batched = time.perf_counter() - start
+    pan_tompkins = detect_peaks_batch(rows, lengths, method="pan_tompkins", fs=rates)
+
+    for path, a, b, c in zip(paths, single, batched, pan_tompkins):
+        print(f"{path}: {len(a)} Peaks einzeln, {len(b)} im Batch, {len(c)} mit Pan-Tompkins")
+    print(f"einzeln {t_single * 1000:.1f} ms, Batch {t_batched * 1000:.1f} ms")
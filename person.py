@@ -1,14 +1,12 @@
-import json
 from datetime import datetime 
+from person_repository import get_repository
 
 class Person:
     
     @staticmethod
     def load_person_data():
         """A Function that knows where te person Database is and returns a Dictionary with the Persons"""
-        file = open("data/person_db.json")
-        person_data = json.load(file)
-        return person_data
+        return get_repository().all()
 
     @staticmethod
     def get_person_list(person_data):
@@ -24,23 +22,10 @@ class Person:
         """ Eine Funktion der Nachname, Vorname als ein String übergeben wird
         und die die Person als Dictionary zurück gibt"""
 
-        person_data = Person.load_person_data()
-        #print(suchstring)
         if suchstring == "None":
             return {}
 
-        two_names = suchstring.split(", ")
-        vorname = two_names[1]
-        nachname = two_names[0]
-
-        for eintrag in person_data:
-            print(eintrag)
-            if (eintrag["lastname"] == nachname and eintrag["firstname"] == vorname):
-                print()
-
-                return eintrag
-        else:
-            return {}
+        return get_repository().get_by_name(suchstring) or {}
 
         
     def __init__(self, person_dict) -> None:
@@ -66,7 +51,12 @@ class Person:
         return max_hf
     
 
-    def load_by_id(person_id, person_list):
+    @staticmethod
+    def load_by_id(person_id, person_list=None):
+        if person_list is None:
+            person_dict = get_repository().get_by_id(person_id)
+            return Person(person_dict) if person_dict else None
+
         for p in person_list:
             if p["id"] == person_id:
                 return Person(p)
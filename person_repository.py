@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+from collections import namedtuple
+
+import json_handler
+
+DB_PATH = "data/person_db.json"
+LOGIN_PATH = "data/logindaten.json"
+SQLITE_PATH = "data/ekg.sqlite3"
+
+
+def person_name(person_dict):
+    """Anzeigename im Format "Nachname, Vorname" (wie in der Personenauswahl)."""
+    return person_dict["lastname"] + ", " + person_dict["firstname"]
+
+
+_Indexes = namedtuple("_Indexes", "persons by_id by_username by_name tests person_by_test")
+
+
+def _build_indexes(persons):
+    by_id, by_username, by_name, tests, person_by_test = {}, {}, {}, {}, {}
+    for person in persons:
+        by_id[person["id"]] = person
+        if person.get("username"):
+            by_username[person["username"]] = person
+        by_name.setdefault(person_name(person), person)
+        for test in person.get("ekg_tests", []):
+            tests[test["id"]] = test
+            person_by_test[test["id"]] = person
+    return _Indexes(persons, by_id, by_username, by_name, tests, person_by_test)
+
+
+class PersonRepository:
+    """Hält die Personendatenbank im Speicher und beantwortet Suchen über Indizes.
+
+    Die Datei wird nur neu eingelesen, wenn sich Inode, Änderungszeit oder
+    Größe geändert haben. Die zurückgegebenen Dictionaries gehören dem Repository
+    und dürfen nicht verändert werden.
+    """
+
+    def __init__(self, path=DB_PATH, login_path=LOGIN_PATH):
+        self.path = path
+        self.login_path = login_path
+        self._lock = threading.Lock()
+        self._version = None
+        self._indexes = _build_indexes([])
+
+    def _refresh(self):
+        """Gibt die aktuellen Indizes zurück und liest die Datei nur bei Änderungen neu ein.
+
+        Die Indizes werden vollständig aufgebaut und erst dann ausgetauscht,
+        damit andere Sitzungs-Threads nie einen halb gefüllten Stand sehen.
+        """
+        stat = os.stat(self.path)
+        # os.replace legt eine neue Inode an; gleiche Größe und mtime reichen allein nicht
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if version != self._version:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    persons = json.load(f)
+                self._indexes = _build_indexes(persons)
+                self._version = version
+            return self._indexes
+
+    def all(self):
+        return self._refresh().persons
+
+    def names(self):
+        return [person_name(p) for p in self._refresh().persons]
+
+    def get_by_id(self, person_id):
+        return self._refresh().by_id.get(person_id)
+
+    def get_by_username(self, username):
+        return self._refresh().by_username.get(username)
+
+    def get_by_name(self, name):
+        return self._refresh().by_name.get(name)
+
+    def get_test(self, test_id):
+        return self._refresh().tests.get(test_id)
+
+    def get_person_by_test(self, test_id):
+        return self._refresh().person_by_test.get(test_id)
+
+    def get_login(self, username):
+        with open(self.login_path, "r", encoding="utf-8") as f:
+            return json.load(f).get(username)
+
+    # --- Schreibzugriffe (die Indizes werden beim nächsten Lesen erneuert) ---
+
+    def add_login(self, username, firstname, role="Patient:in"):
+        return json_handler.add_login(username, firstname, role, self.login_path)
+
+    def add_person(self, firstname, lastname, date_of_birth):
+        """Legt eine Person samt Login an und gibt (Person, Passwort) zurück."""
+        return json_handler.add_person_to_json(firstname, lastname, date_of_birth, self.path, self.login_path)
+
+    def update_person(self, person_id, **changes):
+        json_handler.update_person(person_id, changes, self.path)
+
+    def add_ekg_test(self, person_id, date, result_link, sha256=None):
+        return json_handler.add_ekg_test(person_id, date, result_link, self.path, sha256=sha256)
+
+    def update_test_comment(self, test_id, comment):
+        json_handler.update_test_comment(test_id, comment, self.path)
+
+
+_repositories = {}
+
+
+def get_repository(path=DB_PATH):
+    """Gibt das (prozessweit geteilte) Repository für die Personendaten zurück.
+
+    Mit der Umgebungsvariable EKG_STORAGE=sqlite wird statt der JSON-Dateien
+    die SQLite-Datenbank (EKG_SQLITE_PATH, Standard data/ekg.sqlite3) benutzt.
+    """
+    if os.environ.get("EKG_STORAGE", "json") == "sqlite":
+        from sqlite_store import SQLiteStore
+        path = os.environ.get("EKG_SQLITE_PATH", SQLITE_PATH)
+        factory = SQLiteStore
+    else:
+        factory = PersonRepository
+
+    key = os.path.abspath(path)
+    if key not in _repositories:
+        _repositories[key] = factory(path)
+    return _repositories[key]
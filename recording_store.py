@@ -0,0 +1,82 @@
+"""Prozessweiter Speicher für die Messwerte der EKG-Aufnahmen.
+
+Jede Aufnahme liegt pro Prozess nur einmal als `EKGSignal` vor; alle
+EKGdata-Objekte (aller Streamlit-Sessions) bekommen dasselbe, schreibgeschützte
+Objekt. Die Arrays sind Memory-Maps auf den Binär-Cache (`ekg_cache`), daher
+teilen sich auch mehrere Prozesse (App, Berichts- und Annahme-Worker) die
+Seiten über den Page Cache des Betriebssystems.
+
+Gezählt wird über Pythons Referenzzählung: Der Speicher hält die Signale nur
+schwach; sobald kein EKGdata-Objekt mehr auf eine Aufnahme verweist, wird sie
+freigegeben und beim nächsten Zugriff neu (als Memory-Map, ohne Parsen) geholt.
+"""
+import os
+import threading
+import weakref
+
+import numpy as np
+
+from ekg_cache import fingerprint, load_recording
+from ekg_signal import EKGSignal
+
+
+def _mapped_bytes(array):
+    if array is None:
+        return 0
+    return array.nbytes if isinstance(array, np.memmap) or isinstance(array.base, np.memmap) else 0
+
+
+def _read_only(array):
+    if isinstance(array, np.ndarray) and array.flags.writeable:
+        array.flags.writeable = False
+    return array
+
+
+class RecordingStore:
+
+    def __init__(self):
+        self._signals = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.shared = 0
+
+    @staticmethod
+    def key(path):
+        stat = fingerprint(path)
+        return os.path.abspath(path), stat["size"], stat["mtime_ns"]
+
+    def get(self, path):
+        """Das gemeinsame Signal einer Aufnahmedatei; wird bei Bedarf geladen."""
+        key = self.key(path)
+        with self._lock:
+            signal = self._signals.get(key)
+            if signal is not None:
+                self.shared += 1
+                return signal
+            # Unter dem Lock laden, damit zwei Sessions dieselbe Datei nicht doppelt einlesen
+            mv, ms = load_recording(path)
+            signal = EKGSignal(_read_only(mv), _read_only(ms))
+            if signal._ms is not None:
+                _read_only(signal._ms)
+            self._signals[key] = signal
+            self.loads += 1
+            return signal
+
+    def stats(self):
+        with self._lock:
+            signals = list(self._signals.values())
+            return {
+                "recordings": len(signals),
+                "bytes": sum(s.nbytes for s in signals),
+                # Memory-Maps liegen im Page Cache und werden zwischen Prozessen geteilt
+                "mapped_bytes": sum(_mapped_bytes(s.mv) + _mapped_bytes(s._ms) for s in signals),
+                "loads": self.loads,
+                "shared": self.shared,
+            }
+
+
+store = RecordingStore()
+
+
+def shared_signal(path):
+    return store.get(path)
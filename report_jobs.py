@@ -0,0 +1,189 @@
+import argparse
+import io
+import re
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from ekgdata import EKGdata
+from pdf_export import export_pdf
+from person import Person
+from person_repository import get_repository
+
+JOB_TTL_S = 3600  # fertige Berichte so lange abrufbar, danach gibt der Scheduler den Speicher frei
+
+
+def render_report(person_dict, test):
+    """Erzeugt den PDF-Bericht eines Tests im Speicher (läuft im Worker-Prozess).
+
+    Die Kennwerte kommen aus dem Analyse-Speicher, solange die EKG-Datei
+    unverändert ist – das Signal wird dann gar nicht erst geladen.
+    """
+    ekg = EKGdata(test)
+    buffer = io.BytesIO()
+    export_pdf(Person(person_dict), test, ekg, buffer)
+    return buffer.getvalue()
+
+
+def report_filename(person_dict, test):
+    name = re.sub(r"[^\w-]+", "_", f"{person_dict['lastname']}_{person_dict['firstname']}").strip("_")
+    return f"ekg_bericht_{name}_test{test['id']}.pdf"
+
+
+def tests_of_person(person_dict):
+    return [(person_dict, test) for test in person_dict.get("ekg_tests", [])]
+
+
+def tests_of_all_persons():
+    return [item for person in get_repository().all() for item in tests_of_person(person)]
+
+
+class ReportJob:
+    """Ein oder mehrere Berichte, die im Pool gerendert werden; mehrere ergeben ein ZIP."""
+
+    def __init__(self, futures, as_zip):
+        self.futures = futures  # Liste von (Dateiname, Future)
+        self.as_zip = as_zip
+        self.created = time.time()
+        self.finished = None
+        self._result = None
+        for _, future in futures:
+            future.add_done_callback(self._mark_finished)
+
+    def _mark_finished(self, _future):
+        if self.finished is None and self.done():
+            self.finished = time.time()
+
+    @property
+    def filename(self):
+        return "ekg_berichte.zip" if self.as_zip else self.futures[0][0]
+
+    @property
+    def mime(self):
+        return "application/zip" if self.as_zip else "application/pdf"
+
+    def progress(self):
+        return sum(f.done() for _, f in self.futures), len(self.futures)
+
+    def done(self):
+        return all(f.done() for _, f in self.futures)
+
+    def error(self):
+        for _, future in self.futures:
+            if future.done() and future.exception() is not None:
+                return future.exception()
+        return None
+
+    def result(self, timeout=None):
+        """PDF- bzw. ZIP-Bytes; wartet, bis alle Berichte fertig sind."""
+        if self._result is None:
+            if not self.as_zip:
+                self._result = self.futures[0][1].result(timeout)
+            else:
+                buffer = io.BytesIO()
+                with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+                    for filename, future in self.futures:
+                        archive.writestr(filename, future.result(timeout))
+                self._result = buffer.getvalue()
+        return self._result
+
+
+class ReportScheduler:
+    """Verteilt Berichte auf einen Prozess-Pool; jeder Auftrag bekommt eine eigene ID."""
+
+    def __init__(self, workers=None):
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def _add(self, items, as_zip):
+        futures = []
+        seen = {}
+        for person, test in items:
+            filename = report_filename(person, test)
+            seen[filename] = seen.get(filename, 0) + 1
+            if seen[filename] > 1:
+                filename = filename.replace(".pdf", f"_{seen[filename]}.pdf")
+            futures.append((filename, self.pool.submit(render_report, person, test)))
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._forget_old_jobs()
+            self.jobs[job_id] = ReportJob(futures, as_zip)
+        return job_id
+
+    def _forget_old_jobs(self):
+        # Aufträge beendeter Sitzungen holt niemand mehr ab; ihre PDF-/ZIP-Bytes nicht ewig halten
+        limit = time.time() - JOB_TTL_S
+        for job_id in [j for j, job in self.jobs.items() if job.finished and job.finished < limit]:
+            del self.jobs[job_id]
+
+    def submit(self, person_dict, test):
+        """Ein einzelner Bericht als PDF."""
+        return self._add([(person_dict, test)], as_zip=False)
+
+    def submit_batch(self, items):
+        """Mehrere Berichte (Liste von (Person, Test)) als ein ZIP."""
+        if not items:
+            raise ValueError("Keine EKG-Tests für den Bericht ausgewählt")
+        return self._add(items, as_zip=True)
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def forget(self, job_id):
+        with self._lock:
+            self.jobs.pop(job_id, None)
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Der prozessweit geteilte Scheduler (wird beim ersten Bericht gestartet)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ReportScheduler()
+        return _scheduler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF-Berichte parallel erzeugen")
+    parser.add_argument("--person", type=int, help="nur die Tests dieser Person (ID)")
+    parser.add_argument("--output", default="ekg_berichte.zip")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Prozesse (Standard: alle Kerne)")
+    parser.add_argument("--repeat", type=int, default=1, help="jeden Bericht mehrfach erzeugen (Durchsatzmessung)")
+    args = parser.parse_args()
+
+    if args.person is not None:
+        person = get_repository().get_by_id(args.person)
+        if person is None:
+            raise SystemExit(f"Keine Person mit ID {args.person}")
+        items = tests_of_person(person)
+    else:
+        items = tests_of_all_persons()
+    if not items:
+        raise SystemExit("Keine EKG-Tests gefunden.")
+
+    scheduler = ReportScheduler(args.workers)
+    warmup = scheduler.submit(*items[0])
+    scheduler.get(warmup).result()  # Pool starten, bevor gemessen wird
+    scheduler.forget(warmup)
+    start = time.perf_counter()
+    job_id = scheduler.submit_batch(items * args.repeat)
+    data = scheduler.get(job_id).result()
+    elapsed = time.perf_counter() - start
+    scheduler.shutdown()
+
+    with open(args.output, "wb") as f:
+        f.write(data)
+    reports = len(items) * args.repeat
+    print(f"{reports} Berichte in {elapsed:.2f} s -> {args.output} ({len(data) / 1024:.0f} KiB)")
+    print(f"Durchsatz: {reports / elapsed:.1f} Berichte/s")
@@ -0,0 +1,226 @@
+import argparse
+import json
+import sqlite3
+import threading
+
+from json_handler import unique_username
+
+SQLITE_PATH = "data/ekg.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS persons (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    firstname TEXT NOT NULL,
+    lastname TEXT NOT NULL,
+    username TEXT UNIQUE,
+    date_of_birth INTEGER,
+    picture_path TEXT NOT NULL DEFAULT '',
+    role TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_persons_name ON persons (lastname, firstname);
+
+CREATE TABLE IF NOT EXISTS ekg_tests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    person_id INTEGER NOT NULL REFERENCES persons (id),
+    date TEXT NOT NULL,
+    result_link TEXT NOT NULL,
+    comment TEXT NOT NULL DEFAULT '',
+    sha256 TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_ekg_tests_person ON ekg_tests (person_id);
+
+CREATE TABLE IF NOT EXISTS logins (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL
+);
+"""
+
+PERSON_COLUMNS = ("id", "firstname", "lastname", "username", "date_of_birth", "picture_path", "role")
+PERSON_FIELDS = {"firstname", "lastname", "username", "date_of_birth", "picture_path", "role"}
+
+
+class SQLiteStore:
+    """SQLite-Backend mit derselben Schnittstelle wie PersonRepository.
+
+    Personen, EKG-Tests und Logins liegen in eigenen Tabellen; Änderungen
+    betreffen nur die jeweilige Zeile, neue IDs vergibt die Datenbank.
+    Jeder Thread (Streamlit-Session) bekommt eine eigene Verbindung im WAL-Modus.
+    """
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            # Datenbanken von vor der inhaltsadressierten Ablage nachrüsten
+            if "sha256" not in {row["name"] for row in conn.execute("PRAGMA table_info(ekg_tests)")}:
+                conn.execute("ALTER TABLE ekg_tests ADD COLUMN sha256 TEXT NOT NULL DEFAULT ''")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    # --- Lesen (liefert dieselben Dictionaries wie person_db.json) ---
+
+    def _person_dicts(self, where="", params=()):
+        conn = self._connect()
+        rows = conn.execute(f"SELECT * FROM persons {where} ORDER BY id", params).fetchall()
+        persons = {}
+        for row in rows:
+            person = {key: row[key] for key in PERSON_COLUMNS if row[key] is not None or key != "role"}
+            person["ekg_tests"] = []
+            persons[row["id"]] = person
+
+        # Tests aller gefundenen Personen mit einer Abfrage nachladen
+        if where:
+            placeholders = ", ".join("?" for _ in persons)
+            tests = conn.execute(
+                f"SELECT * FROM ekg_tests WHERE person_id IN ({placeholders}) ORDER BY id", tuple(persons)
+            )
+        else:
+            tests = conn.execute("SELECT * FROM ekg_tests ORDER BY id")
+        for t in tests:
+            persons[t["person_id"]]["ekg_tests"].append(self._test_dict(t))
+        return list(persons.values())
+
+    @staticmethod
+    def _test_dict(row):
+        test = {"id": row["id"], "date": row["date"], "result_link": row["result_link"], "comment": row["comment"]}
+        if row["sha256"]:
+            test["sha256"] = row["sha256"]
+        return test
+
+    def _one(self, where, params):
+        persons = self._person_dicts(where, params)
+        return persons[0] if persons else None
+
+    def all(self):
+        return self._person_dicts()
+
+    def names(self):
+        rows = self._connect().execute("SELECT lastname, firstname FROM persons ORDER BY id")
+        return [f"{r['lastname']}, {r['firstname']}" for r in rows]
+
+    def get_by_id(self, person_id):
+        return self._one("WHERE id = ?", (person_id,))
+
+    def get_by_username(self, username):
+        return self._one("WHERE username = ?", (username,))
+
+    def get_by_name(self, name):
+        lastname, _, firstname = name.partition(", ")
+        return self._one("WHERE lastname = ? AND firstname = ?", (lastname, firstname))
+
+    def get_test(self, test_id):
+        row = self._connect().execute("SELECT * FROM ekg_tests WHERE id = ?", (test_id,)).fetchone()
+        return self._test_dict(row) if row else None
+
+    def get_person_by_test(self, test_id):
+        return self._one("WHERE id = (SELECT person_id FROM ekg_tests WHERE id = ?)", (test_id,))
+
+    def get_login(self, username):
+        row = self._connect().execute(
+            "SELECT password, role FROM logins WHERE username = ?", (username,)
+        ).fetchone()
+        return {"password": row["password"], "role": row["role"]} if row else None
+
+    # --- Schreiben: jeweils eine Zeile pro Änderung ---
+
+    def add_login(self, username, firstname, role="Patient:in"):
+        password = firstname.lower() + "123"
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO logins (username, password, role) VALUES (?, ?, ?)",
+                (username, password, role),
+            )
+        return password
+
+    def add_person(self, firstname, lastname, date_of_birth):
+        """Legt eine Person samt Login an und gibt (Person, Passwort) zurück."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")  # Schreibsperre: zwei Sessions vergeben nicht denselben Namen
+            taken = {row[0] for row in conn.execute(
+                "SELECT username FROM persons WHERE username IS NOT NULL UNION SELECT username FROM logins")}
+            username = unique_username(firstname, lastname, taken)
+            cursor = conn.execute(
+                "INSERT INTO persons (firstname, lastname, username, date_of_birth) VALUES (?, ?, ?, ?)",
+                (firstname, lastname, username, date_of_birth),
+            )
+        password = self.add_login(username, firstname)
+        return self.get_by_id(cursor.lastrowid), password
+
+    def update_person(self, person_id, **changes):
+        unknown = set(changes) - PERSON_FIELDS
+        if unknown:
+            raise ValueError(f"Unbekannte Felder: {', '.join(sorted(unknown))}")
+        if not changes:
+            return
+        assignments = ", ".join(f"{key} = ?" for key in changes)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE persons SET {assignments} WHERE id = ?", (*changes.values(), person_id))
+
+    def add_ekg_test(self, person_id, date, result_link, sha256=None):
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO ekg_tests (person_id, date, result_link, sha256) VALUES (?, ?, ?, ?)",
+                (person_id, date, result_link, sha256 or ""),
+            )
+        return self.get_test(cursor.lastrowid)
+
+    def update_test_comment(self, test_id, comment):
+        with self._connect() as conn:
+            conn.execute("UPDATE ekg_tests SET comment = ? WHERE id = ?", (comment, test_id))
+
+
+def migrate_from_json(person_path="data/person_db.json", login_path="data/logindaten.json",
+                      db_path=SQLITE_PATH):
+    """Überträgt person_db.json und logindaten.json einmalig in die SQLite-Datenbank (IDs bleiben erhalten)."""
+    with open(person_path, "r", encoding="utf-8") as f:
+        persons = json.load(f)
+    with open(login_path, "r", encoding="utf-8") as f:
+        logins = json.load(f)
+
+    store = SQLiteStore(db_path)
+    with store._connect() as conn:
+        for p in persons:
+            conn.execute(
+                "INSERT INTO persons (id, firstname, lastname, username, date_of_birth, picture_path, role)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET"
+                " firstname = excluded.firstname, lastname = excluded.lastname, username = excluded.username,"
+                " date_of_birth = excluded.date_of_birth, picture_path = excluded.picture_path, role = excluded.role",
+                (p["id"], p["firstname"], p["lastname"], p.get("username"), p.get("date_of_birth"),
+                 p.get("picture_path", ""), p.get("role")),
+            )
+            for t in p.get("ekg_tests", []):
+                conn.execute(
+                    "INSERT OR REPLACE INTO ekg_tests (id, person_id, date, result_link, comment, sha256)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (t["id"], p["id"], t["date"], t["result_link"], t.get("comment", ""), t.get("sha256", "")),
+                )
+        for username, login in logins.items():
+            conn.execute(
+                "INSERT OR REPLACE INTO logins (username, password, role) VALUES (?, ?, ?)",
+                (username, login["password"], login["role"]),
+            )
+
+    tests = sum(len(p.get("ekg_tests", [])) for p in persons)
+    return len(persons), tests, len(logins)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite-Datenbank aus den JSON-Dateien erzeugen")
+    parser.add_argument("--persons", default="data/person_db.json")
+    parser.add_argument("--logins", default="data/logindaten.json")
+    parser.add_argument("--db", default=SQLITE_PATH)
+    args = parser.parse_args()
+
+    persons, tests, logins = migrate_from_json(args.persons, args.logins, args.db)
+    print(f"{persons} Personen, {tests} EKG-Tests und {logins} Logins nach {args.db} übernommen.")
+    print("Zum Verwenden: EKG_STORAGE=sqlite streamlit run main.py")
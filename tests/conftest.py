@@ -0,0 +1,17 @@
+"""Gemeinsame Fixtures der Tests."""
+import pytest
+
+import person_repository
+
+
+@pytest.fixture
+def isolated_data(tmp_path, monkeypatch):
+    """Arbeitsverzeichnis tmp_path: Binär-Cache, Analyse-Speicher und Personendaten liegen dort.
+
+    Alle Module legen ihre Pfade relativ zu data/ fest, auch als
+    Standardargumente – der Wechsel des Arbeitsverzeichnisses leitet sie
+    gemeinsam um. Das Repository wird neu angelegt und findet keine Personen.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(person_repository, "_repositories", {})
+    return tmp_path
@@ -0,0 +1,47 @@
+"""Analyse-Speicher: kaputte Einträge und gleichzeitige Schreiber."""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import analysis_store
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "aufnahme.txt"
+    path.write_bytes(b"512\t0\n514\t2\n530\t4\n")
+    return str(path)
+
+
+def _save(source, store_dir, n=1000):
+    peaks = np.arange(n)
+    return analysis_store.save_analysis(1, source, peaks, peaks, peaks, {"avg_hr": 60}, store_dir=store_dir)
+
+
+@pytest.mark.parametrize("keep", [0, 3, 100, 0.5])
+def test_truncated_entry_is_a_miss(tmp_path, source, keep):
+    store_dir = str(tmp_path / "store")
+    path = _save(source, store_dir)
+    data = open(path, "rb").read()
+    with open(path, "wb") as f:
+        f.write(data[:int(len(data) * keep) if isinstance(keep, float) else keep])
+
+    assert analysis_store.load_analysis(1, source, store_dir=store_dir) is None
+
+
+def test_concurrent_writers_leave_a_complete_entry(tmp_path, source):
+    store_dir = str(tmp_path / "store")
+
+    def write(_):
+        for _ in range(20):
+            _save(source, store_dir, n=20000)
+            analysis_store.save_hrv(1, source, {"sdnn": 1.0}, 60, store_dir=store_dir)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(write, range(8)))
+
+    assert sorted(os.listdir(store_dir)) == ["test_1_d200_h0.5.npz", "test_1_d200_h0.5_hrv.json"]
+    assert len(analysis_store.load_analysis(1, source, store_dir=store_dir)["peaks"]) == 20000
+    assert analysis_store.load_hrv(1, source, 60, store_dir=store_dir) == {"sdnn": 1.0}
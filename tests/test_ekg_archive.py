@@ -0,0 +1,96 @@
+"""Round-Trip des .ekgz-Archivformats: Textdatei -> Archiv -> Messwerte."""
+import glob
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import batch_analyze
+from ekg_archive import ArchiveReader, archive_path, convert, read_archive, verify, write_archive
+from ekg_cache import parse_recording
+from ekg_parser import read_recording
+
+RECORDINGS = sorted(p for p in glob.glob("data/ekg_data/*.txt") if os.path.basename(p).lower() != "readme.txt")
+
+
+@pytest.mark.parametrize("path", RECORDINGS, ids=os.path.basename)
+def test_bundled_recordings_round_trip_losslessly(tmp_path, path):
+    archive = convert(path, output=str(tmp_path / "aufnahme.ekgz"))
+    result = verify(path, archive)
+
+    assert result["mv_exact"] and result["time_exact"]
+    assert result["archive_bytes"] < result["text_bytes"]
+
+
+def test_partial_reads_match_the_full_recording(tmp_path):
+    mv, ms = read_recording(RECORDINGS[0])
+    path = str(tmp_path / "aufnahme.ekgz")
+    write_archive(path, mv, ms, codec="lzma", block_samples=4096)
+
+    with ArchiveReader(path) as reader:
+        assert len(reader.index) > 1
+        part_mv, part_ms = reader.read(5000, 13000)
+        np.testing.assert_array_equal(part_mv, mv[5000:13000])
+        np.testing.assert_array_equal(part_ms, ms[5000:13000])
+
+        window_mv, window_ms = reader.window(ms[20000], ms[30000])
+        keep = (ms >= ms[20000]) & (ms <= ms[30000])
+        np.testing.assert_array_equal(window_mv, mv[keep])
+        np.testing.assert_array_equal(window_ms, ms[keep])
+
+
+def test_lossy_decimals_stay_within_bound(tmp_path):
+    path = RECORDINGS[-1]
+    archive = convert(path, output=str(tmp_path / "aufnahme.ekgz"), decimals=1)
+    result = verify(path, archive)
+
+    assert result["time_exact"]
+    assert result["max_error_mv"] <= result["error_bound_mv"]
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return convert(RECORDINGS[0], output=str(tmp_path / "aufnahme.ekgz"))
+
+
+@pytest.mark.parametrize("keep", [0, 5, 0.5], ids=["leer", "nur Präfix", "halb"])
+def test_truncated_archive_is_rejected(archive, keep):
+    data = open(archive, "rb").read()
+    with open(archive, "wb") as f:
+        f.write(data[:int(len(data) * keep) if isinstance(keep, float) else keep])
+
+    with pytest.raises(ValueError, match="unvollständig|keine EKG-Archivdatei"):
+        read_archive(archive)
+
+
+def test_wrong_magic_is_rejected(tmp_path):
+    path = str(tmp_path / "aufnahme.ekgz")
+    with open(path, "wb") as f:
+        f.write(b"512\t0\n514\t2\n" * 10)
+
+    with pytest.raises(ValueError, match="keine EKG-Archivdatei"):
+        read_archive(path)
+
+
+def test_corrupt_block_is_rejected(archive):
+    with ArchiveReader(archive) as reader:
+        offset = int(reader.index["offset"][0])
+    with open(archive, "r+b") as f:
+        f.seek(offset + 10)
+        f.write(b"\xff" * 32)
+
+    with pytest.raises(ValueError, match="beschädigt"):
+        read_archive(archive)
+
+
+def test_archive_next_to_its_text_file(tmp_path):
+    text = str(tmp_path / "01_Ruhe.txt")
+    shutil.copy(RECORDINGS[0], text)
+    archive = convert(text)
+
+    assert archive == archive_path(text) == str(tmp_path / "01_Ruhe.ekgz")
+    # Batch-Auswertung nimmt nur das Archiv, nicht beide Dateien
+    assert [t["result_link"] for t in batch_analyze.tests_from_directory(str(tmp_path))] == [archive]
+    for expected, restored in zip(parse_recording(text), parse_recording(archive)):
+        np.testing.assert_array_equal(restored, expected)
@@ -0,0 +1,32 @@
+"""Binär-Cache: mehrere Prozesse bauen den Cache derselben Aufnahme gleichzeitig auf."""
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ekg_cache import build_cache, cached_recording, parse_recording
+
+WORKERS = 6
+ROUNDS = 5
+
+
+def _build(args):
+    path, cache_dir = args
+    for _ in range(ROUNDS):
+        build_cache(path, cache_dir)
+
+
+def test_concurrent_builds_leave_a_valid_cache(tmp_path):
+    path = str(tmp_path / "01_Ruhe.txt")
+    shutil.copy("data/ekg_data/01_Ruhe.txt", path)
+    cache_dir = str(tmp_path / "cache")
+
+    with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+        list(pool.map(_build, [(path, cache_dir)] * WORKERS))
+
+    assert not [name for name in os.listdir(cache_dir) if name.endswith(".tmp")]
+    mv, ms = cached_recording(path, cache_dir)
+    expected_mv, expected_ms = parse_recording(path)
+    np.testing.assert_array_equal(mv, expected_mv)
+    np.testing.assert_array_equal(ms, expected_ms)
@@ -0,0 +1,25 @@
+"""Strenge Prüfung beim Einlesen der EKG-Textdateien."""
+import pickle
+
+import pytest
+
+from ekg_parser import ParseError, read_recording
+
+
+@pytest.mark.parametrize("data", [b"", b"\n\n  \n", b"512\t0\n"])
+def test_rejects_recordings_without_time_axis(data):
+    with pytest.raises(ParseError, match="mindestens 2"):
+        read_recording(data)
+
+
+def test_two_samples_are_enough():
+    mv, ms = read_recording(b"512\t0\n514\t2\n")
+    assert mv.tolist() == [512, 514] and ms.tolist() == [0, 2]
+
+
+def test_parse_error_survives_pickling():
+    # Der Annahme-Dienst bekommt den Fehler aus einem Worker-Prozess zurück
+    with pytest.raises(ParseError) as info:
+        read_recording(b"512\tabc\n")
+    restored = pickle.loads(pickle.dumps(info.value))
+    assert restored.problems == info.value.problems and str(restored) == str(info.value)
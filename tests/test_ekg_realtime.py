@@ -0,0 +1,61 @@
+"""Live-Auswertung gegen die Offline-Auswertung, eingespielt mit dem Replay-Simulator."""
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from ekg_cache import load_recording
+from ekg_realtime import RealtimeEKG, replay, replay_arrays
+from ekgdata import EKGdata
+from peak_detection import detect_peaks
+
+# Absolute Pfade: die Tests laufen in einem eigenen Arbeitsverzeichnis (isolated_data)
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "ekg_data")
+RECORDINGS = sorted(p for p in glob.glob(os.path.join(DATA_DIR, "*.txt")) if not p.lower().endswith("readme.txt"))
+
+
+class RecordingEKG(RealtimeEKG):
+    """Merkt sich alle bestätigten Schläge."""
+
+    def __init__(self):
+        super().__init__()
+        self.found = []
+
+    def push(self, mv, ms):
+        beats = super().push(mv, ms)
+        self.found.extend(index for index, _ in beats)
+        return beats
+
+    def flush(self):
+        beats = super().flush()
+        self.found.extend(index for index, _ in beats)
+        return beats
+
+
+@pytest.mark.parametrize("path", RECORDINGS, ids=os.path.basename)
+def test_replay_matches_offline_without_ties(isolated_data, path):
+    # Rauschen macht die Höhen verschieden – dann muss das Ergebnis exakt gleich sein
+    mv, ms = load_recording(path)
+    noisy = np.asarray(mv, dtype=np.float32) + np.random.default_rng(0).uniform(0, 0.25, len(mv)).astype(np.float32)
+    live = RecordingEKG()
+    replay_arrays(noisy, ms, live, block_ms=74, speed=0)  # ungerade Blockgröße: Plateaus über Blockgrenzen
+    assert live.found == detect_peaks(noisy).tolist()
+
+
+@pytest.mark.parametrize("path", RECORDINGS, ids=os.path.basename)
+def test_replay_close_to_offline(isolated_data, path):
+    # Mit Gleichständen (ganzzahlige Rohwerte) nur begrenzte Abweichung, siehe RealtimeEKG
+    live = RealtimeEKG()
+    replay(path, live, speed=0)
+    offline = EKGdata({"id": "offline", "date": "", "result_link": path})
+    offline.find_peaks(refresh=True)
+    summary, reference = live.summary(), offline.summary()
+
+    assert abs(summary["beats"] - len(offline.peaks)) <= max(1, 0.005 * len(offline.peaks))
+    assert summary["avg_hr"] == pytest.approx(reference["avg_hr"], rel=0.005)
+    assert summary["min_hr"] == pytest.approx(reference["min_hr"], rel=0.01)
+    assert summary["max_hr"] == pytest.approx(reference["max_hr"], rel=0.01)
+    assert summary["anomalies"] == reference["anomalies"]
+    # Cache und Analyse-Speicher liegen im Testverzeichnis, nicht unter data/ des Repositorys
+    assert os.listdir(isolated_data / "data" / "cache" / "analysis")
@@ -0,0 +1,69 @@
+"""BeatStream gegen scipy.signal.find_peaks auf dem Gesamtsignal."""
+import glob
+import os
+
+import numpy as np
+import pytest
+from scipy.signal import find_peaks
+
+from ekg_parser import read_recording
+from ekg_stream import CHUNK_SIZE, BeatStream
+
+RECORDINGS = sorted(p for p in glob.glob("data/ekg_data/*.txt") if os.path.basename(p).lower() != "readme.txt")
+DISTANCE = 200
+HEIGHT = 0.5
+SMALL_CHUNK = 2 * DISTANCE + 1  # kleinste Blockgröße, die BeatStream zulässt
+
+
+def _offline(path):
+    mv, _ = read_recording(path)
+    peaks, _ = find_peaks(mv, distance=DISTANCE, height=HEIGHT)
+    return mv, peaks
+
+
+def _stream(path, chunk_size):
+    return np.array([i for i, _ in BeatStream(path, DISTANCE, HEIGHT, chunk_size)], dtype=np.int64)
+
+
+def _offset(peaks, others):
+    """Abstand jedes Peaks zum nächsten Peak der anderen Liste (in Messwerten)."""
+    return np.abs(peaks[:, None] - others[None, :]).min(axis=1)
+
+
+@pytest.mark.parametrize("chunk_size", [SMALL_CHUNK, 5000])
+def test_matches_exactly_without_ties(tmp_path, chunk_size):
+    # Zufallssignal ohne gleich hohe Peaks: Blockgrenzen dürfen nichts ändern
+    rng = np.random.default_rng(7)
+    mv = np.round(rng.normal(0, 1, 60_000), 6)
+    path = tmp_path / "rauschen.txt"
+    path.write_text("".join(f"{v:.6f}\t{2 * i}\n" for i, v in enumerate(mv)))
+    expected, _ = find_peaks(read_recording(str(path))[0], distance=DISTANCE, height=HEIGHT)
+
+    assert len(expected) > 100
+    np.testing.assert_array_equal(_stream(str(path), chunk_size), expected)
+
+
+@pytest.mark.parametrize("path", RECORDINGS, ids=os.path.basename)
+def test_default_chunk_size_matches_offline(path):
+    # Die Aufnahmen passen in einen Block; nur bei gleich hohen Nachbarn wählt
+    # der Rest nach dem letzten Anker einen anderen Messwert desselben Schlags
+    mv, expected = _offline(path)
+    beats = _stream(path, CHUNK_SIZE)
+
+    assert len(beats) == len(expected)
+    for beat, peak in zip(beats, expected):
+        assert beat == peak or (abs(beat - peak) <= 2 and mv[beat] == mv[peak])
+
+
+@pytest.mark.parametrize("path", RECORDINGS, ids=os.path.basename)
+def test_small_chunks_stay_within_tie_tolerance(path):
+    # Gleich hohe Peaks im Abstand < distance legt find_peaks nicht fest; an
+    # Blockgrenzen kann die Wahl anders ausfallen und sich auf Nachbarn auswirken.
+    # Bei den mitgelieferten Aufnahmen (04_Belastung: 1289 statt 1285) bleibt das
+    # unter 0,5 % der Schläge, und 98 % liegen höchstens 20 ms neben dem Original.
+    _, expected = _offline(path)
+    beats = _stream(path, SMALL_CHUNK)
+
+    assert abs(len(beats) - len(expected)) <= max(1, 0.005 * len(expected))
+    assert np.mean(_offset(expected, beats) <= 10) >= 0.98
+    assert np.mean(_offset(beats, expected) <= 10) >= 0.98
@@ -0,0 +1,72 @@
+"""HRV-Kennwerte: Referenzwerte auf synthetischen RR-Reihen, Unabhängigkeit von der Blockgröße."""
+import numpy as np
+import pytest
+
+from hrv import RR_MAX_MS, beat_chunks, hrv_analysis, time_domain
+
+BLOCK_SIZES = [1, 7, 64, 4096]
+
+
+def _beat_times(rr, start=1000):
+    return np.concatenate(([start], start + np.cumsum(rr))).astype(np.int64)
+
+
+@pytest.fixture
+def rr():
+    # 20 Minuten mit Atemschwankung (0,25 Hz) und Rauschen, ganzzahlige ms wie im EKG
+    rng = np.random.default_rng(3)
+    n = 1500
+    t = np.arange(n) * 0.8
+    return np.round(800 + 40 * np.sin(2 * np.pi * 0.25 * t) + rng.normal(0, 20, n)).astype(np.int64)
+
+
+def _reference(rr):
+    diffs = np.diff(rr)
+    return {
+        "n_rr": len(rr),
+        "mean_rr": round(float(rr.mean()), 1),
+        "sdnn": round(float(np.std(rr, ddof=1)), 1),
+        "rmssd": round(float(np.sqrt(np.mean(diffs.astype(np.float64) ** 2))), 1),
+        "pnn50": round(float(100 * np.mean(np.abs(diffs) > 50)), 1),
+    }
+
+
+def test_time_domain_matches_reference(rr):
+    result = time_domain(_beat_times(rr))
+    assert {key: result[key] for key in _reference(rr)} == _reference(rr)
+
+
+def test_artifacts_and_clock_reset_are_left_out(rr):
+    beats = _beat_times(rr)
+    # Drei verlorene Schläge (RR über RR_MAX_MS) und ein Zeitsprung zurück auf 0
+    beats = np.concatenate((beats[:500], beats[504:1000], beats[1000:] - beats[1000]))
+    assert np.diff(beats)[499] > RR_MAX_MS and np.diff(beats)[995] < 0
+
+    valid_parts = [np.diff(beats[:500]), np.diff(beats[500:996]), np.diff(beats[996:])]
+    assert all((part <= RR_MAX_MS).all() for part in valid_parts)
+    result = time_domain(beats)
+    nn = np.concatenate(valid_parts)
+    diffs = np.concatenate([np.diff(part) for part in valid_parts])
+
+    assert result["n_rr"] == len(nn)
+    assert result["sdnn"] == round(float(np.std(nn, ddof=1)), 1)
+    assert result["rmssd"] == round(float(np.sqrt(np.mean(diffs.astype(np.float64) ** 2))), 1)
+    assert result["pnn50"] == round(float(100 * np.mean(np.abs(diffs) > 50)), 1)
+
+
+def test_windowed_result_does_not_depend_on_block_size(rr):
+    beats = _beat_times(rr)
+    results = [hrv_analysis(beat_chunks(beats, size)) for size in BLOCK_SIZES]
+
+    for result in results[1:]:
+        assert result == results[0]
+    # Auch wenn die Uhr mitten in einem Fenster zurückspringt
+    reset = np.concatenate((beats[:700], beats[700:] - beats[700]))
+    with_reset = [hrv_analysis(beat_chunks(reset, size)) for size in BLOCK_SIZES]
+    assert all(result == with_reset[0] for result in with_reset[1:])
+    assert len(results[0]["windows"]) == 5  # vier volle Fenster und der Rest
+    # Laufende Summen über die Fenster ergeben dieselben Kennwerte wie die ganze Reihe
+    overall = results[0]["overall"]
+    assert {key: overall[key] for key in _reference(rr)} == _reference(rr)
+    # Atmung bei 0,25 Hz: HF überwiegt in den vollen 5-Minuten-Fenstern
+    assert all(w["hf_nu"] > 50 for w in results[0]["windows"] if w["lf_hf"] is not None)
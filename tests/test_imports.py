@@ -0,0 +1,14 @@
+"""Import-Budget aus benchmark.py als Test: jedes Modul wird kalt in einem
+eigenen Interpreter (`python -X importtime`) geladen."""
+import pytest
+
+from benchmark import IMPORT_BUDGETS, heavy_imports, import_profile
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGETS))
+def test_import_budget(module):
+    budget_ms, forbidden = IMPORT_BUDGETS[module]
+    elapsed_ms, loaded = import_profile(module)
+    heavy = heavy_imports(forbidden, loaded)
+    assert not heavy, f"import {module} lädt {', '.join(heavy)}"
+    assert elapsed_ms <= budget_ms, f"import {module} dauert {elapsed_ms:.0f} ms (Budget {budget_ms} ms)"
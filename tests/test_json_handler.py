@@ -0,0 +1,46 @@
+"""Gleichzeitige Schreiber auf person_db.json: keine Änderung darf verloren gehen."""
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from json_handler import add_ekg_test, json_transaction, update_test_comment
+
+WORKERS = 8
+ROUNDS = 25
+
+
+def _writer(args):
+    """Ein Schreiber: legt Tests an und schreibt Notizen."""
+    file_path, worker, rounds = args
+    for i in range(rounds):
+        if i % 2 == 0:
+            add_ekg_test(1, f"stress-{worker}-{i}", f"stress/{worker}/{i}.txt", file_path)
+        else:
+            # Batch: zwei Änderungen, ein Schreibvorgang
+            with json_transaction(file_path, []) as data:
+                test = add_ekg_test(1, f"stress-{worker}-{i}", f"stress/{worker}/{i}.txt", file_path, data)
+                update_test_comment(test["id"], f"notiz {worker}-{i}", file_path, data)
+
+
+def _tests(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return [t for p in json.load(f) for t in p.get("ekg_tests", [])]
+
+
+def test_concurrent_writers_lose_no_update(tmp_path):
+    file_path = str(tmp_path / "person_db.json")
+    shutil.copy("data/person_db.json", file_path)
+    before = len(_tests(file_path))
+
+    with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+        list(pool.map(_writer, [(file_path, w, ROUNDS) for w in range(WORKERS)]))
+
+    tests = _tests(file_path)
+    expected = {f"stress-{w}-{i}" for w in range(WORKERS) for i in range(ROUNDS)}
+    found = {t["date"] for t in tests if t["date"].startswith("stress-")}
+    ids = [t["id"] for t in tests]
+
+    assert found == expected, f"{len(expected - found)} Änderungen verloren"
+    assert len(tests) == before + len(expected)
+    assert len(ids) == len(set(ids)), "doppelte Test-IDs"
+    assert sum(1 for t in tests if t["comment"].startswith("notiz ")) == WORKERS * (ROUNDS // 2)
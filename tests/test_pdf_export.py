@@ -0,0 +1,34 @@
+"""PDF-Bericht auch für Aufnahmen ohne verwertbare Herzfrequenz."""
+import io
+
+import numpy as np
+import pytest
+
+from ekgdata import EKGdata
+from pdf_export import export_pdf
+from person import Person
+
+MS = np.arange(2000) * 2
+PERSON = {"id": 1, "firstname": "Max", "lastname": "Muster", "date_of_birth": 1990,
+          "picture_path": "", "ekg_tests": []}
+
+
+def _spikes(*positions):
+    mv = np.zeros(len(MS), dtype=np.float32)
+    mv[list(positions)] = 5
+    return mv
+
+
+@pytest.mark.parametrize("mv, ms", [
+    (_spikes(), MS),                                               # keine Peaks
+    (_spikes(1000), MS),                                           # ein Peak, kein RR-Intervall
+    (_spikes(500, 1500), np.where(np.arange(2000) >= 1500, MS - 2000, MS)),  # RR = 0 ms -> HR unendlich
+])
+def test_report_without_heart_rate(isolated_data, mv, ms):
+    ekg = EKGdata.from_arrays(mv, ms)
+    ekg.find_peaks()
+    person = Person(PERSON)
+    buffer = io.BytesIO()
+    with np.errstate(divide="ignore"):
+        export_pdf(person, {"id": "custom", "date": "heute"}, ekg, buffer)
+    assert buffer.getvalue().startswith(b"%PDF")
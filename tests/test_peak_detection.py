@@ -0,0 +1,32 @@
+"""Peak-Erkennung bei unterschiedlicher Abtastrate."""
+import numpy as np
+
+from ekg_cache import load_recording
+from peak_detection import detect_peaks, detect_peaks_batch, sample_rate, stack_signals
+
+RUHE = "data/ekg_data/01_Ruhe.txt"
+REALISTISCH = "data/ekg_data/d5c412ea_test_ekg_realistisch.txt"  # 4-ms-Schritte
+
+
+def test_sample_rate_from_time_axis():
+    assert sample_rate(load_recording(RUHE)[1]) == 500       # 2/3-ms-Jitter
+    assert sample_rate(load_recording(REALISTISCH)[1]) == 250
+    assert sample_rate([0, 4, 8, 2, 6, 10]) == 250            # zurückspringende Uhr
+
+
+def test_pan_tompkins_uses_recording_rate():
+    mv, ms = load_recording(REALISTISCH)
+    beats = detect_peaks(mv)  # 12 deutliche Schläge
+    found = detect_peaks(mv, method="pan_tompkins", fs=sample_rate(ms))
+    assert len(found) >= len(beats) - 2
+    assert len(found) > len(detect_peaks(mv, method="pan_tompkins"))  # fest 500 Hz: deutlich weniger
+    assert np.isin(found, beats).all()
+
+
+def test_batch_with_rate_per_row():
+    loaded = [load_recording(p) for p in (RUHE, REALISTISCH)]
+    rows, lengths = stack_signals([mv for mv, _ in loaded])
+    rates = [sample_rate(ms) for _, ms in loaded]
+    batched = detect_peaks_batch(rows, lengths, method="pan_tompkins", fs=rates)
+    for (mv, _), rate, peaks in zip(loaded, rates, batched):
+        assert np.array_equal(peaks, detect_peaks(mv, method="pan_tompkins", fs=rate))
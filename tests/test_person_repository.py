@@ -0,0 +1,97 @@
+"""JSON- und SQLite-Speicher verhalten sich beim Anlegen von Personen gleich."""
+import json
+import os
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from person_repository import PersonRepository
+from sqlite_store import SQLiteStore, migrate_from_json
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def repo(request, tmp_path):
+    person_path, login_path = tmp_path / "person_db.json", tmp_path / "logindaten.json"
+    shutil.copy("data/person_db.json", person_path)
+    shutil.copy("data/logindaten.json", login_path)
+    if request.param == "json":
+        return PersonRepository(str(person_path), str(login_path))
+    db_path = str(tmp_path / "ekg.sqlite3")
+    migrate_from_json(str(person_path), str(login_path), db_path)
+    return SQLiteStore(db_path)
+
+
+def test_same_name_gets_unique_username(repo):
+    first, first_password = repo.add_person("Max", "Muster", 1990)
+    second, second_password = repo.add_person("Max", "Muster", 1985)
+
+    assert first["username"] == "max.muster"
+    assert second["username"] == "max.muster2"
+    assert first["id"] != second["id"]
+    assert repo.get_login("max.muster")["password"] == first_password
+    assert repo.get_login("max.muster2")["password"] == second_password
+
+
+def _rewrite(path, persons, keep_mtime_ns=None):
+    # Wie json_handler: neue Datei schreiben und per os.replace austauschen
+    with open(path + ".new", "w", encoding="utf-8") as f:
+        json.dump(persons, f, indent=4, ensure_ascii=False)
+    os.replace(path + ".new", path)
+    if keep_mtime_ns is not None:
+        os.utime(path, ns=(keep_mtime_ns, keep_mtime_ns))
+
+
+def test_rewrite_with_same_size_and_mtime_is_seen(tmp_path):
+    path = str(tmp_path / "person_db.json")
+    shutil.copy("data/person_db.json", path)
+    repo = PersonRepository(path, str(tmp_path / "logindaten.json"))
+    persons = json.loads(open(path, encoding="utf-8").read())
+    old_name = persons[0]["firstname"]
+    assert repo.get_by_id(persons[0]["id"])["firstname"] == old_name
+
+    stat = os.stat(path)
+    persons[0]["firstname"] = old_name[::-1] if old_name[::-1] != old_name else old_name.upper()
+    _rewrite(path, persons, keep_mtime_ns=stat.st_mtime_ns)
+    assert os.stat(path).st_size == stat.st_size
+
+    assert repo.get_by_id(persons[0]["id"])["firstname"] == persons[0]["firstname"]
+
+
+def test_readers_never_see_half_built_indexes(tmp_path):
+    path = str(tmp_path / "person_db.json")
+    persons = json.loads(open("data/person_db.json", encoding="utf-8").read())
+    # Mehr Personen, damit der Aufbau der Indizes mehrere Thread-Wechsel dauert
+    template = persons[0]
+    persons += [dict(template, id=10_000 + i, ekg_tests=[]) for i in range(1000)]
+    _rewrite(path, persons)
+    repo = PersonRepository(path, str(tmp_path / "logindaten.json"))
+    ids = [p["id"] for p in persons[:-1000]]
+    tests = [t["id"] for p in persons for t in p.get("ekg_tests", [])]
+    stop = threading.Event()
+
+    def write():
+        for i in range(10):
+            persons[0]["comment"] = str(i)
+            _rewrite(path, persons)
+        stop.set()
+
+    def read():
+        misses = 0
+        while not stop.is_set():
+            misses += sum(repo.get_by_id(i) is None for i in ids)
+            misses += sum(repo.get_test(t) is None for t in tests)
+        return misses
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            readers = [pool.submit(read) for _ in range(4)]
+            pool.submit(write).result()
+            misses = [r.result() for r in readers]
+    finally:
+        sys.setswitchinterval(interval)
+    assert misses == [0] * 4
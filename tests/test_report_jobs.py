@@ -0,0 +1,44 @@
+"""Report-Scheduler: fertige Aufträge werden nach Ablauf der Frist freigegeben."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import report_jobs
+
+PERSON = {"id": 1, "firstname": "Max", "lastname": "Muster"}
+TEST = {"id": 7}
+
+
+def _scheduler(monkeypatch):
+    monkeypatch.setattr(report_jobs, "render_report", lambda person, test: b"%PDF-")
+    scheduler = report_jobs.ReportScheduler(workers=1)
+    scheduler.pool.shutdown()
+    scheduler.pool = ThreadPoolExecutor(max_workers=1)
+    return scheduler
+
+
+def test_old_finished_jobs_are_pruned_on_submit(monkeypatch):
+    scheduler = _scheduler(monkeypatch)
+    old = scheduler.submit(PERSON, TEST)
+    assert scheduler.get(old).result(timeout=5) == b"%PDF-"
+    scheduler.get(old).finished = time.time() - report_jobs.JOB_TTL_S - 1
+
+    recent = scheduler.submit_batch([(PERSON, TEST), (PERSON, TEST)])
+    scheduler.get(recent).result(timeout=5)
+    assert scheduler.get(old) is None
+
+    scheduler.submit(PERSON, TEST)
+    assert scheduler.get(recent) is not None, "noch nicht abgelaufene Aufträge bleiben abrufbar"
+    scheduler.shutdown()
+
+
+def test_running_jobs_are_kept(monkeypatch):
+    scheduler = _scheduler(monkeypatch)
+    job_id = scheduler.submit(PERSON, TEST)
+    job = scheduler.get(job_id)
+    job.result(timeout=5)
+    job.finished = None  # wie ein Auftrag, der noch rendert
+    job.created -= report_jobs.JOB_TTL_S + 1
+
+    scheduler.submit(PERSON, TEST)
+    assert scheduler.get(job_id) is job
+    scheduler.shutdown()
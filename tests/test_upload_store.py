@@ -0,0 +1,70 @@
+"""Inhaltsadressierte Ablage: Duplikate, gestreamter Hash und abgebrochene Uploads."""
+import hashlib
+import io
+import os
+
+import pytest
+
+from ekg_archive import read_archive
+from ekg_parser import ParseError, read_recording
+from upload_store import UploadWriter, store_upload
+
+RECORDING = "data/ekg_data/d5c412ea_test_ekg_realistisch.txt"
+
+
+class BrokenStream(io.BytesIO):
+    """Liefert ein paar Blöcke und bricht dann ab wie eine getrennte Verbindung."""
+
+    def __init__(self, data, fail_after):
+        super().__init__(data)
+        self.fail_after = fail_after
+
+    def read(self, size=-1):
+        if self.tell() >= self.fail_after:
+            raise ConnectionResetError("Verbindung getrennt")
+        return super().read(size)
+
+
+def _data():
+    with open(RECORDING, "rb") as f:
+        return f.read()
+
+
+def test_identical_upload_is_stored_once(tmp_path):
+    store_dir = str(tmp_path / "store")
+    first = store_upload(io.BytesIO(_data()), "a.txt", store_dir)
+    second = store_upload(io.BytesIO(_data()), "b.txt", store_dir)
+
+    assert first[:2] == second[:2]
+    assert (first[2], second[2]) == (False, True)
+    assert os.listdir(store_dir) == [os.path.basename(first[0])]
+    mv, ms = read_archive(first[0])
+    expected_mv, expected_ms = read_recording(RECORDING)
+    assert mv.tolist() == expected_mv.tolist() and ms.tolist() == expected_ms.tolist()
+
+
+def test_streamed_hash_matches_whole_file(tmp_path):
+    data = _data()
+    path, sha256, _ = store_upload(io.BytesIO(data), "a.txt", str(tmp_path), chunk_bytes=1000)
+
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    assert os.path.basename(path) == sha256 + ".ekgz"
+
+
+def test_interrupted_upload_leaves_no_file(tmp_path):
+    data = _data()
+    with pytest.raises(ConnectionResetError):
+        store_upload(BrokenStream(data, len(data) // 2), "a.txt", str(tmp_path), chunk_bytes=1000)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_aborted_writer_and_invalid_file_leave_no_file(tmp_path):
+    writer = UploadWriter("a.txt", str(tmp_path))
+    writer.write(_data()[:500])
+    writer.abort()
+    assert os.listdir(tmp_path) == []
+
+    with pytest.raises(ParseError):
+        store_upload(io.BytesIO(b"512\tabc\n"), "kaputt.txt", str(tmp_path))
+    assert os.listdir(tmp_path) == []
@@ -1,8 +1,8 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import numpy as np
-from scipy.signal import find_peaks
+from ekg_cache import parse_recording
+from ekg_parser import ParseError, read_head
+from ekgdata import EKGdata
+from ingest_server import job_status, server_available, submit_upload
 
 
 def handle_upload():
@@ -19,63 +19,74 @@ def handle_upload():
 
     if uploaded_file is not None:
         try:
-            df = pd.read_csv(uploaded_file, sep="\t", header=None, names=["Messwerte in mV", "Zeit in ms"])
+            # Vorschau: nur die ersten Zeilen lesen
+            preview_mv, preview_ms = read_head(uploaded_file)
 
-            if df.empty or len(df.columns) < 2:
+            if len(preview_mv) == 0:
                 st.error("Die Datei enthält nicht genügend Daten.")
                 return
 
             st.success("Datei erfolgreich geladen!")
-            analyze_ekg_dataframe(df)
+            st.subheader("Vorschau der EKG-Daten")
+            st.dataframe({"Messwerte in mV": preview_mv, "Zeit in ms": preview_ms})
 
+            if server_available():
+                analyze_in_background(uploaded_file)
+                return
+
+            # Direkt als float32/int32-Arrays, ohne DataFrame im Speicher zu behalten
+            mv, ms = parse_recording(uploaded_file)
+            method = st.radio("Peak-Erkennung", ["threshold", "pan_tompkins"], horizontal=True,
+                              format_func=lambda m: "Schwellwert" if m == "threshold" else "Pan-Tompkins")
+            analyze_ekg_recording(mv, ms, method)
+
+        except ParseError as e:
+            st.error(f"Die Datei hat nicht das erwartete Format: {e}")
         except Exception as e:
             st.error(f"Fehler beim Verarbeiten der Datei: {str(e)}")
 
 
-def analyze_ekg_dataframe(df):
-    # Signal normalisieren (falls nötig)
-    df = df.copy()
-    df["Zeit in ms"] = df["Zeit in ms"] - df["Zeit in ms"].iloc[0]
-    df["Zeit in s"] = df["Zeit in ms"] / 1000
-
-    # Peaks berechnen
-    signal = df["Messwerte in mV"]
-    peaks, _ = find_peaks(signal, distance=200, height=0.5)
+def analyze_in_background(uploaded_file):
+    """Schickt die Datei an den Annahme-Dienst und zeigt das Ergebnis, sobald es fertig ist."""
+    jobs = st.session_state.setdefault("upload_jobs", {})
+    key = (uploaded_file.name, uploaded_file.size)
+    if key not in jobs:
+        jobs[key] = submit_upload(uploaded_file.getvalue(), uploaded_file.name)["id"]
+
+    job = job_status(jobs[key])
+    if job is None:
+        del jobs[key]
+        st.warning("Der Auftrag ist nicht mehr bekannt – bitte die Datei erneut hochladen.")
+    elif job["status"] == "failed":
+        st.error(f"Fehler beim Verarbeiten der Datei: {job['error']}")
+    elif job["status"] != "done":
+        st.info("Die Datei wird im Hintergrund ausgewertet …")
+        st.button("Aktualisieren", key="upload_refresh")
+    else:
+        # Peaks und Signal kommen aus dem Analyse-Speicher bzw. Binär-Cache
+        ekg = EKGdata(job["test"])
+        ekg.find_peaks()
+        show_summary(ekg, job["result"])
+
+
+def analyze_ekg_recording(mv, ms, method="threshold"):
+    ekg = EKGdata.from_arrays(mv, ms)
+    peaks = ekg.find_peaks(method=method)
 
     if len(peaks) < 2:
         st.warning("Nicht genug Herzschläge erkannt für Analyse.")
         return
 
-    # Herzfrequenz berechnen
-    times_ms = df["Zeit in ms"].iloc[peaks].values
-    rr_intervals_ms = np.diff(times_ms)
-    hr_values = 60000 / rr_intervals_ms
-    avg_hr = round(np.mean(hr_values), 1)
-    min_hr = int(np.min(hr_values))
-    max_hr = int(np.max(hr_values))
-    duration_min = round(df["Zeit in ms"].iloc[-1] / 60000, 2)
+    show_summary(ekg, ekg.summary())
+
 
+def show_summary(ekg, summary):
     # Ergebnisse anzeigen
-    st.write(f"**Durchschnittliche Herzfrequenz:** {avg_hr} bpm")
-    st.write(f"**Minimale Herzfrequenz:** {min_hr} bpm")
-    st.write(f"**Maximale Herzfrequenz:** {max_hr} bpm")
-    st.write(f"**Dauer der Aufnahme:** {duration_min} Minuten")
-
-    # Plot
-    df_plot = df[df["Zeit in ms"] <= 10000]  # nur erste 10 Sekunden
-    fig = px.line(df_plot, x="Zeit in s", y="Messwerte in mV", title="EKG Zeitreihe (0–10 s)")
-
-    peaks_in_range = peaks[df["Zeit in ms"].iloc[peaks] <= 10000]
-    df_peaks = df.iloc[peaks_in_range].copy()
-    df_peaks["Zeit in s"] = df_peaks["Zeit in ms"] / 1000
-
-    fig.add_scatter(
-        x=df_peaks["Zeit in s"],
-        y=df_peaks["Messwerte in mV"],
-        mode='markers',
-        marker=dict(color='red', size=6),
-        name="Peaks"
-    )
-
-    fig.update_layout(xaxis_title="Zeit (s)", yaxis_title="Messwerte in mV")
-    st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+    st.write(f"**Durchschnittliche Herzfrequenz:** {summary['avg_hr']} bpm")
+    st.write(f"**Minimale Herzfrequenz:** {summary['min_hr']} bpm")
+    st.write(f"**Maximale Herzfrequenz:** {summary['max_hr']} bpm")
+    st.write(f"**Dauer der Aufnahme:** {summary['duration_min']} Minuten")
+
+    # Plot: nur erste 10 Sekunden, aus der Min/Max-Pyramide
+    fig = ekg.plot_time_series(time_range=(0, 10), title="EKG Zeitreihe (0–10 s)")
+    st.plotly_chart(fig, use_container_width=True)
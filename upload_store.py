@@ -0,0 +1,114 @@
+"""Inhaltsadressierte Ablage hochgeladener EKG-Dateien.
+
+Uploads werden blockweise auf die Platte geschrieben und dabei gehasht
+(SHA-256). Danach wird die Datei geparst und als Archiv unter ihrem Hash
+abgelegt (`<sha256>.ekgz`, siehe `ekg_archive`). Kommt dieselbe Aufnahme
+noch einmal, bleibt es bei der vorhandenen Datei; der neue Test verweist auf
+sie und teilt sich Binär-Cache und gespeicherte Analyse mit den anderen.
+"""
+import hashlib
+import os
+import uuid
+
+from ekg_archive import EXTENSION, write_archive
+from ekg_parser import read_recording
+
+STORE_DIR = "data/ekg_data/store"
+CHUNK_BYTES = 1024 * 1024
+
+
+def stored_path(sha256, store_dir=STORE_DIR):
+    return os.path.join(store_dir, sha256 + EXTENSION)
+
+
+class UploadWriter:
+    """Nimmt eine Datei blockweise an (`write`) und legt sie mit `finish` ab.
+
+    Nutzbar aus synchronem Code (store_upload) und aus dem Annahme-Dienst,
+    der die Blöcke direkt vom Socket schreibt.
+    """
+
+    def __init__(self, name="", store_dir=STORE_DIR):
+        self.name = name
+        self.store_dir = store_dir
+        self.bytes = 0
+        self._hash = hashlib.sha256()
+        os.makedirs(store_dir, exist_ok=True)
+        self._tmp = os.path.join(store_dir, f".upload_{uuid.uuid4().hex}.tmp")
+        self._file = open(self._tmp, "wb")
+
+    def write(self, chunk):
+        self._hash.update(chunk)
+        self._file.write(chunk)
+        self.bytes += len(chunk)
+
+    def close(self):
+        """Schließt die temporäre Datei; gibt die Argumente für `archive_upload` zurück.
+
+        So kann das Parsen in einem anderen Prozess laufen (Annahme-Dienst).
+        """
+        self._file.close()
+        return self._tmp, self._hash.hexdigest(), self.name, self.bytes, self.store_dir
+
+    def finish(self):
+        """Legt die Datei ab; gibt (Pfad, SHA-256, schon vorhanden) zurück."""
+        return archive_upload(*self.close())
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+
+def archive_upload(tmp, sha256, name, size, store_dir=STORE_DIR):
+    """Parst die empfangene Datei und legt sie unter ihrem Hash ab; gibt (Pfad, SHA-256, schon vorhanden) zurück.
+
+    Ungültige Dateien führen zu einem `ekg_parser.ParseError`; die
+    temporäre Datei wird in jedem Fall entfernt.
+    """
+    path = stored_path(sha256, store_dir)
+    try:
+        if os.path.exists(path):
+            return path, sha256, True
+        mv, ms = read_recording(tmp)
+        write_archive(path, mv, ms, source={"name": name, "bytes": size, "sha256": sha256})
+        return path, sha256, False
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def store_upload(stream, name=None, store_dir=STORE_DIR, chunk_bytes=CHUNK_BYTES):
+    """Schreibt ein Datei-Objekt (z. B. Streamlit-Upload) blockweise in die Ablage.
+
+    Gibt (Pfad, SHA-256, schon vorhanden) zurück.
+    """
+    if name is None:
+        name = os.path.basename(getattr(stream, "name", "") or "")
+    writer = UploadWriter(name, store_dir)
+    try:
+        for chunk in iter(lambda: stream.read(chunk_bytes), b""):
+            writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.finish()
+
+
+if __name__ == "__main__":
+    import argparse
+    import tracemalloc
+
+    parser = argparse.ArgumentParser(description="EKG-Dateien in die inhaltsadressierte Ablage übernehmen")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--store-dir", default=STORE_DIR)
+    args = parser.parse_args()
+
+    for source in args.paths:
+        tracemalloc.start()
+        with open(source, "rb") as f:
+            path, sha256, duplicate = store_upload(f, os.path.basename(source), args.store_dir)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        state = "schon vorhanden" if duplicate else "neu abgelegt"
+        print(f"{source}: {sha256[:12]}… {state} -> {path} (Spitze {peak / 1e6:.1f} MB)")